@@ -1,8 +1,31 @@
-import pandas as pd
-import glob
 import os
+import sys
 
-def clean_war_data_files():
+# Make the shared 'warwatch' package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch.manifest import run_incremental
+from warwatch.parallel import script_main
+from warwatch.storage import find_tables, read_table, table_path, write_table
+from warwatch.transforms import truncate_after_peak
+
+def clean_war_file(filename, output_folder):
+    """
+    Truncates one war CSV after a major casualty reset and saves it.
+    """
+    # os.path.basename gets just the filename (e.g., "war_data_WC20.csv")
+    base_filename = os.path.basename(filename)
+    print(f"Processing: {base_filename}")
+
+    df = read_table(filename)
+
+    df = truncate_after_peak(df)
+    if df is None:
+        return
+
+    write_table(df, table_path(output_folder, base_filename))
+    print(f"  - ✅ Saved file to '{output_folder}'.")
+
+def clean_war_data_files(jobs=1, force=False):
     """
     Processes all war CSVs in a folder to find and remove "mini wars"
     by truncating the data after a major casualty reset.
@@ -12,15 +35,12 @@ def clean_war_data_files():
     # Get the absolute path to the directory where this script is located
     script_dir = os.path.dirname(__file__)
     
-    # Create the search pattern based on the script's directory
-    search_pattern = os.path.join(script_dir, "war_data_WC*.csv")
-    
     # Create the output folder path based on the script's directory
     output_folder = os.path.join(script_dir, 'cleaned_data')
     os.makedirs(output_folder, exist_ok=True)
     
-    # Use the new pattern to find all the war data CSV files
-    csv_files = glob.glob(search_pattern)
+    # Find all the war data files next to the script, in either format
+    csv_files = find_tables(script_dir, "war_data_WC*")
 
     if not csv_files:
         print("❌ No 'war_data_WC...' CSV files found. Please ensure CSV files are in the same folder as the script.")
@@ -28,50 +48,15 @@ def clean_war_data_files():
 
     print(f"Found {len(csv_files)} war data files to process...\n")
 
-    # --- Loop through each file ---
-    for filename in csv_files:
-        # os.path.basename gets just the filename (e.g., "war_data_WC20.csv")
-        base_filename = os.path.basename(filename)
-        print(f"Processing: {base_filename}")
-        
-        try:
-            df = pd.read_csv(filename)
-
-            if df.empty or 'WardenCasualties' not in df.columns:
-                print("  - File is empty or missing 'WardenCasualties' column. Copying as-is.")
-                df.to_csv(os.path.join(output_folder, base_filename), index=False)
-                continue
-
-            df['WardenCasualties'] = pd.to_numeric(df['WardenCasualties'], errors='coerce')
-            df.dropna(subset=['WardenCasualties'], inplace=True)
-            df['WardenCasualties'] = df['WardenCasualties'].astype(int)
-
-            if df.empty:
-                print("  - No valid casualty data found after cleaning. Skipping.")
-                continue
-
-            peak_index = df['WardenCasualties'].idxmax()
-
-            if peak_index == df.index[-1]:
-                print("  - Peak casualties at the end of the war. No reset detected.")
-                df.to_csv(os.path.join(output_folder, base_filename), index=False)
-            else:
-                max_casualties = df.loc[peak_index, 'WardenCasualties']
-                next_row_casualties = df.loc[peak_index + 1, 'WardenCasualties']
-
-                if next_row_casualties < max_casualties:
-                    cleaned_df = df.loc[:peak_index]
-                    cleaned_df.to_csv(os.path.join(output_folder, base_filename), index=False)
-                    print(f"  - Reset detected! Truncated file and saved to '{output_folder}'.")
-                else:
-                    print("  - No casualty reset detected after peak.")
-                    df.to_csv(os.path.join(output_folder, base_filename), index=False)
-
-        except Exception as e:
-            print(f"  - An error occurred while processing {base_filename}: {e}")
+    # --- Process each file, in parallel if requested ---
+    run_incremental(
+        'cleaner1', clean_war_file, csv_files, output_folder,
+        folder=script_dir, output_folder=output_folder, params={},
+        source_files=[__file__], jobs=jobs, force=force,
+    )
     
     print("\n--- All files processed. Check the 'cleaned_data' folder for the results. ---")
 
 # --- Run the script ---
 if __name__ == "__main__":
-    clean_war_data_files()
\ No newline at end of file
+    script_main(clean_war_data_files, "Truncates every war CSV after a major casualty reset.")
\ No newline at end of file
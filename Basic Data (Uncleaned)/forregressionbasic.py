@@ -1,7 +1,33 @@
-import pandas as pd
 import os
+import sys
 
-def add_win_margin_for_basic_data():
+# Make the shared 'warwatch' package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch.manifest import run_incremental
+from warwatch.parallel import script_main
+from warwatch.storage import find_table, read_table, table_path, write_table
+from warwatch.transforms import add_win_margin
+
+def add_win_margin_to_file(filename, output_path_folder, output_folder):
+    """
+    Adds the 'WinMargin' column to one war CSV and saves it.
+    """
+    base_filename = os.path.basename(filename)
+    print(f"Processing: {base_filename}")
+
+    df = read_table(filename)
+
+    # Add the win margin based on the final row's capture counts
+    df = add_win_margin(df)
+    if df is None:
+        return
+
+    output_file_path = table_path(output_path_folder, base_filename)
+    write_table(df, output_file_path)
+
+    print(f"  - ✅ Saved file with WinMargin to '{output_folder}'.")
+
+def add_win_margin_for_basic_data(jobs=1, force=False):
     """
     Adds a 'WinMargin' target variable specifically to the CSV files for
     the "basic data" wars (20-62 and 112-125).
@@ -26,40 +52,19 @@ def add_win_margin_for_basic_data():
 
     print("Searching for 'basic data' war files (20-62 & 112-125) to process...\n")
 
-    # Loop through the specified war numbers
-    for war_number in war_ranges:
-        base_filename = f"war_data_WC{war_number}.csv"
-        filename = os.path.join(input_path, base_filename)
-        
-        if os.path.exists(filename):
-            print(f"Processing: {base_filename}")
-            try:
-                df = pd.read_csv(filename)
-                
-                if df.empty or 'WardenCaptures' not in df.columns or 'ColonialCaptures' not in df.columns:
-                    print("  - ⚠️ File is empty or missing 'Captures' columns. Skipping.")
-                    continue
-
-                last_row = df.iloc[-1]
-                warden_captures = pd.to_numeric(last_row['WardenCaptures'], errors='coerce')
-                colonial_captures = pd.to_numeric(last_row['ColonialCaptures'], errors='coerce')
-
-                # Calculate the win margin
-                win_margin = warden_captures - colonial_captures
-                print(f"  - Final capture difference is {win_margin}. Creating 'WinMargin' column.")
-
-                # Add the new column and fill it with the calculated value
-                df['WinMargin'] = win_margin
-                
-                output_file_path = os.path.join(output_path_folder, base_filename)
-                df.to_csv(output_file_path, index=False)
-                
-                print(f"  - ✅ Saved file with WinMargin to '{output_folder}'.")
+    # Collect the files that exist for the specified war numbers
+    csv_files = [
+        path for path in (find_table(input_path, f"war_data_WC{war_number}") for war_number in war_ranges)
+        if path is not None
+    ]
 
-            except Exception as e:
-                print(f"  - ❌ An error occurred while processing {base_filename}: {e}")
+    run_incremental(
+        'forregressionbasic', add_win_margin_to_file, csv_files, output_path_folder, output_folder,
+        folder=script_dir, output_folder=output_path_folder, params={'wars': war_ranges},
+        source_files=[__file__], jobs=jobs, force=force,
+    )
 
     print(f"\n--- Win margin processing complete for basic data wars. ---")
 
 if __name__ == "__main__":
-    add_win_margin_for_basic_data()
\ No newline at end of file
+    script_main(add_win_margin_for_basic_data, "Adds a 'WinMargin' column to the basic data war files.")
\ No newline at end of file
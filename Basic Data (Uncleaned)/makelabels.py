@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+
+# Make the shared 'warwatch' package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch import instrument
+from warwatch.labels import LABEL_TABLE, derive_labels
+from warwatch.manifest import LABEL_SOURCES, BuildManifest, code_hash
+from warwatch.storage import add_format_argument, apply_storage_arguments, find_table, table_path, write_table
+
+def make_labels(force=False):
+    """
+    Works out every label (Target, WinMargin and SquaredWinMargin) for the
+    "basic data" wars (20-62 and 112-125) from each war's final capture
+    counts, in one pass, and saves them as a table with one row per war.
+    """
+    # Define the input folder; the label table goes next to the raw files
+    input_folder = 'final_cleaned_data'
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    input_path = os.path.join(script_dir, input_folder)
+
+    if not os.path.isdir(input_path):
+        print(f"❌ Error: Input folder '{input_folder}' not found.")
+        print("Please run the previous cleaning scripts first to generate the required folder.")
+        return
+
+    # Define the two separate ranges of wars to process
+    war_ranges = list(range(20, 63)) + list(range(112, 126))
+
+    print("Working out the labels for 'basic data' wars (20-62 & 112-125)...\n")
+
+    input_files = []
+    for war_number in war_ranges:
+        filename = find_table(input_path, f"war_data_WC{war_number}")
+        if filename is not None:
+            input_files.append((war_number, filename))
+
+    if not input_files:
+        print("❌ No data files found for the specified war ranges.")
+        return
+
+    # Only re-derive the labels if an input file, the war ranges, this
+    # script or the code working out the labels changed since the table
+    # was last written
+    manifest = BuildManifest(script_dir)
+    output_file_path = table_path(script_dir, LABEL_TABLE)
+    params = {'wars': war_ranges, 'code': code_hash(*LABEL_SOURCES, __file__)}
+    inputs = [filename for _, filename in input_files]
+    if not force and manifest.is_fresh('makelabels', LABEL_TABLE, inputs, params, [output_file_path]):
+        print(f"✅ Nothing changed upstream. '{os.path.basename(output_file_path)}' is already up to date.")
+        return
+
+    label_table = derive_labels(input_files)
+    write_table(label_table, output_file_path)
+    manifest.record('makelabels', LABEL_TABLE, inputs, params)
+    manifest.save()
+
+    print(f"\n✅ Saved the labels of {len(label_table)} wars to '{os.path.basename(output_file_path)}'.")
+
+# --- Run the script ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Works out every label for each war into one table.")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-derive the labels even if the build manifest says nothing changed")
+    add_format_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args()
+    apply_storage_arguments(args)
+    instrument.configure(args)
+    with instrument.profiled(args.profile):
+        make_labels(force=args.force)
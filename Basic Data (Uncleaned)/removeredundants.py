@@ -1,8 +1,36 @@
-import pandas as pd
-import glob
 import os
+import sys
 
-def remove_rate_columns():
+# Make the shared 'warwatch' package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch.manifest import run_incremental
+from warwatch.parallel import script_main
+from warwatch.schema import REDUNDANT_COLUMNS
+from warwatch.storage import find_tables, read_table, table_path, write_table
+from warwatch.transforms import drop_columns
+
+def remove_columns_from_file(filename, columns_to_drop, output_path_folder, output_folder):
+    """
+    Removes the redundant columns from one CSV file and saves it.
+    """
+    base_filename = os.path.basename(filename)
+    print(f"Processing: {base_filename}")
+
+    # Read the CSV file
+    df = read_table(filename)
+
+    # Drop the specified columns, ignoring any the file doesn't have
+    df = drop_columns(df, columns_to_drop)
+
+    # Define the full path for the new output file
+    output_file_path = table_path(output_path_folder, base_filename)
+
+    # Save the modified DataFrame to the new location
+    write_table(df, output_file_path)
+
+    print(f"  - ✅ Removed columns and saved to '{output_folder}'.")
+
+def remove_rate_columns(jobs=1, force=False):
     """
     A standalone script to remove specific redundant columns from already
     processed CSV files.
@@ -28,8 +56,7 @@ def remove_rate_columns():
         return
 
     # Find all CSV files within the input folder
-    search_pattern = os.path.join(input_path, "*.csv")
-    csv_files = glob.glob(search_pattern)
+    csv_files = find_tables(input_path)
 
     if not csv_files:
         print(f"❌ No CSV files found inside the '{input_folder}' folder.")
@@ -37,34 +64,17 @@ def remove_rate_columns():
 
     print(f"Found {len(csv_files)} files to process in '{input_folder}'...\n")
 
-    # List of columns to be removed
-    columns_to_drop = ['WardenCasualtyRateHr', 'ColonialCasualityRateHr']
-
-    for filename in csv_files:
-        base_filename = os.path.basename(filename)
-        print(f"Processing: {base_filename}")
-        
-        try:
-            # Read the CSV file
-            df = pd.read_csv(filename)
-            
-            # Drop the specified columns. 'errors='ignore'' prevents crashing
-            # if a file doesn't contain one of the columns.
-            df.drop(columns=columns_to_drop, inplace=True, errors='ignore')
-            
-            # Define the full path for the new output file
-            output_file_path = os.path.join(output_path_folder, base_filename)
-            
-            # Save the modified DataFrame to the new location
-            df.to_csv(output_file_path, index=False)
-            
-            print(f"  - ✅ Removed columns and saved to '{output_folder}'.")
+    # The redundant columns, as declared in the schema
+    columns_to_drop = REDUNDANT_COLUMNS
 
-        except Exception as e:
-            print(f"  - ❌ An error occurred while processing {base_filename}: {e}")
+    run_incremental(
+        'removeredundants', remove_columns_from_file, csv_files, columns_to_drop, output_path_folder, output_folder,
+        folder=script_dir, output_folder=output_path_folder, params={'columns_to_drop': columns_to_drop},
+        source_files=[__file__], jobs=jobs, force=force,
+    )
     
     print(f"\n--- Final cleaning complete. Check the '{output_folder}' folder for the results. ---")
 
 # --- Run the script ---
 if __name__ == "__main__":
-    remove_rate_columns()
\ No newline at end of file
+    script_main(remove_rate_columns, "Removes the redundant rate columns from every cleaned CSV file.")
\ No newline at end of file
@@ -1,9 +1,34 @@
-import pandas as pd
-import glob
 import os
-from datetime import datetime
+import sys
 
-def advanced_clean_war_data():
+# Make the shared 'warwatch' package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch.manifest import run_incremental
+from warwatch.parallel import script_main
+from warwatch.storage import find_tables, read_table, table_path, write_table
+from warwatch.transforms import advanced_clean
+
+def clean_war_file(filename, output_folder):
+    """
+    Applies the advanced cleaning process to one war data CSV.
+    """
+    base_filename = os.path.basename(filename)
+    print(f"Processing: {base_filename}")
+
+    df = read_table(filename)
+
+    df = advanced_clean(df)
+    if df is None:
+        return
+
+    # --- THIS IS THE CORRECTED LINE ---
+    # It now correctly joins the output folder path with the filename.
+    output_path = table_path(output_folder, base_filename)
+
+    write_table(df, output_path)
+    print(f"  - ✅ Saved cleaned file to '{output_folder}'.")
+
+def advanced_clean_war_data(jobs=1, force=False):
     """
     Applies a three-step advanced cleaning process to all war data CSVs.
     This version includes the bug fix for the file path issue.
@@ -13,8 +38,7 @@ def advanced_clean_war_data():
     output_folder = os.path.join(script_dir, 'cleaned_data_advanced')
     os.makedirs(output_folder, exist_ok=True)
     
-    search_pattern = os.path.join(script_dir, "war_data_WC*.csv")
-    csv_files = glob.glob(search_pattern)
+    csv_files = find_tables(script_dir, "war_data_WC*")
 
     if not csv_files:
         print("❌ No 'war_data_WC...' CSV files found. Make sure this script is in the same folder as the script.")
@@ -22,63 +46,14 @@ def advanced_clean_war_data():
 
     print(f"Found {len(csv_files)} war data files to process with advanced cleaning...\n")
 
-    for filename in csv_files:
-        base_filename = os.path.basename(filename)
-        print(f"Processing: {base_filename}")
-        
-        try:
-            df = pd.read_csv(filename)
-
-            if df.empty or 'WardenCasualties' not in df.columns or 'ColonialCasualties' not in df.columns:
-                print("  - File is empty or missing required casualty columns. Skipping.")
-                continue
-
-            for col in ['WardenCasualties', 'ColonialCasualties']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            df.dropna(subset=['WardenCasualties', 'ColonialCasualties'], inplace=True)
-            df = df.astype({'WardenCasualties': int, 'ColonialCasualties': int})
-
-            last_reset_index = -1
-            if len(df) > 1:
-                for i in range(1, len(df)):
-                    if df.iloc[i]['WardenCasualties'] < df.iloc[i-1]['WardenCasualties'] and \
-                       df.iloc[i]['ColonialCasualties'] < df.iloc[i-1]['ColonialCasualties']:
-                        last_reset_index = i
-            
-            if last_reset_index != -1:
-                df = df.iloc[last_reset_index:].copy()
-                print(f"  - Pre-war data reset found. Truncating {last_reset_index} early rows.")
-            
-            df.reset_index(drop=True, inplace=True)
-
-            if not df.empty:
-                first_action_index = (df['WardenCasualties'] > 0) | (df['ColonialCasualties'] > 0)
-                if first_action_index.any():
-                    first_action_index = first_action_index.idxmax()
-                    rows_to_remove = df[(df.index > first_action_index) & (df['WardenCasualties'] == 0) & (df['ColonialCasualties'] == 0)]
-                    if not rows_to_remove.empty:
-                        print(f"  - Removing {len(rows_to_remove)} mid-war rows with zero casualties.")
-                        df.drop(rows_to_remove.index, inplace=True)
-
-            cols_before = len(df.columns)
-            cols_to_keep = [col for col in df.columns if not str(col).startswith('Column_')]
-            df = df[cols_to_keep]
-            cols_after = len(df.columns)
-            if cols_before > cols_after:
-                print(f"  - Removed {cols_before - cols_after} unnamed columns.")
-            
-            # --- THIS IS THE CORRECTED LINE ---
-            # It now correctly joins the output folder path with the filename.
-            output_path = os.path.join(output_folder, base_filename)
-            
-            df.to_csv(output_path, index=False)
-            print(f"  - ✅ Saved cleaned file to '{output_folder}'.")
-
-        except Exception as e:
-            print(f"  - ❌ An error occurred while processing {base_filename}: {e}")
+    run_incremental(
+        'cleaner2', clean_war_file, csv_files, output_folder,
+        folder=script_dir, output_folder=output_folder, params={},
+        source_files=[__file__], jobs=jobs, force=force,
+    )
     
     print("\n--- All files processed. Check the 'cleaned_data_advanced' folder for the results. ---")
 
 # --- Run the script ---
 if __name__ == "__main__":
-    advanced_clean_war_data()
\ No newline at end of file
+    script_main(advanced_clean_war_data, "Applies the advanced cleaning process to all war data CSVs.")
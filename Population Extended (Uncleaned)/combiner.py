@@ -1,13 +1,25 @@
-import pandas as pd
+import argparse
 import os
+import sys
 
-def combine_extended_data():
+# Make the shared 'warwatch' package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch import instrument
+from warwatch.combine import stream_combine
+from warwatch.features import features_path
+from warwatch.labels import LABEL_TABLE, read_labels
+from warwatch.manifest import COMBINE_SOURCES, BuildManifest, code_hash
+from warwatch.storage import add_format_argument, apply_storage_arguments, find_table
+from warwatch.windows import DEFAULT_WINDOWS, windows_path
+
+def combine_extended_data(force=False):
     """
     Combines the cleaned CSVs for the "extended data" wars (63-111)
     into a single file with a specific column structure.
     """
-    # Define the input folder and the final output filename
-    input_folder = 'data_with_win_margin'
+    # Define the input folder and the final output filename; the labels are
+    # joined on from the table makelabels.py writes
+    input_folder = 'model_ready_data'
     output_filename = 'DataWithPopulationRegr.csv'
 
     # Get the path to the directory where the script is running
@@ -20,60 +32,75 @@ def combine_extended_data():
         print("Please run the previous scripts first to generate the required folder.")
         return
 
+    label_table = find_table(script_dir, LABEL_TABLE)
+    if label_table is None:
+        print(f"❌ Error: Label table '{LABEL_TABLE}' not found.")
+        print("Please run makelabels.py first to generate it.")
+        return
+
     # Define the specific columns you want in the final output
-    # The 'Target' column will be renamed from 'WardenWin_by_Captures'
     final_columns = [
         "WarNumber", "Timestamp", "WardenPlayers", "ColonialPlayers", "WardenCaptures", "ColonialCaptures",
         "WardenCasualties", "ColonialCasualties", "WardenCasualtyRate", "ColonialCasualtyRate",
         "SteamPlayers", "WardenPlayHours", "ColonialPlayHours", "WinMargin"
     ]
 
-    # Create a list to hold the DataFrame from each war file
-    list_of_dataframes = []
-    
+    # Define the war range to process
+    war_ranges = list(range(63, 112))
+
     print("Starting to combine 'extended data' wars (63-111)...")
 
-    # Loop through the specified war range in order
-    for war_number in range(63, 112):
-        filename = os.path.join(input_path, f"war_data_WC{war_number}.csv")
+    # Find the files for the specified war range in order
+    input_files = []
+    for war_number in war_ranges:
+        filename = find_table(input_path, f"war_data_WC{war_number}")
         
-        if os.path.exists(filename):
-            print(f"  - Reading War {war_number}...")
-            df = pd.read_csv(filename)
-            
-            # Add a 'WarNumber' column to keep track of the source
-            df['WarNumber'] = war_number
-            list_of_dataframes.append(df)
+        if filename is not None:
+            input_files.append((war_number, filename))
         else:
             print(f"  - Warning: Could not find data for War {war_number}. Skipping.")
 
-    if not list_of_dataframes:
-        print("❌ No data files found for the specified war range (63-111).")
+    # Only re-combine if an input file, the war ranges, the columns, this
+    # script or the code building the combined files changed since the
+    # output was last written
+    manifest = BuildManifest(script_dir)
+    output_file_path = os.path.join(script_dir, output_filename)
+    params = {'final_columns': final_columns, 'wars': war_ranges, 'windows': DEFAULT_WINDOWS,
+              'code': code_hash(*COMBINE_SOURCES, __file__)}
+    inputs = [filename for _, filename in input_files] + [label_table]
+    outputs = [output_file_path, features_path(output_file_path), windows_path(output_file_path)]
+    if not force and manifest.is_fresh('combiner', output_filename, inputs, params, outputs):
+        print(f"\n✅ Nothing changed upstream. '{output_filename}' is already up to date.")
         return
 
-    # Combine all DataFrames into one
-    print("\nCombining all found files...")
-    combined_df = pd.concat(list_of_dataframes, ignore_index=True)
-
-    # Rename the target column as requested
-    if 'WardenWin_by_Captures' in combined_df.columns:
-        combined_df.rename(columns={'WardenWin_by_Captures': 'Target'}, inplace=True)
-    else:
-        print("  - Warning: 'WardenWin_by_Captures' column not found to rename.")
-
-    # Ensure all required final columns exist before trying to select them
-    # This prevents errors if a file was missing a column for some reason
-    columns_to_select = [col for col in final_columns if col in combined_df.columns]
-    
-    # Select and reorder the columns for the final dataset
-    final_df = combined_df[columns_to_select]
+    if not input_files:
+        print("❌ No data files found for the specified war range (63-111).")
+        return
 
-    # Save the final combined dataset to a new CSV file
-    output_file_path = os.path.join(script_dir, output_filename)
-    final_df.to_csv(output_file_path, index=False)
+    # Stream each war's final columns straight into the combined file, and
+    # into a memory-mapped feature matrix and rolling-window features for
+    # training
+    print(f"\nCombining {len(input_files)} files into '{output_filename}'...")
+    stream_combine(
+        input_files, final_columns, output_file_path,
+        features_path=features_path(output_file_path),
+        windows_path=windows_path(output_file_path),
+        labels=read_labels(label_table),
+    )
+    manifest.record('combiner', output_filename, inputs, params)
+    manifest.save()
     
     print(f"\n✅ Success! Combined data saved to '{output_filename}'.")
 
 # --- Run the script ---
 if __name__ == "__main__":
-    combine_extended_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Combines the per-war CSVs into a single dataset.")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-combine even if the build manifest says nothing changed")
+    add_format_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args()
+    apply_storage_arguments(args)
+    instrument.configure(args)
+    with instrument.profiled(args.profile):
+        combine_extended_data(force=args.force)
\ No newline at end of file
@@ -1,8 +1,36 @@
-import pandas as pd
-import glob
 import os
+import sys
 
-def add_target_variable():
+# Make the shared 'warwatch' package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch.manifest import run_incremental
+from warwatch.parallel import script_main
+from warwatch.storage import find_tables, read_table, table_path, write_table
+from warwatch.transforms import add_target
+
+def add_target_to_file(filename, output_path_folder, output_folder):
+    """
+    Adds the binary target variable to one CSV file and saves it.
+    """
+    base_filename = os.path.basename(filename)
+    print(f"Processing: {base_filename}")
+
+    df = read_table(filename)
+
+    # Add the binary target based on the final row's capture counts
+    df = add_target(df)
+    if df is None:
+        return
+
+    # Define the full path for the new output file
+    output_file_path = table_path(output_path_folder, base_filename)
+
+    # Save the modified DataFrame to the final location
+    write_table(df, output_file_path)
+
+    print(f"  - ✅ Added target variable and saved to '{output_folder}'.")
+
+def add_target_variable(jobs=1, force=False):
     """
     A standalone script that adds a binary target variable to each CSV file
     based on the capture count in the final row.
@@ -26,8 +54,7 @@ def add_target_variable():
         return
 
     # Find all CSV files within the input folder
-    search_pattern = os.path.join(input_path, "*.csv")
-    csv_files = glob.glob(search_pattern)
+    csv_files = find_tables(input_path)
 
     if not csv_files:
         print(f"❌ No CSV files found inside the '{input_folder}' folder.")
@@ -35,50 +62,14 @@ def add_target_variable():
 
     print(f"Found {len(csv_files)} files to process for target variable creation...\n")
 
-    for filename in csv_files:
-        base_filename = os.path.basename(filename)
-        print(f"Processing: {base_filename}")
-        
-        try:
-            df = pd.read_csv(filename)
-            
-            # Check if file is empty or missing required columns
-            if df.empty or 'WardenCaptures' not in df.columns or 'ColonialCaptures' not in df.columns:
-                print("  - ⚠️ File is empty or missing 'Captures' columns. Skipping.")
-                continue
-
-            # --- Core Logic to Determine Winner ---
-            # Get the very last row of data
-            last_row = df.iloc[-1]
-            
-            # Get the capture counts from the last row
-            warden_captures = pd.to_numeric(last_row['WardenCaptures'], errors='coerce')
-            colonial_captures = pd.to_numeric(last_row['ColonialCaptures'], errors='coerce')
-
-            # Determine the target value (1 for Warden win, 0 for Colonial win or tie)
-            if warden_captures > colonial_captures:
-                target_value = 1
-                print("  - Warden final capture lead. Target = 1")
-            else:
-                target_value = 0
-                print("  - Colonial final capture lead or tie. Target = 0")
-
-            # Add the new column and fill it with the target value
-            df['Target'] = target_value
-            
-            # Define the full path for the new output file
-            output_file_path = os.path.join(output_path_folder, base_filename)
-            
-            # Save the modified DataFrame to the final location
-            df.to_csv(output_file_path, index=False)
-            
-            print(f"  - ✅ Added target variable and saved to '{output_folder}'.")
-
-        except Exception as e:
-            print(f"  - ❌ An error occurred while processing {base_filename}: {e}")
+    run_incremental(
+        'onehotencoder', add_target_to_file, csv_files, output_path_folder, output_folder,
+        folder=script_dir, output_folder=output_path_folder, params={},
+        source_files=[__file__], jobs=jobs, force=force,
+    )
     
     print(f"\n--- Final processing complete. Your final dataset with target variables is in the '{output_folder}' folder. ---")
 
 # --- Run the script ---
 if __name__ == "__main__":
-    add_target_variable()
\ No newline at end of file
+    script_main(add_target_variable, "Adds a binary target variable to every cleaned CSV file.")
\ No newline at end of file
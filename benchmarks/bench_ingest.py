@@ -0,0 +1,113 @@
+"""
+Compares CSV ingest throughput of the pandas and pyarrow reader engines.
+
+Reads the repository's real files through storage.read_table, the same
+path every script loads data with, once per engine:
+
+    per-war   every war_data_WC*.csv in the two dataset folders: the raw
+              files and each stage's output folder
+    combined  the combined datasets in the dataset folders and Usable Data
+
+Both engines must return identical frames for every file; the benchmark
+stops if they don't. Results can be saved as JSON:
+
+    python benchmarks/bench_ingest.py --repeats 5 --output ingest.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Make the shared package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch import storage
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_FOLDERS = ['Basic Data (Uncleaned)', 'Population Extended (Uncleaned)']
+
+ENGINES = ['pandas', 'pyarrow']
+
+
+def file_sets():
+    """
+    Returns {name: [paths]} of the real files to read.
+    """
+    per_war, combined = [], []
+    for folder in DATASET_FOLDERS:
+        per_war += sorted(glob.glob(os.path.join(REPO_ROOT, folder, '**', 'war_data_WC*.csv'), recursive=True))
+        combined += sorted(glob.glob(os.path.join(REPO_ROOT, folder, 'Data*.csv')))
+    combined += sorted(glob.glob(os.path.join(REPO_ROOT, 'Usable Data', '*.csv')))
+    return {'per-war': per_war, 'combined': [path for path in combined if not path.endswith('_windows.csv')]}
+
+
+def read_all(paths):
+    return [storage.read_table(path) for path in paths]
+
+
+def check_engines_agree(paths):
+    """
+    Returns the first file the two engines read differently, or None.
+    """
+    for path in paths:
+        frames = []
+        for engine in ENGINES:
+            storage.set_csv_engine(engine)
+            frames.append(storage.read_table(path))
+        first, second = frames
+        if not first.equals(second) or list(first.dtypes) != list(second.dtypes):
+            return path
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV ingest throughput of each reader engine.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats; the best run is reported")
+    parser.add_argument("--output", help="Where to save the JSON results (default: don't save)")
+    args = parser.parse_args()
+
+    if storage.pa_csv is None:
+        sys.exit("❌ The pyarrow engine needs pyarrow. Install it with 'pip install pyarrow'.")
+
+    print(f"{'files':<9} {'engine':<8} {'count':>5} {'MB':>7} {'rows':>9} {'time (ms)':>10} {'MB/s':>8} {'rows/s':>12}")
+    results = []
+    for name, paths in file_sets().items():
+        if not paths:
+            print(f"{name:<9} (no files found)")
+            continue
+        different = check_engines_agree(paths)
+        if different:
+            sys.exit(f"❌ The engines read '{os.path.relpath(different, REPO_ROOT)}' differently.")
+
+        size_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+        rows = sum(len(df) for df in read_all(paths))
+        for engine in ENGINES:
+            storage.set_csv_engine(engine)
+            seconds = min(timeit.repeat(lambda: read_all(paths), number=1, repeat=args.repeats))
+            results.append({'files': name, 'engine': engine, 'count': len(paths), 'mb': size_mb, 'rows': rows,
+                            'seconds': seconds, 'mb_per_s': size_mb / seconds, 'rows_per_s': rows / seconds})
+            print(f"{name:<9} {engine:<8} {len(paths):>5} {size_mb:>7.2f} {rows:>9} {seconds * 1e3:>10.1f} "
+                  f"{size_mb / seconds:>8.1f} {rows / seconds:>12,.0f}")
+
+    if args.output:
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'pyarrow': storage.pa.__version__,
+            'cpus': os.cpu_count(),
+            'repeats': args.repeats,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print(f"\n✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import csv
+import os
+import re
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+
+# Make the scraper importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scrapertest3
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_PAGE = os.path.join(BENCH_DIR, 'fixtures', 'war_page_WC106.html')
+FIXTURE_SOURCE = os.path.join(
+    os.path.dirname(BENCH_DIR), 'Population Extended (Uncleaned)', 'cleaned_data', 'war_data_WC106.csv'
+)
+
+
+def build_fixture_page(source_csv, output_html):
+    """
+    Rebuilds a foxholestats-style page from a cleaned war CSV, with one
+    data1.addRow([...]); call per row in the same layout the site uses.
+    """
+    with open(source_csv, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        lines = ["<html><head><script>", "function drawChart() {"]
+        for row in reader:
+            timestamp_ms = int(time.mktime(datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S').timetuple())) * 1000
+            values = [f"'{v}'" if '/' in v else v for v in row[1:]]
+            lines.append(f"data1.addRow([new Date({timestamp_ms}),{','.join(values)},0]);")
+        lines += ["}", "</script></head><body></body></html>"]
+
+    os.makedirs(os.path.dirname(output_html), exist_ok=True)
+    with open(output_html, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"Built fixture page with {len(lines) - 4} rows from {os.path.basename(source_csv)}.")
+
+
+def regex_parse_rows(html_content):
+    """
+    The original parsing path: findall over the whole page, then one regex
+    search and one strftime call per row.
+    """
+    rows = []
+    pattern = re.compile(r"data1\.addRow\(\[(.*?)\]\);")
+    for row_string in pattern.findall(html_content):
+        try:
+            parts = row_string.split(',')
+            timestamp_ms = int(re.search(r'\d+', parts[0]).group())
+            timestamp = datetime.fromtimestamp(timestamp_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')
+            rows.append([timestamp] + [p.strip().replace("'", "") for p in parts[1:]])
+        except (IndexError, AttributeError, ValueError):
+            continue
+    return rows
+
+
+def run_regex(html_content):
+    # The old scraper held every parsed row in memory before writing
+    return len(regex_parse_rows(html_content))
+
+
+def page_chunks(html_content):
+    return (html_content[i:i + scrapertest3.CHUNK_SIZE] for i in range(0, len(html_content), scrapertest3.CHUNK_SIZE))
+
+
+def run_streaming(html_content):
+    return sum(1 for _ in scrapertest3.parse_war_rows(page_chunks(html_content)))
+
+
+def run_streaming_archived(html_content):
+    # What a scrape does: parse while every row is archived
+    with tempfile.TemporaryDirectory() as folder, \
+            scrapertest3.PayloadArchive(os.path.join(folder, 'archive.npz')) as archive:
+        rows = sum(1 for _ in scrapertest3.parse_war_rows(page_chunks(html_content), archive=archive))
+        archive.save()
+    return rows
+
+
+def archive_page(html_content, path):
+    """
+    Archives the page's rows the way the scraper does, at `path`.
+    """
+    with scrapertest3.PayloadArchive(path) as archive:
+        for _ in scrapertest3.parse_war_rows(page_chunks(html_content), archive=archive):
+            pass
+        archive.save()
+    print(f"Archive: {os.path.getsize(path) / 1e6:.2f} MB")
+
+
+def archived_rows(path):
+    return [row for timestamps, values in scrapertest3.iter_archive(path)
+            for row in scrapertest3.archived_rows(timestamps, values)]
+
+
+def run_archive(path):
+    # What --reparse does per war
+    return sum(len(scrapertest3.archived_rows(timestamps, values))
+               for timestamps, values in scrapertest3.iter_archive(path))
+
+
+def measure(func, source, repeats):
+    seconds = min(timeit.repeat(lambda: func(source), number=1, repeat=repeats))
+    tracemalloc.start()
+    rows = func(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the regex and streaming addRow parsers.")
+    parser.add_argument("--page", default=FIXTURE_PAGE, help="Saved page to parse")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Repeat the page's rows this many times to simulate a longer war")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats; the best run is reported")
+    parser.add_argument("--rebuild-fixture", action="store_true",
+                        help=f"Regenerate the fixture page from {os.path.basename(FIXTURE_SOURCE)}")
+    args = parser.parse_args()
+
+    if args.rebuild_fixture or not os.path.exists(args.page):
+        build_fixture_page(FIXTURE_SOURCE, args.page)
+
+    with open(args.page, encoding='utf-8') as f:
+        html_content = f.read() * args.scale
+
+    # Both paths must produce exactly the same rows
+    chunks = [html_content[i:i + 4096] for i in range(0, len(html_content), 4096)]
+    if list(scrapertest3.parse_war_rows(chunks)) != regex_parse_rows(html_content):
+        print("❌ Streaming parser output differs from the regex parser.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as folder:
+        archive_path = os.path.join(folder, 'archive.npz')
+        archive_page(html_content, archive_path)
+        if archived_rows(archive_path) != regex_parse_rows(html_content):
+            print("❌ Rows rebuilt from the archive differ from the regex parser.")
+            sys.exit(1)
+
+        print(f"Page: {os.path.basename(args.page)} x{args.scale} ({len(html_content) / 1e6:.2f} MB)\n")
+        print(f"{'parser':<18} {'rows':>8} {'time (ms)':>10} {'us/row':>8} {'peak (MB)':>10}")
+        for name, func, source in [("regex", run_regex, html_content), ("streaming", run_streaming, html_content),
+                                   ("streaming+archive", run_streaming_archived, html_content),
+                                   ("archive", run_archive, archive_path)]:
+            rows, seconds, peak = measure(func, source, args.repeats)
+            print(f"{name:<18} {rows:>8} {seconds * 1e3:>10.1f} {seconds / rows * 1e6:>8.2f} {peak / 1e6:>10.2f}")
+
+if __name__ == "__main__":
+    main()
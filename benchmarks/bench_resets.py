@@ -0,0 +1,179 @@
+"""
+Checks the vectorized casualty-reset cleaning against the old row loop.
+
+cleaner2 used to find pre-war resets by walking every row with df.iloc,
+four lookups per row. This keeps that loop, verbatim, as the reference
+and runs every war_data_WC*.csv in the two dataset folders through it and
+through transforms.advanced_clean, the vectorized cleaning cleaner2 now
+uses:
+
+    as-is     each file as it is in the repository
+    pre-war   each file with a synthetic pre-war segment in front of it
+              (its last rows, so both casualty counts drop where the real
+              data starts) and every third row of the war zeroed, so the
+              truncation and zero-row steps both have work to do
+
+The two must write exactly the same CSV text for every file; the
+benchmark stops at the first that doesn't. Then both are timed over all
+the files:
+
+    python benchmarks/bench_resets.py --output resets.json
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Make the shared package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from warwatch import transforms
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_FOLDERS = ['Basic Data (Uncleaned)', 'Population Extended (Uncleaned)']
+
+# Rows of a war copied in front of it as its synthetic pre-war segment
+PRE_WAR_ROWS = 20
+
+
+def row_loop_clean(df):
+    """
+    cleaner2's cleaning as it was before it was vectorized, minus the
+    printing: returns the cleaned frame, or None if the war is skipped.
+    """
+    if df.empty or 'WardenCasualties' not in df.columns or 'ColonialCasualties' not in df.columns:
+        return None
+
+    for col in ['WardenCasualties', 'ColonialCasualties']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df.dropna(subset=['WardenCasualties', 'ColonialCasualties'], inplace=True)
+    df = df.astype({'WardenCasualties': int, 'ColonialCasualties': int})
+
+    last_reset_index = -1
+    if len(df) > 1:
+        for i in range(1, len(df)):
+            if df.iloc[i]['WardenCasualties'] < df.iloc[i-1]['WardenCasualties'] and \
+               df.iloc[i]['ColonialCasualties'] < df.iloc[i-1]['ColonialCasualties']:
+                last_reset_index = i
+
+    if last_reset_index != -1:
+        df = df.iloc[last_reset_index:].copy()
+
+    df.reset_index(drop=True, inplace=True)
+
+    if not df.empty:
+        first_action_index = (df['WardenCasualties'] > 0) | (df['ColonialCasualties'] > 0)
+        if first_action_index.any():
+            first_action_index = first_action_index.idxmax()
+            rows_to_remove = df[(df.index > first_action_index) & (df['WardenCasualties'] == 0) & (df['ColonialCasualties'] == 0)]
+            if not rows_to_remove.empty:
+                df.drop(rows_to_remove.index, inplace=True)
+
+    cols_to_keep = [col for col in df.columns if not str(col).startswith('Column_')]
+    return df[cols_to_keep]
+
+
+def vectorized_clean(df):
+    # advanced_clean reports what it removed; only the frame is compared
+    with contextlib.redirect_stdout(io.StringIO()):
+        return transforms.advanced_clean(df)
+
+
+def with_pre_war(df):
+    """
+    Returns a copy of a war with a synthetic pre-war segment in front of it
+    and every third row's casualties set to zero.
+    """
+    df = pd.concat([df.tail(PRE_WAR_ROWS), df], ignore_index=True)
+    for col in transforms.CASUALTY_COLUMNS:
+        if col in df.columns:
+            df.loc[PRE_WAR_ROWS::3, col] = 0
+    return df
+
+
+def war_files():
+    paths = []
+    for folder in DATASET_FOLDERS:
+        paths += sorted(glob.glob(os.path.join(REPO_ROOT, folder, '**', 'war_data_WC*.csv'), recursive=True))
+    return paths
+
+
+def as_csv(df):
+    return None if df is None else df.to_csv(index=False)
+
+
+def check_identical(wars):
+    """
+    Returns the first war the two cleanings write differently, or None,
+    and how many of the wars before it the row loop truncated.
+    """
+    truncated = 0
+    for name, df in wars:
+        expected = row_loop_clean(df.copy())
+        if as_csv(expected) != as_csv(vectorized_clean(df.copy())):
+            return name, truncated
+        truncated += expected is not None and len(expected) < len(df)
+    return None, truncated
+
+
+def clean_all(clean, wars):
+    for _, df in wars:
+        clean(df.copy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the vectorized reset cleaning against the row loop.")
+    parser.add_argument("--repeats", type=int, default=1,
+                        help="Timing repeats; the best run is reported (the row loop takes minutes)")
+    parser.add_argument("--output", help="Where to save the JSON results (default: don't save)")
+    args = parser.parse_args()
+
+    paths = war_files()
+    if not paths:
+        sys.exit("❌ No war_data_WC*.csv files found in the dataset folders.")
+    frames = [(os.path.relpath(path, REPO_ROOT), pd.read_csv(path)) for path in paths]
+    variants = {
+        'as-is': frames,
+        'pre-war': [(name, with_pre_war(df)) for name, df in frames],
+    }
+
+    print(f"{'files':<8} {'count':>5} {'rows':>9} {'cut':>5} {'row loop (ms)':>14} {'vectorized (ms)':>16} {'speedup':>8}")
+    results = []
+    for variant, wars in variants.items():
+        different, truncated = check_identical(wars)
+        if different:
+            sys.exit(f"❌ The row loop and the vectorized cleaning differ on '{different}' ({variant}).")
+
+        rows = sum(len(df) for _, df in wars)
+        timings = {}
+        for name, clean in [('row_loop', row_loop_clean), ('vectorized', vectorized_clean)]:
+            timings[name] = min(timeit.repeat(lambda: clean_all(clean, wars), number=1, repeat=args.repeats))
+        results.append({'files': variant, 'count': len(wars), 'rows': rows, 'truncated': int(truncated),
+                        'row_loop_seconds': timings['row_loop'], 'vectorized_seconds': timings['vectorized']})
+        print(f"{variant:<8} {len(wars):>5} {rows:>9} {truncated:>5} {timings['row_loop'] * 1e3:>14.1f} "
+              f"{timings['vectorized'] * 1e3:>16.1f} {timings['row_loop'] / timings['vectorized']:>7.1f}x")
+
+    print("\n✅ Identical output for every file.")
+    if args.output:
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'cpus': os.cpu_count(),
+            'repeats': args.repeats,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Times every stage of the pipeline on a saved page and on synthetic wars.
+
+Fixtures are the saved WC106 page plus synthetic extended-layout wars of
+1k, 10k and 100k rows, each with a pre-war reset, a few mid-war zero rows
+and an unnamed column, so every cleaning step has work to do. The
+synthetic wars are generated fresh (with a fixed seed) into a temporary
+folder, so nothing large is committed.
+
+The fused_clean stage times transforms.clean_war, which does the reset,
+zero-row and column steps in one pass, against the three step stages.
+
+Each stage reports rows/s, peak traced memory and the number of files it
+wrote. Results are saved as JSON so two commits can be compared:
+
+    python benchmarks/bench_stages.py --output before.json
+    # ...make a change...
+    python benchmarks/bench_stages.py --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Make the scraper and the shared package importable from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scrapertest3
+from bench_parser import FIXTURE_PAGE, build_fixture_page
+from warwatch import storage, transforms
+from warwatch.combine import stream_combine
+from warwatch.pipeline import EXTENDED_COLUMNS
+from warwatch.schema import HEADERS_POP_EXT_63_111
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+SYNTHETIC_SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000}
+
+# The combine stage joins this many copies of the labelled war
+COMBINE_WARS = 8
+
+# The columns the later stages drop from the extended layout
+DROPPED_COLUMNS = [
+    'WardenCasualtyRateHr', 'ColonialCasualtyRateHr', 'WardenQueued', 'ColonialQueued',
+    'WardenPlayersMore', 'ColonialPlayersMore', 'WardenQueueWarning', 'ColonialQueueWarning'
+]
+
+
+def make_synthetic_war(rows, seed=0):
+    """
+    Returns a raw extended-layout war of `rows` rows, sampled every 30
+    minutes, without the unnamed last column. The first 2% of rows are a
+    pre-war test run ending in a casualty reset, and about 0.5% of the
+    rows after it report zero casualties.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2022-01-01 06:00:00')
+    timestamps = pd.date_range(start, periods=rows, freq='30min').strftime('%Y-%m-%d %H:%M:%S')
+
+    warden = np.cumsum(rng.integers(0, 2000, rows))
+    colonial = np.cumsum(rng.integers(0, 2000, rows))
+    reset = max(rows // 50, 2)
+    warden[reset:] -= warden[reset]
+    colonial[reset:] -= colonial[reset] - 1
+
+    # The Wardens take a while to score after the reset. Zero rows in that
+    # stretch aren't resets (Warden casualties don't drop), so they are
+    # left for the zero-casualty step
+    quiet = max(rows // 20, 4)
+    warden[reset:reset + quiet] = 0
+    zero_rows = rng.choice(np.arange(reset + 2, reset + quiet), size=max(rows // 200, 1), replace=False)
+    colonial[zero_rows] = 0
+
+    def counts(low, high):
+        return rng.integers(low, high, rows)
+
+    warden_rate, colonial_rate = counts(100, 3000), counts(100, 3000)
+    data = {
+        "Timestamp": timestamps,
+        "WardenPlayers": counts(100, 1500), "ColonialPlayers": counts(100, 1500),
+        "WardenCaptures": np.cumsum(rng.integers(0, 2, rows)) % 500,
+        "ColonialCaptures": np.cumsum(rng.integers(0, 2, rows)) % 500,
+        "WardenCasualties": warden, "ColonialCasualties": colonial,
+        "WardenCasualtyRate": warden_rate, "WardenCasualtyRateHr": [f"{v}/hr" for v in warden_rate],
+        "ColonialCasualtyRate": colonial_rate, "ColonialCasualtyRateHr": [f"{v}/hr" for v in colonial_rate],
+        "SteamPlayers": counts(1000, 9000),
+        "WardenPlayHours": np.cumsum(counts(0, 500)), "ColonialPlayHours": np.cumsum(counts(0, 500)),
+        "WardenQueued": counts(0, 200), "ColonialQueued": counts(0, 200),
+        "WardenPlayersMore": counts(0, 500), "ColonialPlayersMore": counts(0, 500),
+        "WardenQueueWarning": counts(0, 2), "ColonialQueueWarning": counts(0, 2),
+    }
+    # The page builder adds the trailing unnamed column itself
+    return pd.DataFrame(data, columns=HEADERS_POP_EXT_63_111[:-1])
+
+
+def build_fixtures(fixture_dir, sizes):
+    """
+    Returns {name: page path}: the saved page plus one synthetic page per
+    selected size, built the same way as the parser benchmark's fixture.
+    """
+    pages = {'WC106': FIXTURE_PAGE}
+    for name in sizes:
+        source_csv = os.path.join(fixture_dir, f"synthetic_{name}.csv")
+        make_synthetic_war(SYNTHETIC_SIZES[name]).to_csv(source_csv, index=False)
+        pages[name] = os.path.join(fixture_dir, f"synthetic_{name}.html")
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_fixture_page(source_csv, pages[name])
+    return pages
+
+
+# --- Stages: each takes the state dict, updates it and returns (rows, files written) ---
+
+def stage_parse(state):
+    with open(state['page'], encoding='utf-8') as f:
+        chunks = iter(lambda: f.read(scrapertest3.CHUNK_SIZE), '')
+        header, positions, _ = scrapertest3.get_headers_for_war(106)
+        storage.write_rows(state['raw_path'], header, scrapertest3.parse_war_rows(chunks, positions=positions))
+    state['raw'] = storage.read_table(state['raw_path'])
+    return len(state['raw']), 1
+
+
+def stage_reset_detection(state):
+    df = state['raw'].copy()
+    state['reset'] = transforms.truncate_before_last_reset(df)
+    return len(df), 0
+
+
+def stage_zero_casualty_removal(state):
+    df = state['reset'].copy()
+    rows = len(df)
+    state['zeros'] = transforms.remove_midwar_zero_rows(df)
+    return rows, 0
+
+
+def stage_column_drops(state):
+    df = transforms.drop_unnamed_columns(state['zeros'])
+    state['dropped'] = transforms.drop_columns(df, DROPPED_COLUMNS)
+    return len(df), 0
+
+
+def stage_fused_clean(state):
+    # The three steps above in clean_war's single pass, for comparison
+    transforms.clean_war(state['raw'])
+    return len(state['raw']), 0
+
+
+def stage_targets(state):
+    df = state['dropped']
+    for name, transform in [('target', transforms.add_target), ('margin', transforms.add_win_margin),
+                            ('squared', transforms.add_squared_win_margin)]:
+        path = storage.table_path(state['work_dir'], f"war_data_{name}")
+        storage.write_table(transform(df), path)
+        state[name] = path
+    return len(df), 3
+
+
+def stage_combine(state):
+    input_files = [(war_number, state['margin']) for war_number in range(COMBINE_WARS)]
+    output_path = os.path.join(state['work_dir'], 'combined.csv')
+    stream_combine(input_files, EXTENDED_COLUMNS + ['WinMargin'], output_path)
+    return len(state['dropped']) * COMBINE_WARS, 1
+
+
+STAGES = [
+    ('parse', stage_parse),
+    ('reset_detection', stage_reset_detection),
+    ('zero_casualty_removal', stage_zero_casualty_removal),
+    ('column_drops', stage_column_drops),
+    ('fused_clean', stage_fused_clean),
+    ('targets', stage_targets),
+    ('combine', stage_combine),
+]
+
+
+def run_stage(func, state, repeats):
+    """
+    Returns (rows, files, best seconds, peak bytes). Peak memory comes from
+    a separate traced run, so tracing doesn't slow the timed ones.
+    """
+    timings = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            rows, files = func(state)
+            timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, files, min(timings), peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, repeats, fmt):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = build_fixtures(tmp, sizes)
+        for fixture, page in pages.items():
+            work_dir = os.path.join(tmp, fixture)
+            os.makedirs(work_dir)
+            state = {'page': page, 'work_dir': work_dir,
+                     'raw_path': storage.table_path(work_dir, 'war_data_raw', fmt)}
+            for stage, func in STAGES:
+                rows, files, seconds, peak = run_stage(func, state, repeats)
+                results.append({
+                    'fixture': fixture, 'stage': stage, 'rows': rows, 'seconds': seconds,
+                    'rows_per_s': rows / seconds if seconds else None,
+                    'peak_mb': peak / 1e6, 'files_written': files,
+                })
+                print(f"{fixture:<6} {stage:<22} {rows:>8} {rows / seconds:>12,.0f} {peak / 1e6:>9.2f} {files:>6}")
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Prints each stage's throughput against a saved baseline and returns the
+    number of stages that got slower by more than `threshold`.
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    before = {(r['fixture'], r['stage']): r for r in baseline['results']}
+
+    print(f"\nCompared with {os.path.basename(baseline_path)} (commit {baseline.get('commit')}):")
+    regressions = 0
+    for result in results:
+        old = before.get((result['fixture'], result['stage']))
+        if not old or not old['rows_per_s'] or not result['rows_per_s']:
+            continue
+        change = result['rows_per_s'] / old['rows_per_s'] - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  ⚠️ slower"
+            regressions += 1
+        print(f"  {result['fixture']:<6} {result['stage']:<22} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on saved and synthetic wars.")
+    parser.add_argument("--sizes", default=','.join(SYNTHETIC_SIZES),
+                        help=f"Synthetic war sizes to run (default: {','.join(SYNTHETIC_SIZES)})")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats; the best run is reported")
+    parser.add_argument("--format", choices=sorted(storage.EXTENSIONS), default='csv',
+                        help="Storage format for the files the stages write (default: csv)")
+    parser.add_argument("--output", help="Where to save the JSON results (default: benchmarks/results/stages-<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="A previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Slowdown that counts as a regression when comparing (default: 0.10)")
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SYNTHETIC_SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    storage.set_format(args.format)
+
+    print(f"{'fixture':<6} {'stage':<22} {'rows':>8} {'rows/s':>12} {'peak (MB)':>9} {'files':>6}")
+    results = run_benchmarks(sizes, args.repeats, args.format)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'format': args.format,
+        'repeats': args.repeats,
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"stages-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"\n✅ Results saved to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
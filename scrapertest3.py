@@ -1,98 +1,845 @@
+import argparse
+import calendar
+import codecs
+import itertools
+import numpy as np
 import requests
-import csv
+import json
+import os
+import random
 import re
+import threading
 import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 
-def scrape_and_process_war(war_number):
+from warwatch import instrument, resets, storage
+from warwatch.live import LiveWar
+from warwatch.parallel import StageError, add_jobs_argument, run_per_file
+from warwatch.schema import layout_for_war, scraped_columns
+
+# urllib3 decodes brotli-compressed responses when either package is installed
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# The stats site and the full range of wars it has data for
+BASE_URL = "https://foxholestats.com/index.php"
+FIRST_WAR = 16
+LAST_WAR = 126
+
+# Where raw pages and their ETag/Last-Modified validators are cached
+CACHE_DIR = "http_cache"
+
+# Where every war's addRow payloads are archived, split into all of their
+# values, so the CSVs can be rebuilt offline when the column mapping changes
+ARCHIVE_DIR = "payload_archive"
+
+# Pages are streamed and parsed in chunks of this many bytes
+CHUNK_SIZE = 64 * 1024
+
+# Markers around each row of chart data in the page
+ADD_ROW_START = "data1.addRow(["
+ADD_ROW_END = "]);"
+TIMESTAMP_DIGITS = re.compile(r'\d+')
+
+# A column of the archive that can be stored as int64: one canonical
+# integer per line
+INTEGER_COLUMN = re.compile(r'(?:(?:0|[1-9][0-9]{0,17})\n)*')
+
+# Rows of a war held in memory before they are compressed into its archive
+ARCHIVE_CHUNK_ROWS = 2048
+
+# How often --follow polls the live war, in seconds
+FOLLOW_INTERVAL = 300
+
+# The dataset each header structure's live war is combined into
+FOLLOW_DATASETS = {"Basic Data": 'basic', "Population Data Extended (63-111)": 'extended'}
+
+# HTTP statuses worth retrying; anything else (e.g. 404) fails straight away
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Seconds to wait for a connection, and for each read of a response, before
+# giving up on a request (and retrying it)
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# The pages are multi-megabyte, very repetitive HTML, so always ask for
+# them compressed; brotli only if it can be decoded
+ACCEPT_ENCODING = "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter. Every request takes one token,
+    and tokens refill at `rate` per second up to `capacity`. Workers block
+    until a token is free, so the request rate stays polite no matter how
+    many fetches are running at once.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class PayloadArchive:
+    """
+    Archives a war's rows as its page is parsed: each row's epoch-ms
+    timestamp and every one of its cleaned values, before any columns are
+    selected. Every `chunk_rows` rows are compressed into the .npz as one
+    chunk of arrays, so memory stays flat however long the war is. Within
+    a chunk, shorter rows are padded with ''. Columns of plain integers,
+    most of them running totals, are stored as the change from the row
+    before, which compresses far better than their text; anything else,
+    e.g. '2463/hr', is kept as UTF-8 text.
+
+    Nothing appears at `path` until save(). An archive that isn't saved is
+    deleted when its `with` block ends.
+    """
+    def __init__(self, path, chunk_rows=ARCHIVE_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.timestamps = []
+        self.rows = []
+        self.chunks = 0
+        self.archived = 0
+        self.zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.zip is not None:
+            self.zip.close()
+            os.remove(self.path + '.part')
+            self.zip = None
+
+    def __len__(self):
+        return self.archived + len(self.rows)
+
+    def add(self, timestamp_ms, columns):
+        self.timestamps.append(timestamp_ms)
+        self.rows.append(columns)
+        if len(self.rows) >= self.chunk_rows:
+            self._write_chunk()
+
+    def save(self):
+        self._write_chunk()
+        if self.zip is None:
+            self._open()
+        # Written under a temporary name first, so an interrupted scrape
+        # never leaves a truncated archive behind
+        self.zip.close()
+        self.zip = None
+        os.replace(self.path + '.part', self.path)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.zip = zipfile.ZipFile(self.path + '.part', 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def _write_chunk(self):
+        if not self.rows:
+            return
+        if self.zip is None:
+            self._open()
+
+        width = max(map(len, self.rows))
+        columns = np.array([row + [''] * (width - len(row)) for row in self.rows], dtype=str)
+        columns = columns.reshape(len(self.rows), width).T
+        # Only integers that read back as the same text, so the CSVs rebuilt
+        # from the archive match the page exactly
+        numeric = np.array([INTEGER_COLUMN.fullmatch('\n'.join(column.tolist()) + '\n') is not None
+                            for column in columns], dtype=bool)
+        numbers = columns[numeric].astype(np.int64)
+        arrays = {
+            'timestamps': np.diff(np.array(self.timestamps, dtype=np.int64), prepend=0),
+            'numeric': numeric,
+            'numbers': np.diff(numbers, axis=1, prepend=0),
+            'text': np.char.encode(columns[~numeric], 'utf-8'),
+        }
+        # The same layout np.savez_compressed writes, one member at a time
+        for name, array in arrays.items():
+            with self.zip.open(f"{name}{self.chunks}.npy", 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+
+        self.chunks += 1
+        self.archived += len(self.rows)
+        self.timestamps, self.rows = [], []
+
+
+def archive_path(archive_dir, param):
+    return os.path.join(archive_dir, f"{param}.npz")
+
+
+def iter_archive(path):
+    """
+    Yields a war's archived rows one chunk at a time, as (epoch-ms
+    timestamps, (rows, values) array of text).
+    """
+    with np.load(path) as archive:
+        chunks = sum(name.startswith('timestamps') for name in archive.files)
+        for chunk in range(chunks):
+            numeric = archive[f'numeric{chunk}']
+            timestamps = np.cumsum(archive[f'timestamps{chunk}'])
+            numbers = np.cumsum(archive[f'numbers{chunk}'], axis=1).astype(str)
+            text = np.char.decode(archive[f'text{chunk}'], 'utf-8')
+
+            columns = np.empty((len(numeric), len(timestamps)), dtype=np.result_type(numbers.dtype, text.dtype))
+            columns[numeric] = numbers
+            columns[~numeric] = text
+            yield timestamps, columns.T
+
+
+def get_headers_for_war(war_number):
+    """
+    Returns the header row for a war, the positions of its columns among
+    each row's values, and a label describing which of the 3 header
+    structures it uses. The structures, which of their columns are kept
+    and their column types are declared in warwatch.schema.
+    """
+    layout = layout_for_war(war_number)
+    header, positions = scraped_columns(layout)
+    return header, positions, layout.name
+
+
+def make_session(pool_size=4):
+    """
+    Returns a session that keeps up to `pool_size` connections to the site
+    alive and asks for compressed pages. Every fetch in a run shares it, so
+    a backfill opens a handful of connections instead of one per war.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return session
+
+
+def fetch_page(page_url, limiter=None, retries=0, backoff=2.0, headers=None, session=None, timeout=DEFAULT_TIMEOUT,
+               read=None):
+    """
+    Fetches a page through `session` (or a one-off connection), waiting on
+    the rate limiter before every attempt and retrying network errors,
+    timeouts and 429/5xx responses with exponential backoff. If `read` is
+    given, it is called with each successful response to read its body,
+    and a network error or timeout while it reads retries the whole
+    request too. Returns the response, or raises the last error once
+    retries run out.
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        response = None
+        try:
+            # The span covers the time to the response headers; the body is
+            # read afterwards
+            with instrument.span('http', url=page_url, attempt=attempt + 1) as span:
+                response = (session or requests).get(page_url, headers=headers, stream=True, timeout=timeout)
+                span['status'] = response.status_code
+                response.raise_for_status()
+            if read is not None:
+                read(response)
+            return response
+        except requests.exceptions.RequestException as e:
+            # Hand a failed response's connection back to the pool
+            if response is not None:
+                response.close()
+            status = getattr(e.response, 'status_code', None)
+            if attempt == retries or (status is not None and status not in RETRYABLE_STATUSES):
+                raise
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"  - Attempt {attempt + 1} failed for {page_url} ({e}). Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def load_cache_metadata(cache_dir, param):
+    """
+    Returns the cached validators and completion flag for a war, or None if
+    the war has not been cached yet.
+    """
+    meta_path = os.path.join(cache_dir, f"{param}.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_cached_page(cache_dir, param, chunk_size=CHUNK_SIZE):
+    """
+    Yields a cached page in chunks of text.
+    """
+    with open(os.path.join(cache_dir, f"{param}.html"), encoding='utf-8') as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def write_cache_metadata(cache_dir, param, metadata):
+    with open(os.path.join(cache_dir, f"{param}.json"), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def download_to_cache(response, cache_dir, param, complete, chunk_size=CHUNK_SIZE):
+    """
+    Streams a response's body into the cache along with its
+    ETag/Last-Modified validators; a 304 has no body and is left alone.
+    The page is moved into place and the metadata written only once the
+    body has been fully read, so a half-written cache entry is never used;
+    if the download fails, the partial copy is deleted. Reports the bytes
+    that came over the wire against the decompressed size of the page.
+    """
+    if response.status_code == 304:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    html_path = os.path.join(cache_dir, f"{param}.html")
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    decoded_bytes = 0
+
+    try:
+        with open(html_path + '.part', 'w', encoding='utf-8') as f:
+            # iter_content decompresses; the text is decoded here so the
+            # decompressed size can be counted on the way
+            for data in response.iter_content(chunk_size=chunk_size):
+                decoded_bytes += len(data)
+                f.write(decoder.decode(data))
+            f.write(decoder.decode(b'', final=True))
+    except BaseException:
+        os.remove(html_path + '.part')
+        raise
+    os.replace(html_path + '.part', html_path)
+    report_transfer(response, response.raw.tell(), decoded_bytes)
+
+    metadata = {
+        "url": response.url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": datetime.now().isoformat(timespec='seconds'),
+        "complete": complete,
+    }
+    write_cache_metadata(cache_dir, param, metadata)
+
+
+def report_transfer(response, wire_bytes, decoded_bytes):
+    """
+    Prints and traces how many bytes a page took on the wire and how many
+    it decompressed to.
+    """
+    encoding = response.headers.get("Content-Encoding", "identity")
+    saved = 1 - wire_bytes / decoded_bytes if decoded_bytes else 0
+    print(f"Downloaded {wire_bytes / 1e6:.2f} MB ({encoding}) for {decoded_bytes / 1e6:.2f} MB of HTML, "
+          f"{saved:.0%} saved.")
+    instrument.add(bytes_on_wire=wire_bytes, bytes_decoded=decoded_bytes)
+
+
+def iter_war_page(page_url, param, complete, limiter=None, retries=0, cache_dir=CACHE_DIR, refresh=False,
+                  session=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Yields the HTML for a war in chunks, going through the on-disk cache.
+    Finished wars that are already cached are served without touching the
+    network, as long as the cache and `complete` both say the war is over;
+    anything else is fetched with a conditional request, and a 304 reuses
+    the cached copy. A fetched page is downloaded into the cache in full
+    before it is read back, so a download that fails partway can be
+    retried from the start.
+    """
+    metadata = load_cache_metadata(cache_dir, param)
+    if not os.path.exists(os.path.join(cache_dir, f"{param}.html")):
+        metadata = None
+
+    if complete and metadata and metadata.get("complete") and not refresh:
+        print("Using cached page (war is complete).")
+        instrument.add(cache_hits=1)
+        yield from iter_cached_page(cache_dir, param)
+        return
+
+    headers = {}
+    if metadata:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    # The body is read inside fetch_page, so its retries cover the download too
+    def read(response):
+        download_to_cache(response, cache_dir, param, complete)
+
+    response = fetch_page(page_url, limiter=limiter, retries=retries, headers=headers, session=session,
+                          timeout=timeout, read=read)
+
+    with response:
+        if response.status_code == 304:
+            print("Page not modified since last fetch. Using cached copy.")
+            instrument.add(cache_hits=1)
+            if complete and not metadata.get("complete"):
+                metadata["complete"] = True
+                write_cache_metadata(cache_dir, param, metadata)
+    yield from iter_cached_page(cache_dir, param)
+
+
+def iter_add_row_payloads(chunks):
+    """
+    Yields the payload of every data1.addRow([...]); call in a stream of text
+    chunks. Only the unparsed tail of the previous chunk is carried over, so
+    memory stays flat no matter how large the page is.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            start = buffer.find(ADD_ROW_START, pos)
+            if start == -1:
+                # Keep just enough to catch a marker split across two chunks
+                pos = max(pos, len(buffer) - len(ADD_ROW_START) + 1)
+                break
+            end = buffer.find(ADD_ROW_END, start + len(ADD_ROW_START))
+            if end == -1:
+                pos = start
+                break
+            yield buffer[start + len(ADD_ROW_START):end]
+            pos = end + len(ADD_ROW_END)
+        buffer = buffer[pos:]
+
+
+def format_local_timestamps(timestamps_ms):
+    """
+    Formats epoch-millisecond timestamps as local 'YYYY-MM-DD HH:MM:SS'
+    strings in one vectorized pass. The UTC offset is looked up once per
+    15-minute slot instead of once per row; every DST change falls on a
+    slot boundary, so the result matches datetime.fromtimestamp().
+    """
+    seconds = np.asarray(timestamps_ms, dtype=np.int64) // 1000
+    slots, inverse = np.unique(seconds // 900 * 900, return_inverse=True)
+    offsets = np.array(
+        [calendar.timegm(time.localtime(slot)) - slot for slot in slots.tolist()], dtype=np.int64
+    )
+    local = (seconds + offsets[inverse]).astype('datetime64[s]')
+    return np.char.replace(np.datetime_as_string(local, unit='s'), 'T', ' ').tolist()
+
+
+def iter_row_batches(chunks, batch_size=1000, after_ms=None, positions=None, archive=None):
+    """
+    Parses a stream of page chunks into batches of CSV rows: the formatted
+    timestamp followed by the cleaned data columns. Yields each batch as
+    (epoch-millisecond timestamps, rows), so a batch's timestamps can be
+    formatted together. Rows without a timestamp are skipped, as are rows
+    at or before `after_ms` if it is given. If `positions` is given, only
+    the values at those positions are kept, in that order. Every row is
+    also added, with all of its values, to `archive` if one is given.
+    """
+    batch_ms, batch_columns = [], []
+    for payload in iter_add_row_payloads(chunks):
+        head, separator, data = payload.partition(',')
+        match = TIMESTAMP_DIGITS.search(head)
+        if match is None:
+            continue
+        timestamp_ms = int(match.group())
+        if after_ms is not None and timestamp_ms <= after_ms:
+            continue
+        batch_ms.append(timestamp_ms)
+
+        # Quotes are dropped from the whole row at once, and values are only
+        # stripped one by one when the row actually contains whitespace
+        data = data.replace("'", "")
+        columns = data.split(',') if separator else []
+        if ' ' in data or '\t' in data:
+            columns = [c.strip() for c in columns]
+        if archive is not None:
+            archive.add(timestamp_ms, columns)
+        if positions is not None:
+            columns = [columns[i] if i < len(columns) else '' for i in positions]
+        batch_columns.append(columns)
+
+        if len(batch_ms) >= batch_size:
+            yield batch_ms, [[timestamp] + columns for timestamp, columns
+                             in zip(format_local_timestamps(batch_ms), batch_columns)]
+            batch_ms, batch_columns = [], []
+
+    if batch_ms:
+        yield batch_ms, [[timestamp] + columns for timestamp, columns
+                         in zip(format_local_timestamps(batch_ms), batch_columns)]
+
+
+def parse_war_rows(chunks, batch_size=1000, positions=None, archive=None):
+    """
+    Parses a stream of page chunks into CSV rows: the formatted timestamp
+    followed by the cleaned data columns, or only those at `positions`.
+    """
+    for _, rows in iter_row_batches(chunks, batch_size, positions=positions, archive=archive):
+        yield from rows
+
+
+def archived_rows(timestamps, values, positions=None):
+    """
+    Rebuilds a chunk of a war's CSV rows from its archived arrays, exactly
+    as parse_war_rows would from the page: the formatted timestamp followed
+    by the values, or only those at `positions`.
+    """
+    if positions is not None:
+        # A position past the end of a row reads as '', as it does when parsing
+        width = values.shape[1]
+        padded = np.concatenate([values, np.full((len(values), 1), '', dtype=values.dtype)], axis=1)
+        values = padded[:, [i if i < width else width for i in positions]]
+    return [[timestamp] + row for timestamp, row in zip(format_local_timestamps(timestamps), values.tolist())]
+
+
+def scrape_and_process_war(war_number, limiter=None, retries=0, base_url=BASE_URL,
+                           cache_dir=CACHE_DIR, live_war=LAST_WAR, refresh=False, session=None,
+                           timeout=DEFAULT_TIMEOUT, archive_dir=ARCHIVE_DIR):
     """
     Scrapes data for a single war, applies the correct conditional headers,
-    and saves the result to a CSV file.
+    and saves the result as a CSV or Parquet file, depending on the selected
+    storage format. Every row is archived in `archive_dir` too, for
+    reparse_war. Returns True if the war was saved.
+
+    Wars before `live_war` are finished, so once one is cached as complete,
+    archived and its file exists it is skipped entirely unless `refresh` is
+    set. A war cached as complete that `live_war` now says is ongoing is
+    fetched again.
+    """
+    with instrument.span('war', war=war_number):
+        param = f"WC{war_number}"
+        page_url = f"{base_url}?map=Conquest_Total&days={param}"
+        output_filename = storage.table_path('', f"war_data_{param}")
+        complete = war_number < live_war
+
+        print(f"--- Processing War {war_number} ---")
+
+        metadata = load_cache_metadata(cache_dir, param)
+        if (complete and metadata and metadata.get("complete") and not refresh and os.path.exists(output_filename)
+                and os.path.exists(archive_path(archive_dir, param))):
+            print(f"⏭️ War {war_number} is complete and already saved to {output_filename}. Skipping.\n")
+            return True
+
+        print(f"Fetching data from: {page_url}")
+
+        active_headers, positions, structure = get_headers_for_war(war_number)
+        print(f"Applying structure: {structure}")
+
+        try:
+            chunks = iter_war_page(page_url, param, complete, limiter=limiter, retries=retries,
+                                   cache_dir=cache_dir, refresh=refresh, session=session, timeout=timeout)
+            # Only the columns the schema keeps are parsed out and written,
+            # but every value is archived as the rows go by
+            with PayloadArchive(archive_path(archive_dir, param)) as archive:
+                rows = parse_war_rows(chunks, positions=positions, archive=archive)
+
+                # Peek at the first row so no file is created for a page without data
+                first_row = next(rows, None)
+                if first_row is None:
+                    print(f"❌ No data found for War {war_number}. Skipping.")
+                    return False
+
+                # Write the selected header row, then each data row as it is parsed
+                storage.write_rows(output_filename, active_headers, itertools.chain([first_row], rows))
+                archive.save()
+
+            print(f"✅ Success! Data for War {war_number} saved to {output_filename}\n")
+            return True
+
+        except requests.exceptions.RequestException as e:
+            print(f"❌ A network error occurred for War {war_number}: {e}\n")
+            return False
+
+
+def scrape_wars(war_numbers, concurrency=4, rate=1.0, retries=3, base_url=BASE_URL,
+                cache_dir=CACHE_DIR, live_war=LAST_WAR, refresh=False, timeout=DEFAULT_TIMEOUT,
+                archive_dir=ARCHIVE_DIR):
+    """
+    Scrapes several wars with up to `concurrency` fetches in flight at once.
+    All workers share one token bucket, so requests still start at no more
+    than `rate` per second, and one session with a connection per worker.
+    A war that fails for any reason is reported and the rest carry on.
+    Returns the sorted list of wars that failed.
+    """
+    limiter = TokenBucket(rate)
+    failed = []
+
+    with instrument.span('scrape', wars=len(war_numbers), concurrency=concurrency, rate=rate) as span, \
+            make_session(pool_size=concurrency) as session, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(scrape_and_process_war, war_number, limiter, retries, base_url,
+                            cache_dir, live_war, refresh, session, timeout, archive_dir): war_number
+            for war_number in war_numbers
+        }
+        for future in as_completed(futures):
+            war_number = futures[future]
+            try:
+                saved = future.result()
+            except Exception as e:
+                print(f"❌ War {war_number} failed: {type(e).__name__}: {e}\n")
+                saved = False
+            if not saved:
+                failed.append(war_number)
+        span['failed'] = len(failed)
+
+    return sorted(failed)
+
+
+def reparse_war(war_number, archive_dir=ARCHIVE_DIR, cache_dir=CACHE_DIR):
+    """
+    Rebuilds a war's file from its archived rows with the current column
+    mapping, without touching the network. A war scraped before archives
+    were kept is archived from its cached page first. Returns True if the
+    war was saved.
     """
     param = f"WC{war_number}"
-    page_url = f"https://foxholestats.com/index.php?map=Conquest_Total&days={param}"
-    csv_filename = f"war_data_{param}.csv"
-
-    print(f"--- Processing War {war_number} ---")
-    print(f"Fetching data from: {page_url}")
-
-    # Define the 3 different header structures as provided
-    headers_pop_16_19 = [
-        "Timestamp", "WardenPlayers", "ColonialPlayers", "WardenCaptures", "ColonialCaptures", "WardenCasualties",
-        "ColonialCasualties", "WardenCasualtyRate", "WardenCasualtyRateHr", "ColonialCasualityRate",
-        "ColonialCasualityRateHr", "SteamPlayers", "WardenPlayHours", "ColonialPlayHours", "Column_14",
-        "Column_15", "WardenPlayersMore", "ColonialPlayersMore", "Column_18", "Column_19"
-    ]
-    headers_pop_ext_63_111 = [
-        "Timestamp", "WardenPlayers", "ColonialPlayers", "WardenCaptures", "ColonialCaptures", "WardenCasualties",
-        "ColonialCasualties", "WardenCasualtyRate", "WardenCasualtyRateHr", "ColonialCasualtyRate",
-        "ColonialCasualtyRateHr", "SteamPlayers", "WardenPlayHours", "ColonialPlayHours", "WardenQueued",
-        "ColonialQueued", "WardenPlayersMore", "ColonialPlayersMore", "WardenQueueWarning", "ColonialQueueWarning", "Column_20"
-    ]
-    headers_basic = [
-        "Timestamp", "Column_1", "Column_2", "WardenCaptures", "ColonialCaptures", "WardenCasualties",
-        "ColonialCasualties", "WardenCasualtyRate", "WardenCasualtyRateHr", "ColonialCasualityRate",
-        "ColonialCasualityRateHr", "SteamPlayers", "Column_12", "Column_13", "Column_14", "Column_15",
-        "Column_16", "Column_17", "Column_18", "Column_19", "Column_20"
-    ]
-
-    # Determine which header structure to use based on the war number
-    if 16 <= war_number <= 19:
-        active_headers = headers_pop_16_19
-        print("Applying structure: Population Data (16-19)")
-    elif 63 <= war_number <= 111:
-        # Correcting user-provided headers for consistency
-        headers_pop_ext_63_111 = [h.replace(' ', '').replace('/hr', 'Hr') for h in headers_pop_ext_63_111]
-        active_headers = headers_pop_ext_63_111
-        print("Applying structure: Population Data Extended (63-111)")
-    else:  # This covers wars 20-62 and 112-126
-        active_headers = headers_basic
-        print("Applying structure: Basic Data")
+    path = archive_path(archive_dir, param)
+    output_filename = storage.table_path('', f"war_data_{param}")
+    active_headers, positions, _ = get_headers_for_war(war_number)
 
-    try:
-        response = requests.get(page_url)
-        response.raise_for_status()
-        html_content = response.text
+    if not os.path.exists(path):
+        if not os.path.exists(os.path.join(cache_dir, f"{param}.html")):
+            print(f"❌ War {war_number} has no archive or cached page. Scrape it first.")
+            return False
+        with PayloadArchive(path) as archive:
+            for _ in iter_row_batches(iter_cached_page(cache_dir, param), archive=archive):
+                pass
+            if not len(archive):
+                print(f"❌ No data found for War {war_number}. Skipping.")
+                return False
+            archive.save()
+        print(f"Archived War {war_number} from its cached page.")
 
-        pattern = re.compile(r"data1\.addRow\(\[(.*?)\]\);")
-        matches = pattern.findall(html_content)
+    # The rows are rebuilt and written one archive chunk at a time
+    count = [0]
 
-        if not matches:
-            print(f"❌ No data found for War {war_number}. Skipping.")
-            return
+    def rows():
+        for timestamps, values in iter_archive(path):
+            count[0] += len(timestamps)
+            yield from archived_rows(timestamps, values, positions)
+
+    storage.write_rows(output_filename, active_headers, rows())
+    print(f"✅ Rebuilt {output_filename} from {count[0]} archived rows.")
+    return True
+
+
+def archived_wars(archive_dir=ARCHIVE_DIR, cache_dir=CACHE_DIR):
+    """
+    Returns the sorted war numbers that have an archive or a cached page.
+    """
+    wars = set()
+    for folder, extension in [(archive_dir, '.npz'), (cache_dir, '.html')]:
+        if os.path.isdir(folder):
+            wars.update(int(name[2:-len(extension)]) for name in os.listdir(folder)
+                        if re.fullmatch(rf'WC\d+{re.escape(extension)}', name))
+    return sorted(wars)
+
+
+def reparse_wars(war_numbers, archive_dir=ARCHIVE_DIR, cache_dir=CACHE_DIR, jobs=1):
+    """
+    Rebuilds several wars' files from their archives on `jobs` worker
+    processes. The work is all parsing and writing, so it scales with the
+    cores rather than the rate limit. Returns the sorted list of wars that
+    failed.
+    """
+    with instrument.span('reparse', wars=len(war_numbers), jobs=jobs) as span:
+        try:
+            results = run_per_file(reparse_war, war_numbers, archive_dir, cache_dir, jobs=jobs, stage='reparse')
+        except StageError as e:
+            results = e.results
+        failed = [result.item for result in results if not result.value]
+        span['failed'] = len(failed)
+    return sorted(failed)
+
+
+def poll_live_war(live, limiter=None, retries=0, base_url=BASE_URL, cache_dir=CACHE_DIR, session=None,
+                  timeout=DEFAULT_TIMEOUT):
+    """
+    Fetches the live war's page once and hands only the rows newer than the
+    last ingested timestamp to `live`, which appends and cleans them.
+    Returns the number of new raw rows.
+    """
+    param = f"WC{live.war_number}"
+    page_url = f"{base_url}?map=Conquest_Total&days={param}"
+    active_headers, positions, _ = get_headers_for_war(live.war_number)
+
+    chunks = iter_war_page(page_url, param, complete=False, limiter=limiter, retries=retries, cache_dir=cache_dir,
+                           session=session, timeout=timeout)
+    new_rows, last_ms = [], live.last_timestamp_ms
+    for batch_ms, rows in iter_row_batches(chunks, after_ms=live.last_timestamp_ms, positions=positions):
+        new_rows.extend(rows)
+        last_ms = max(batch_ms) if last_ms is None else max(last_ms, max(batch_ms))
+
+    # Called even without new rows, so a combined file rebuilt since the
+    # last poll gets the live war back
+    added = live.ingest(active_headers, new_rows, last_ms)
+    print(f"✅ War {live.war_number}: {len(new_rows)} new rows, {added} added to the combined data.")
+    return len(new_rows)
+
+
+def follow_war(war_number, interval=FOLLOW_INTERVAL, polls=None, rate=1.0, retries=3,
+               base_url=BASE_URL, cache_dir=CACHE_DIR, reset_policy=resets.DEFAULT_POLICY, timeout=DEFAULT_TIMEOUT):
+    """
+    Polls the live war every `interval` seconds, `polls` times or until
+    interrupted. Each poll appends only the new rows to the war's raw file
+    in its dataset folder and cleans them into the combined datasets, so an
+    update costs time in proportion to the new data, not the whole war.
+    The polls share one kept-alive connection. `reset_policy` should be the
+    one the combined files were built with.
+    """
+    _, _, structure = get_headers_for_war(war_number)
+    if structure not in FOLLOW_DATASETS:
+        raise ValueError(f"War {war_number} uses the '{structure}' layout, which has no combined dataset to follow into.")
+    live = LiveWar(war_number, FOLLOW_DATASETS[structure], reset_policy)
+    limiter = TokenBucket(rate)
+
+    print(f"--- Following War {war_number} into '{live.dataset.folder}' every {interval}s ---")
+    with make_session(pool_size=1) as session:
+        for poll in (itertools.count() if polls is None else range(polls)):
+            if poll:
+                time.sleep(interval)
+            try:
+                poll_live_war(live, limiter=limiter, retries=retries, base_url=base_url, cache_dir=cache_dir,
+                              session=session, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                print(f"❌ A network error occurred for War {war_number}: {e}. Trying again next poll.")
+
+
+def parse_war_selection(text):
+    """
+    Parses a war selection such as "87" or "16-19,63,120-126" into a sorted
+    list of war numbers.
+    """
+    wars = set()
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = part.split('-', 1)
+            wars.update(range(int(start), int(end) + 1))
+        elif part:
+            wars.add(int(part))
+    return sorted(wars)
+
+
+def positive_rate(text):
+    """
+    Parses --rate. The token bucket refills at this many tokens a second,
+    so it has to be more than 0.
+    """
+    rate = float(text)
+    if not rate > 0:
+        raise argparse.ArgumentTypeError(f"must be more than 0, not {text}")
+    return rate
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape war data from foxholestats.com into CSV or Parquet files.")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Number of wars to fetch at the same time (default: 4)")
+    parser.add_argument("--rate", type=positive_rate, default=1.0,
+                        help="Maximum requests started per second (default: 1.0)")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="Retries per war for network errors and 429/5xx responses (default: 3)")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT,
+                        help=f"Seconds to wait for a connection before retrying (default: {CONNECT_TIMEOUT})")
+    parser.add_argument("--read-timeout", type=float, default=READ_TIMEOUT,
+                        help=f"Seconds to wait for more of a response before retrying (default: {READ_TIMEOUT})")
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="Stats page URL, e.g. a local stand-in server for testing")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--wars", type=parse_war_selection,
+                           help='Wars to scrape, e.g. "87" or "16-19,120-126" (default: all)')
+    selection.add_argument("--since", type=int,
+                           help=f"Scrape every war from this one up to war {LAST_WAR}")
+    parser.add_argument("--live-war", type=int, default=LAST_WAR,
+                        help=f"The ongoing war; every earlier war is treated as complete (default: {LAST_WAR})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"Folder for cached pages and their validators (default: {CACHE_DIR})")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR,
+                        help=f"Folder for every war's archived rows (default: {ARCHIVE_DIR})")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-request complete wars too, using conditional requests")
+    parser.add_argument("--reparse", action="store_true",
+                        help="Rebuild the war files from the archive with the current column mapping, offline")
+    add_jobs_argument(parser)
+    parser.add_argument("--follow", action="store_true",
+                        help="Keep polling the live war, adding only its new rows to the combined datasets")
+    parser.add_argument("--interval", type=float, default=FOLLOW_INTERVAL,
+                        help=f"Seconds between polls with --follow (default: {FOLLOW_INTERVAL})")
+    parser.add_argument("--polls", type=int,
+                        help="Stop following after this many polls (default: until interrupted)")
+    resets.add_reset_policy_argument(parser)
+    storage.add_format_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    return parser.parse_args()
 
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            # Write the selected header row
-            writer.writerow(active_headers)
-
-            # Process and write each data row
-            for row_string in matches:
-                try:
-                    parts = row_string.split(',')
-                    timestamp_ms = int(re.search(r'\d+', parts[0]).group())
-                    timestamp = datetime.fromtimestamp(timestamp_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # Extract all data columns and clean them up
-                    data_columns = [p.strip().replace("'", "") for p in parts[1:]]
-                    
-                    # Combine timestamp with data columns and write to file
-                    full_row = [timestamp] + data_columns
-                    writer.writerow(full_row)
-                except (IndexError, AttributeError, ValueError):
-                    continue
-        
-        print(f"✅ Success! Data for War {war_number} saved to {csv_filename}\n")
-
-    except requests.exceptions.RequestException as e:
-        print(f"❌ A network error occurred for War {war_number}: {e}\n")
 
 # --- Main loop to iterate through all specified wars ---
 if __name__ == "__main__":
-    # Scrape all wars from 16 to 126 inclusive
-    for i in range(16, 127):
-        scrape_and_process_war(i)
-        # Add a short delay to be respectful to the server
-        time.sleep(1)
-    
-    print("--- All wars processed. ---")
\ No newline at end of file
+    args = parse_args()
+    storage.apply_storage_arguments(args)
+    instrument.configure(args)
+
+    if args.follow:
+        try:
+            with instrument.profiled(args.profile):
+                follow_war(args.live_war, interval=args.interval, polls=args.polls, rate=args.rate,
+                           retries=args.retries, base_url=args.base_url, cache_dir=args.cache_dir,
+                           reset_policy=args.reset_policy, timeout=(args.connect_timeout, args.read_timeout))
+        except KeyboardInterrupt:
+            print(f"\n--- Stopped following War {args.live_war}. ---")
+    elif args.reparse:
+        # Rebuild every archived war unless a selection was given
+        if args.wars:
+            war_numbers = args.wars
+        elif args.since is not None:
+            war_numbers = [war for war in archived_wars(args.archive_dir, args.cache_dir) if war >= args.since]
+        else:
+            war_numbers = archived_wars(args.archive_dir, args.cache_dir)
+
+        with instrument.profiled(args.profile):
+            failed_wars = reparse_wars(war_numbers, archive_dir=args.archive_dir, cache_dir=args.cache_dir,
+                                       jobs=args.jobs)
+
+        if failed_wars:
+            print(f"❌ {len(failed_wars)} wars failed: {', '.join(map(str, failed_wars))}")
+        print(f"--- Rebuilt {len(war_numbers) - len(failed_wars)} wars from the archive. ---")
+    else:
+        # Scrape all wars from 16 to 126 inclusive unless a selection was given
+        if args.wars:
+            war_numbers = args.wars
+        elif args.since is not None:
+            war_numbers = range(args.since, LAST_WAR + 1)
+        else:
+            war_numbers = range(FIRST_WAR, LAST_WAR + 1)
+
+        with instrument.profiled(args.profile):
+            failed_wars = scrape_wars(
+                war_numbers,
+                concurrency=args.concurrency,
+                rate=args.rate,
+                retries=args.retries,
+                base_url=args.base_url,
+                cache_dir=args.cache_dir,
+                live_war=args.live_war,
+                refresh=args.refresh,
+                timeout=(args.connect_timeout, args.read_timeout),
+                archive_dir=args.archive_dir,
+            )
+
+        if failed_wars:
+            print(f"❌ {len(failed_wars)} wars failed: {', '.join(map(str, failed_wars))}")
+        print("--- All wars processed. ---")
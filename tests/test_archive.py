@@ -0,0 +1,40 @@
+import os
+
+import scrapertest3
+
+
+def rows():
+    """
+    Ragged rows of running totals, zero-padded and negative numbers, text
+    and integers too large for int64, one minute apart.
+    """
+    for i in range(23):
+        row = [str(i * 7), '007' if i % 3 == 0 else str(-3 * i), 'Ünïcødé ✅' if i % 2 else '2463/hr', str(10**30 + i)]
+        yield 1690927800000 + i * 60000, row[:2] if i % 5 == 0 else row
+
+
+def test_rows_read_back_across_chunks(tmp_path):
+    path = str(tmp_path / "WC1.npz")
+
+    with scrapertest3.PayloadArchive(path, chunk_rows=4) as archive:
+        for timestamp, row in rows():
+            archive.add(timestamp, row)
+        archive.save()
+
+    chunks = list(scrapertest3.iter_archive(path))
+    assert len(chunks) == 6
+    archived = [(timestamp, values) for timestamps, columns in chunks
+                for timestamp, values in zip(timestamps.tolist(), columns.tolist())]
+    for (timestamp, row), (archived_timestamp, values) in zip(rows(), archived, strict=True):
+        assert archived_timestamp == timestamp
+        # Shorter rows are padded with '' within their chunk
+        assert values[:len(row)] == row and not any(values[len(row):])
+    assert os.listdir(tmp_path) == ["WC1.npz"]
+
+
+def test_unsaved_archive_leaves_nothing_behind(tmp_path):
+    with scrapertest3.PayloadArchive(str(tmp_path / "WC1.npz"), chunk_rows=4) as archive:
+        for timestamp, row in rows():
+            archive.add(timestamp, row)
+
+    assert os.listdir(tmp_path) == []
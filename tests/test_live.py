@@ -0,0 +1,101 @@
+import os
+
+import pandas as pd
+import pytest
+
+from warwatch import live, pipeline, storage, transforms
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTENDED = pipeline.DATASETS['extended'].folder
+
+# Rows of the synthetic pre-war segment in front of war 75
+PRE_WAR_ROWS = 20
+
+# A Basic combined file as written before the rate column's spelling was fixed
+OLD_HEADER = ("WarNumber,Timestamp,WardenCaptures,ColonialCaptures,WardenCasualties,ColonialCasualties,"
+              "WardenCasualtyRate,ColonialCasualityRate,SteamPlayers,Target\n")
+
+
+def test_append_section_fills_columns_under_their_old_spelling(tmp_path):
+    path = tmp_path / "DataNoPopulationClass.csv"
+    path.write_text(OLD_HEADER + "125,2023-08-01 00:00:00,1,2,3,4,5,6,7,0\n", encoding='utf-8')
+    rows = pd.DataFrame({
+        'WarNumber': [126], 'Timestamp': ['2023-08-18 07:15:02'], 'WardenCaptures': [145],
+        'ColonialCaptures': [356], 'WardenCasualties': [1096649], 'ColonialCasualties': [1041603],
+        'WardenCasualtyRate': [1837], 'ColonialCasualtyRate': [1812], 'SteamPlayers': [1500], 'Target': [0],
+    })
+
+    live.append_section(str(path), rows)
+
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[0] + "\n" == OLD_HEADER
+    assert lines[-1] == "126,2023-08-18 07:15:02,145,356,1096649,1041603,1837,1812,1500,0"
+
+
+def test_relabel_section_keeps_values_under_their_old_spelling(tmp_path):
+    path = tmp_path / "DataNoPopulationClass.csv"
+    path.write_text(OLD_HEADER, encoding='utf-8')
+    offset = path.stat().st_size
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("126,2023-08-18 07:15:02,145,356,1096649,1041603,1837,1812,1500,0\n")
+
+    live.relabel_section(str(path), offset, 'Target', 1)
+
+    assert path.read_text(encoding='utf-8').splitlines()[-1] == \
+        "126,2023-08-18 07:15:02,145,356,1096649,1041603,1837,1812,1500,1"
+
+
+def raw_war():
+    """
+    War 75's raw rows as scraped text, from its last reset on, with its
+    last rows in front as a pre-war segment. The war starts with a row
+    of no casualties, then a row where only one side has some, then two
+    more rows of none, which are dropped without being resets.
+    """
+    df = pd.read_csv(os.path.join(REPO_ROOT, EXTENDED, 'war_data_WC75.csv'), dtype=str, keep_default_na=False)
+    war = df.iloc[14:]
+    df = pd.concat([war.tail(PRE_WAR_ROWS), war], ignore_index=True)
+    start = PRE_WAR_ROWS
+    df.loc[start:start + 3, 'WardenCasualties'] = ['0', '0', '0', '0']
+    df.loc[start:start + 3, 'ColonialCasualties'] = ['0', '3', '0', '0']
+    return list(df.columns), df.values.tolist()
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('boundaries', [
+    # A batch starting on the reset, then one for each zero row after the
+    # fighting started
+    [5, PRE_WAR_ROWS, PRE_WAR_ROWS + 2, PRE_WAR_ROWS + 3, PRE_WAR_ROWS + 4, 300, 900],
+    list(range(97, 1600, 97)),
+], ids=['around-the-reset', 'every-97-rows'])
+def test_war_fed_in_batches_matches_cleaning_it_whole(tmp_path, monkeypatch, boundaries):
+    (tmp_path / EXTENDED).mkdir()
+    monkeypatch.setattr(live, 'REPO_ROOT', str(tmp_path))
+    monkeypatch.setattr(pipeline, 'REPO_ROOT', str(tmp_path))
+    header, rows = raw_war()
+    war = live.LiveWar(75, 'extended')
+    rebuilds = []
+    monkeypatch.setattr(war, 'rebuild', lambda: rebuilds.append(1) or live.LiveWar.rebuild(war))
+
+    for start, stop in zip([0] + boundaries, boundaries + [len(rows)]):
+        war.ingest(header, rows[start:stop])
+    # Only the first batch is cleaned by rebuilding; the rest carry the state
+    assert len(rebuilds) == 1
+
+    cleaned, _ = transforms.clean_war(storage.read_table(war.raw_path))
+    labels = transforms.war_labels(cleaned)
+    for branch in war.dataset.branches:
+        combined = pd.read_csv(war.output_path(branch))
+        for col in ['Timestamp', 'WardenCasualties', 'ColonialCasualties', 'WardenCaptures', 'ColonialCaptures']:
+            assert combined[col].tolist() == cleaned[col].astype(combined[col].dtype).tolist()
+        assert (combined[branch.label] == labels[branch.label]).all()
+
+    # and byte for byte what rebuilding the war in one pass writes
+    batched = {branch.output_filename: read_bytes(war.output_path(branch)) for branch in war.dataset.branches}
+    war.rebuild()
+    for branch in war.dataset.branches:
+        assert read_bytes(war.output_path(branch)) == batched[branch.output_filename]
@@ -0,0 +1,94 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from warwatch import manifest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_FOLDERS = ['Basic Data (Uncleaned)', 'Population Extended (Uncleaned)']
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """
+    A copy of the package and the folder scripts with two wars per dataset,
+    built once by the orchestrator. The basic folder has no raw files in
+    the repository, so its cleaned wars stand in for them.
+    """
+    shutil.copytree(os.path.join(REPO_ROOT, 'warwatch'), tmp_path / 'warwatch',
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    for folder in DATASET_FOLDERS:
+        (tmp_path / folder / 'cleaned_data').mkdir(parents=True)
+        for script in glob.glob(os.path.join(REPO_ROOT, folder, '*.py')):
+            shutil.copy(script, tmp_path / folder)
+
+    basic = os.path.join(REPO_ROOT, DATASET_FOLDERS[0], 'cleaned_data')
+    for war_number in [20, 21]:
+        shutil.copy(os.path.join(basic, f"war_data_WC{war_number}.csv"), tmp_path / DATASET_FOLDERS[0])
+    extended = os.path.join(REPO_ROOT, DATASET_FOLDERS[1], 'cleaned_data')
+    for war_number in [75, 76]:
+        shutil.copy(os.path.join(extended, f"war_data_WC{war_number}.csv"),
+                    tmp_path / DATASET_FOLDERS[1] / 'cleaned_data')
+
+    orchestrate(tmp_path)
+    return tmp_path
+
+
+def orchestrate(root, *args):
+    result = subprocess.run([sys.executable, '-m', 'warwatch.orchestrate', *args], cwd=root,
+                            capture_output=True, text=True, encoding='utf-8')
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def built_files(root):
+    """
+    Returns {path: modification time} of every file the stages wrote.
+    """
+    paths = []
+    for folder in DATASET_FOLDERS:
+        for pattern in ['final_cleaned_data/*', 'model_ready_data/*', 'war_labels.*', 'DataNoPopulationRegr2*',
+                        'DataWithPopulationRegr*']:
+            paths += glob.glob(os.path.join(root, folder, pattern))
+    paths += glob.glob(os.path.join(root, DATASET_FOLDERS[0], 'cleaned_data', '*'))
+    return {path: os.stat(path).st_mtime_ns for path in paths}
+
+
+def test_unchanged_tree_runs_nothing(repo):
+    assert "0 of 8 stage(s) would run." in orchestrate(repo, '--dry-run')
+
+
+def test_editing_a_shared_module_makes_every_stage_stale(repo):
+    before = built_files(repo)
+    with open(repo / 'warwatch' / 'transforms.py', 'a', encoding='utf-8') as f:
+        f.write("\n# edited\n")
+
+    assert "8 of 8 stage(s) would run." in orchestrate(repo, '--dry-run')
+    output = orchestrate(repo)
+
+    # Each script must redo its work too, not report itself up to date
+    assert "Nothing changed upstream" not in output
+    assert "unchanged file(s)" not in output
+    after = built_files(repo)
+    assert after.keys() == before.keys()
+    assert all(after[path] != before[path] for path in before)
+
+
+def test_code_hash_covers_every_shared_module(tmp_path, monkeypatch):
+    copies = []
+    for path in manifest.SHARED_SOURCES:
+        copies.append(str(tmp_path / os.path.basename(path)))
+        shutil.copy(path, copies[-1])
+    monkeypatch.setattr(manifest, 'SHARED_SOURCES', copies)
+    script = os.path.join(REPO_ROOT, DATASET_FOLDERS[0], 'makelabels.py')
+
+    hashes = {manifest.code_hash(script)}
+    for path in copies:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("\n# edited\n")
+        hashes.add(manifest.code_hash(script))
+    assert len(hashes) == len(copies) + 1
@@ -0,0 +1,28 @@
+import os
+import shutil
+
+import pandas as pd
+
+from warwatch import pipeline
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTENDED = pipeline.DATASETS['extended'].folder
+
+
+def test_missing_wars_leave_the_published_files_alone(tmp_path, monkeypatch):
+    folder = tmp_path / EXTENDED
+    folder.mkdir()
+    shutil.copy(os.path.join(REPO_ROOT, EXTENDED, 'war_data_WC75.csv'), folder)
+    published = folder / 'DataWithPopulationRegr.csv'
+    published.write_text("every war\n", encoding='utf-8')
+    monkeypatch.setattr(pipeline, 'REPO_ROOT', str(tmp_path))
+
+    assert not pipeline.run_dataset('extended')
+    assert published.read_text(encoding='utf-8') == "every war\n"
+
+    assert pipeline.run_dataset('extended', allow_missing=True)
+    assert set(pd.read_csv(published)['WarNumber']) == {75}
+
+
+def test_describe_wars_joins_runs():
+    assert pipeline.describe_wars([112, 20, 21, 22, 75, 113]) == "20-22, 75, 112-113"
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from warwatch import resample, storage
+
+
+def combined():
+    """
+    Two short wars in a combined dataset, rows every 10-40 minutes.
+    """
+    return pd.DataFrame({
+        'WarNumber': [1, 1, 1, 1, 2, 2],
+        'Timestamp': pd.to_datetime(['2023-08-01 22:10:00', '2023-08-01 23:50:00', '2023-08-02 00:30:00',
+                                     '2023-08-02 01:00:00', '2023-08-05 12:00:00', '2023-08-05 12:10:00']),
+        'WardenCaptures': [1, 2, 3, 4, 0, 5],
+        'WardenPlayers': [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+    })
+
+
+@pytest.mark.parametrize('cadence', ['1h', '1D'])
+def test_resampled_file_reads_back_with_timestamps(tmp_path, cadence):
+    resampled = resample.resample_combined(combined(), cadence)
+    path = str(tmp_path / f"DataNoPopulationRegr_{cadence}.csv")
+
+    resample.write_resampled(resampled, path)
+    loaded = storage.read_table(path)
+
+    assert pd.api.types.is_datetime64_any_dtype(loaded['Timestamp'])
+    assert (loaded['Timestamp'].to_numpy().astype('datetime64[s]')
+            == resampled['Timestamp'].to_numpy().astype('datetime64[s]')).all()
+
+
+def test_daily_grid_keeps_the_time_of_day_in_the_file(tmp_path):
+    resampled = resample.resample_combined(combined(), '1D')
+    path = tmp_path / "daily.csv"
+
+    resample.write_resampled(resampled, str(path))
+
+    timestamps = pd.read_csv(path, dtype=str)['Timestamp']
+    assert list(timestamps) == ['2023-08-02 00:00:00', '2023-08-03 00:00:00', '2023-08-06 00:00:00']
+    assert list(resampled['WardenCaptures']) == [2, 4, 5]
+    assert np.allclose(resampled['WardenPlayers'], [15.0, 35.0, 55.0])
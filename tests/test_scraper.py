@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+import scrapertest3
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(REPO_ROOT, 'benchmarks', 'fixtures', 'war_page_WC106.html')
+
+# Rows of chart data in the fixture page
+FIXTURE_ROWS = 2328
+
+
+class StandIn(ThreadingHTTPServer):
+    """
+    Serves the fixture page for every war. `statuses` maps a war's days
+    parameter (e.g. "WC101") to the statuses to answer with before the
+    page; every request's war and start time are kept in `requests`.
+    """
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        with open(FIXTURE, 'rb') as f:
+            self.page = f.read()
+        self.statuses = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/index.php"
+
+    def requests_for(self, param):
+        return [started for war, started in self.requests if war == param]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        param = parse_qs(urlparse(self.path).query)['days'][0]
+        with self.server.lock:
+            self.server.requests.append((param, time.monotonic()))
+            statuses = self.server.statuses.get(param, [])
+            status = statuses.pop(0) if statuses else 200
+
+        body = self.server.page if status == 200 else b'unavailable'
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    # The war files are written to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def scrape(server, folder, war_numbers, **kwargs):
+    return scrapertest3.scrape_wars(war_numbers, base_url=server.url, cache_dir=str(folder / 'cache'),
+                                    archive_dir=str(folder / 'archive'), live_war=200, **kwargs)
+
+
+def test_requests_start_no_faster_than_the_rate(server, folder):
+    rate = 10.0
+
+    assert scrape(server, folder, [100, 101, 102, 103, 104], concurrency=5, rate=rate, retries=0) == []
+
+    starts = sorted(started for _, started in server.requests)
+    assert len(starts) == 5
+    # Every worker shares one bucket of a single token, so the requests
+    # start one every 1/rate seconds however many run at once
+    assert all(later - earlier > 0.9 / rate for earlier, later in zip(starts, starts[1:]))
+    for war_number in [100, 101, 102, 103, 104]:
+        with open(folder / f"war_data_WC{war_number}.csv", encoding='utf-8') as f:
+            assert sum(1 for _ in f) == FIXTURE_ROWS + 1
+
+
+def test_unavailable_page_is_retried_until_it_succeeds(server):
+    server.statuses['WC101'] = [503, 503]
+
+    response = scrapertest3.fetch_page(f"{server.url}?map=Conquest_Total&days=WC101", retries=3, backoff=0.01)
+
+    assert response.status_code == 200
+    assert len(server.requests_for('WC101')) == 3
+
+
+def test_missing_page_fails_without_retrying(server, folder):
+    server.statuses['WC101'] = [404]
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        scrapertest3.fetch_page(f"{server.url}?map=Conquest_Total&days=WC101", retries=3, backoff=0.01)
+    assert len(server.requests_for('WC101')) == 1
+
+    server.statuses['WC101'] = [404]
+    assert scrape(server, folder, [100, 101], rate=100.0, retries=3) == [101]
+    assert len(server.requests_for('WC101')) == 2
+    assert not os.path.exists(folder / "war_data_WC101.csv")
+    assert os.path.exists(folder / "war_data_WC100.csv")
+
+
+def test_a_war_that_raises_does_not_stop_the_others(server, folder, monkeypatch):
+    scrape_and_process_war = scrapertest3.scrape_and_process_war
+
+    def failing(war_number, *args):
+        if war_number == 101:
+            raise OSError("disk full")
+        return scrape_and_process_war(war_number, *args)
+
+    monkeypatch.setattr(scrapertest3, 'scrape_and_process_war', failing)
+
+    assert scrape(server, folder, [100, 101, 102], rate=100.0, retries=0) == [101]
+    assert os.path.exists(folder / "war_data_WC100.csv")
+    assert os.path.exists(folder / "war_data_WC102.csv")
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from warwatch import transforms
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The old row loop is kept verbatim in the reset benchmark
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+from bench_resets import row_loop_clean, with_pre_war
+
+WAR_FILES = [
+    'Population Extended (Uncleaned)/war_data_WC75.csv',
+    'Population Extended (Uncleaned)/cleaned_data/war_data_WC100.csv',
+    'Basic Data (Uncleaned)/cleaned_data/war_data_WC20.csv',
+    'Basic Data (Uncleaned)/cleaned_data/war_data_WC120.csv',
+]
+
+
+def synthetic_war():
+    """
+    A short war with a mini war in front of it, both sides' casualties
+    dropping where the real one starts, and a zero row before and one
+    during the fighting.
+    """
+    return pd.DataFrame({
+        'Timestamp': pd.date_range('2023-08-01', periods=10, freq='h').astype(str),
+        'WardenCasualties': [50, 90, 120, 0, 0, 5, 0, 20, 20, 40],
+        'ColonialCasualties': [40, 80, 100, 0, 3, 0, 0, 0, 25, 30],
+        'Column_1': ['x'] * 10,
+        'WardenCaptures': range(10),
+    })
+
+
+def assert_same_cleaning(df):
+    expected = row_loop_clean(df.copy())
+    cleaned, _ = transforms.clean_war(df.copy())
+    pd.testing.assert_frame_equal(cleaned, expected)
+    return cleaned
+
+
+@pytest.mark.parametrize('path', WAR_FILES)
+@pytest.mark.parametrize('pre_war', [False, True], ids=['as-is', 'pre-war'])
+def test_clean_war_matches_the_row_loop(path, pre_war):
+    df = pd.read_csv(os.path.join(REPO_ROOT, path))
+    if pre_war:
+        df = with_pre_war(df)
+
+    cleaned = assert_same_cleaning(df)
+
+    if pre_war:
+        assert len(cleaned) < len(df)
+
+
+def test_clean_war_matches_the_row_loop_on_a_synthetic_war():
+    cleaned = assert_same_cleaning(synthetic_war())
+
+    assert list(cleaned['WardenCaptures']) == [3, 4, 5, 7, 8, 9]
+    assert 'Column_1' not in cleaned.columns
@@ -0,0 +1,6 @@
+"""
+Shared code for the WarWatch cleaning scripts and pipeline runner.
+
+The scripts in 'Basic Data (Uncleaned)' and 'Population Extended (Uncleaned)'
+add the repository root to sys.path so they can import this package.
+"""
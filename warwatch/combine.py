@@ -0,0 +1,122 @@
+"""
+Streams the per-war tables into one combined CSV, a war at a time.
+
+Rather than holding every war in a list and concatenating them, the
+combiners read each war's final columns and append them straight to the
+output file in war order. Peak memory is bounded by the largest single war
+instead of the whole corpus.
+"""
+import contextlib
+import os
+
+import pandas as pd
+
+from warwatch import instrument
+from warwatch.features import FeatureWriter
+from warwatch.storage import read_table, table_columns
+from warwatch.windows import window_features
+
+
+def stream_combine(input_files, final_columns, output_path, renames=None, features_path=None, labels=None,
+                   windows_path=None):
+    """
+    Appends each (war_number, filename) in `input_files` to a combined CSV
+    at `output_path`, keeping only `final_columns` and adding 'WarNumber'.
+    A war already in memory, e.g. in the pipeline, can be given as its
+    DataFrame instead of a filename.
+    Columns named in `renames` are renamed first. `labels` maps each war to
+    {label: value} (see warwatch.labels) to join onto its rows; wars
+    missing from it are skipped. If `features_path` is
+    given, the same rows are also written there as a memory-mapped feature
+    matrix (see warwatch.features), and if `windows_path` is given their
+    rolling-window features are written there (see warwatch.windows).
+    Returns the number of rows written.
+
+    The output is the same as concatenating every war first. A column that
+    is missing from some wars is left empty there, and integer columns like
+    that are written as floats, as pd.concat would.
+    """
+    renames = renames or {}
+    if labels is not None:
+        for war_number, _ in input_files:
+            if war_number not in labels:
+                print(f"  - Warning: No labels for War {war_number}. Skipping.")
+        input_files = [(war_number, filename) for war_number, filename in input_files if war_number in labels]
+
+    # Only each table's header is read up front, to settle the output columns
+    headers = [set(source_columns_of(source)) for _, source in input_files]
+    if labels is not None:
+        headers = [header | set(labels[war_number]) for header, (war_number, _) in zip(headers, input_files)]
+    for source in renames:
+        if not any(source in header for header in headers):
+            print(f"  - Warning: '{source}' column not found to rename.")
+
+    headers = [{renames.get(col, col) for col in header} | {'WarNumber'} for header in headers]
+    available = set().union(*headers)
+    columns = [col for col in final_columns if col in available]
+
+    # Columns that only some wars have
+    partial = set(columns) - set.intersection(*headers) if headers else set()
+    source_columns = set(final_columns) | set(renames)
+
+    # Write to a temporary file so a failure never leaves half a dataset
+    tmp_path = output_path + '.tmp'
+    rows = 0
+    features = FeatureWriter(features_path, columns) if features_path else None
+    windows_tmp_path = windows_path + '.tmp' if windows_path else None
+    with instrument.span('combine', output=os.path.basename(output_path), wars=len(input_files)) as span, \
+            open(tmp_path, 'w', newline='', encoding='utf-8') as sink, \
+            (open(windows_tmp_path, 'w', newline='', encoding='utf-8') if windows_path
+             else contextlib.nullcontext()) as windows_sink:
+        pd.DataFrame(columns=columns).to_csv(sink, index=False)
+
+        for war_number, source in input_files:
+            print(f"  - Reading War {war_number}...")
+            df = read_source(source, source_columns).rename(columns=renames)
+
+            # Add a 'WarNumber' column to keep track of the source
+            df['WarNumber'] = war_number
+            if labels is not None:
+                df = df.assign(**labels[war_number])
+
+            for col in partial & set(df.columns):
+                if pd.api.types.is_integer_dtype(df[col]):
+                    df[col] = df[col].astype(float)
+
+            df = df.reindex(columns=columns)
+            df.to_csv(sink, header=False, index=False)
+            if features is not None:
+                features.add(war_number, df)
+            if windows_sink is not None:
+                # Every window starts again at a war's first row, so each
+                # war's windows only need that war
+                window_features(df).to_csv(windows_sink, header=windows_sink.tell() == 0, index=False)
+            rows += len(df)
+
+        if windows_sink is not None and windows_sink.tell() == 0:
+            window_features(pd.DataFrame(columns=columns)).to_csv(windows_sink, index=False)
+        span.add(rows_written=rows, bytes_written=sink.tell())
+
+    os.replace(tmp_path, output_path)
+    if features is not None:
+        features.close(output_path)
+    if windows_path:
+        os.replace(windows_tmp_path, windows_path)
+    return rows
+
+
+def source_columns_of(source):
+    """
+    Returns the columns of a war given as a filename or a DataFrame.
+    """
+    return source.columns if isinstance(source, pd.DataFrame) else table_columns(source)
+
+
+def read_source(source, columns):
+    """
+    Returns the given columns of a war, read from its file or taken from
+    its DataFrame.
+    """
+    if isinstance(source, pd.DataFrame):
+        return source[[col for col in source.columns if col in columns]].copy()
+    return read_table(source, columns=columns)
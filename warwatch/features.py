@@ -0,0 +1,204 @@
+"""
+Memory-mapped feature matrices for model training.
+
+Alongside each combined CSV the combiners write a folder of .npy arrays
+that training code can open without parsing any text:
+
+    DataWithPopulationRegr.features/
+        X.npy            float32 features, one row per CSV row
+        y.npy            the label column (Target, WinMargin, ...)
+        timestamps.npy   datetime64[s] timestamps
+        wars.npy         the war numbers, in file order
+        war_offsets.npy  war i's rows are X[war_offsets[i]:war_offsets[i + 1]]
+        meta.json        the feature column names and the label's name
+
+np.load(..., mmap_mode='r') maps each array straight from disk, so every
+training job or worker process shares one copy in the page cache, and a
+split by war is just a set of row ranges:
+
+    from warwatch.features import FeatureMatrix
+
+    data = FeatureMatrix("Population Extended (Uncleaned)/DataWithPopulationRegr.csv")
+    train = data.rows(w for w in data.war_numbers() if w % 5)
+    model.fit(data.X[train], data.y[train])
+
+A features folder can also be exported from any existing combined CSV:
+    python -m warwatch.features "Usable Data/DataWithPopulationRegr.csv"
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+from warwatch.labels import LABEL_COLUMNS
+from warwatch.schema import COLUMN_TYPES
+from warwatch.storage import read_table
+
+# Columns that identify a row rather than describe it
+KEY_COLUMNS = ['WarNumber', 'Timestamp']
+
+
+def features_path(csv_path):
+    """
+    Returns the features folder that goes with a combined CSV.
+    """
+    return os.path.splitext(csv_path)[0] + '.features'
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class FeatureWriter:
+    """
+    Builds a features folder a war at a time. Each war's rows are appended
+    to raw files as they arrive, and close() turns them into .npy arrays,
+    so only one war is held in memory. The folder is swapped in whole
+    once it is complete.
+    """
+    def __init__(self, path, columns):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.target = next((col for col in columns if col in LABEL_COLUMNS), None)
+        self.columns = [col for col in columns if col not in KEY_COLUMNS and col != self.target]
+        self.target_dtype = np.dtype(COLUMN_TYPES.get(self.target, 'float32'))
+
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self._raw = {name: open(os.path.join(self.tmp_path, f"{name}.raw"), 'wb')
+                     for name in ('X', 'y', 'timestamps')}
+        self.wars = []
+        self.war_offsets = [0]
+
+    def add(self, war_number, df):
+        """
+        Appends one war's rows.
+        """
+        self._raw['X'].write(df.reindex(columns=self.columns).to_numpy(dtype=np.float32).tobytes())
+        if self.target is not None:
+            self._raw['y'].write(df[self.target].to_numpy(dtype=self.target_dtype).tobytes())
+        self._raw['timestamps'].write(df['Timestamp'].to_numpy().astype('datetime64[s]').tobytes())
+        self.wars.append(war_number)
+        self.war_offsets.append(self.war_offsets[-1] + len(df))
+
+    def close(self, source_path=None):
+        """
+        Writes the .npy arrays and the metadata, then replaces the old
+        features folder. `source_path` is the CSV the rows were written to,
+        so readers can tell if it has changed since.
+        """
+        rows = self.war_offsets[-1]
+        arrays = {'X': (np.float32, (rows, len(self.columns))), 'timestamps': ('datetime64[s]', (rows,))}
+        if self.target is not None:
+            arrays['y'] = (self.target_dtype, (rows,))
+
+        for name, raw in self._raw.items():
+            raw.close()
+            raw_path = raw.name
+            if name in arrays:
+                dtype, shape = arrays[name]
+                out = np.lib.format.open_memmap(os.path.join(self.tmp_path, f"{name}.npy"), mode='w+',
+                                                dtype=dtype, shape=shape)
+                if rows and out.size:
+                    out[:] = np.memmap(raw_path, dtype=dtype, mode='r', shape=shape)
+                out.flush()
+                del out
+            os.remove(raw_path)
+
+        np.save(os.path.join(self.tmp_path, 'wars.npy'), np.array(self.wars, dtype=np.int32))
+        np.save(os.path.join(self.tmp_path, 'war_offsets.npy'), np.array(self.war_offsets, dtype=np.int64))
+        meta = {
+            'columns': self.columns,
+            'target': self.target,
+            'rows': rows,
+            'source': os.path.basename(source_path) if source_path else None,
+            'source_stamp': _stamp(source_path) if source_path else None,
+        }
+        with open(os.path.join(self.tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+
+
+def write_features(df, path, source_path=None):
+    """
+    Writes the features folder for a whole combined DataFrame, whose wars
+    must each be one contiguous run of rows.
+    """
+    writer = FeatureWriter(path, list(df.columns))
+    war_numbers = df['WarNumber'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, war_numbers[1:] != war_numbers[:-1]]) if len(df) else []
+    for start, stop in zip(starts, np.r_[starts[1:], len(df)]):
+        writer.add(int(war_numbers[start]), df.iloc[start:stop])
+    writer.close(source_path)
+
+
+class FeatureMatrix:
+    """
+    A features folder opened read-only, with every array memory-mapped.
+    Accepts the folder or the combined CSV it was written with.
+    """
+    def __init__(self, path):
+        if path.endswith('.csv'):
+            csv_path, path = path, features_path(path)
+        else:
+            csv_path = None
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.columns = meta['columns']
+        self.target = meta['target']
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if meta['rows'] else None)
+
+        self.X = load('X')
+        self.y = load('y') if self.target is not None else None
+        self.timestamps = load('timestamps')
+        self.wars = np.load(os.path.join(path, 'wars.npy'))
+        self.war_offsets = np.load(os.path.join(path, 'war_offsets.npy'))
+
+        csv_path = csv_path or (meta['source'] and os.path.join(os.path.dirname(path), meta['source']))
+        if csv_path and os.path.exists(csv_path) and meta['source_stamp'] != _stamp(csv_path):
+            print(f"⚠️ '{os.path.basename(csv_path)}' has changed since its features were written. "
+                  f"Re-run the combiner to refresh them.")
+
+    def war_numbers(self):
+        return self.wars.tolist()
+
+    def war_rows(self, war_number):
+        """
+        Returns the slice of rows that belong to one war.
+        """
+        found = np.flatnonzero(self.wars == war_number)
+        if not len(found):
+            raise KeyError(f"War {war_number} isn't in '{self.path}'.")
+        return slice(int(self.war_offsets[found[0]]), int(self.war_offsets[found[0] + 1]))
+
+    def rows(self, war_numbers):
+        """
+        Returns the row numbers of every given war, e.g. for a train/test
+        split that keeps each war on one side.
+        """
+        ranges = [self.war_rows(war_number) for war_number in war_numbers]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(r.start, r.stop) for r in ranges])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a combined CSV's memory-mapped feature matrix.")
+    parser.add_argument("paths", nargs="+", help="Combined CSVs, e.g. 'Usable Data/DataWithPopulationRegr.csv'")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        write_features(read_table(path), features_path(path), source_path=path)
+        print(f"✅ Wrote the feature matrix for '{os.path.basename(path)}' to '{features_path(path)}'.")
+
+
+if __name__ == "__main__":
+    main()
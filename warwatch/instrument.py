@@ -0,0 +1,187 @@
+"""
+Structured timing spans and counters, written as JSON lines.
+
+The scripts' printed messages are for a person watching the run. This
+module records the same run for later analysis. Each stage, each war and
+each HTTP request becomes one JSON record holding its duration and
+whatever the code counted inside it: rows in and out, bytes read and
+written, response status.
+
+Tracing is off unless --trace PATH is passed (or WARWATCH_TRACE is set),
+and while off, span() hands back a shared no-op object, so the
+instrumented code pays one environment lookup per span. The path is kept
+in the environment so worker processes append to the same file; each
+record is a single write of a single line.
+
+    python -m warwatch.pipeline --trace run.jsonl --profile run.prof
+"""
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+
+TRACE_ENV_VAR = 'WARWATCH_TRACE'
+
+_lock = threading.Lock()
+_local = threading.local()
+_sink = {'path': None, 'pid': None, 'file': None}
+
+
+class _NullSpan:
+    """
+    Stands in for a span while tracing is off; every operation is a no-op.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setitem__(self, key, value):
+        pass
+
+    def add(self, **counts):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    A timed block. Fields set on it, or counted into it with add(), are
+    written with its duration when the block ends.
+    """
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.started = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _stack().pop()
+        record = {
+            'span': self.name,
+            'start': round(self.started, 6),
+            'duration_ms': round(duration * 1000, 3),
+            'pid': os.getpid(),
+            'parent': self.parent,
+        }
+        record.update(self.fields)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _write(record)
+        return False
+
+    def __setitem__(self, key, value):
+        self.fields[key] = value
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.fields[key] = self.fields.get(key, 0) + value
+
+
+def enabled():
+    return bool(os.environ.get(TRACE_ENV_VAR))
+
+
+def span(name, **fields):
+    """
+    Returns a context manager that times the block and writes one record
+    named `name` with `fields`, or a no-op while tracing is off.
+    """
+    if not os.environ.get(TRACE_ENV_VAR):
+        return _NULL_SPAN
+    return Span(name, fields)
+
+
+def add(**counts):
+    """
+    Adds counts (e.g. rows_read=100) to the innermost open span in this
+    thread. Does nothing while tracing is off or outside any span.
+    """
+    if not os.environ.get(TRACE_ENV_VAR):
+        return
+    stack = _stack()
+    if stack:
+        stack[-1].add(**counts)
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _write(record):
+    path = os.environ.get(TRACE_ENV_VAR)
+    line = json.dumps(record, default=str) + '\n'
+    with _lock:
+        # Reopen after a fork or if the path changed, so every process has
+        # its own append handle on the file
+        if _sink['file'] is None or _sink['path'] != path or _sink['pid'] != os.getpid():
+            _sink.update(path=path, pid=os.getpid(), file=open(path, 'a', encoding='utf-8'))
+        _sink['file'].write(line)
+        _sink['file'].flush()
+
+
+@contextlib.contextmanager
+def profiled(path):
+    """
+    Profiles the block in this process and saves the result to `path`. A
+    path ending in .html uses pyinstrument, if it is installed. Anything
+    else gets cProfile stats for pstats or snakeviz. Does nothing without
+    a path.
+    """
+    if not path:
+        yield
+        return
+
+    if path.endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError("HTML profiles need pyinstrument. Install it with 'pip install pyinstrument'.")
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def add_instrument_arguments(parser):
+    parser.add_argument("--trace", metavar="PATH",
+                        help=f"Append timing spans to this JSON-lines file (default: ${TRACE_ENV_VAR})")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Profile the main process into PATH (.prof for cProfile, .html for pyinstrument)")
+
+
+def configure(args):
+    """
+    Turns tracing on for this process and the workers it starts, if
+    --trace was given.
+    """
+    if args.trace:
+        os.environ[TRACE_ENV_VAR] = os.path.abspath(args.trace)
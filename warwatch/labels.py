@@ -0,0 +1,45 @@
+"""
+The per-war label table.
+
+Every label is a single number per war, worked out from the war's final
+capture counts: Target, WinMargin and SquaredWinMargin. Rather than
+writing a full copy of every war for each label with that number
+repeated on every row, the label stage reads each war's capture columns
+once and writes all three labels to one small table, one row per war.
+The combiners join it onto each war as they stream it out.
+"""
+import os
+
+import pandas as pd
+
+from warwatch import storage, transforms
+
+LABEL_COLUMNS = ['Target', 'WinMargin', 'SquaredWinMargin']
+LABEL_TABLE = 'war_labels'
+
+# The only columns the labels are worked out from
+CAPTURE_COLUMNS = ['WardenCaptures', 'ColonialCaptures']
+
+
+def derive_labels(input_files):
+    """
+    Reads the capture columns of each (war_number, filename) and returns
+    the label table as a DataFrame. Wars without capture data are left out.
+    """
+    rows = []
+    for war_number, filename in input_files:
+        print(f"Processing: {os.path.basename(filename)}")
+        labels = transforms.war_labels(storage.read_table(filename, columns=CAPTURE_COLUMNS))
+        if labels is not None:
+            rows.append({'WarNumber': war_number, **labels})
+    return pd.DataFrame(rows, columns=['WarNumber'] + LABEL_COLUMNS)
+
+
+def read_labels(path):
+    """
+    Returns a label table as {war_number: {label: value}}.
+    """
+    df = storage.read_table(path)
+    wars = df['WarNumber'].astype(int).tolist()
+    values = {col: df[col].tolist() for col in LABEL_COLUMNS if col in df.columns}
+    return {war: {col: column[i] for col, column in values.items()} for i, war in enumerate(wars)}
@@ -0,0 +1,340 @@
+"""
+Cleans the ongoing war one batch of new rows at a time.
+
+The pipeline cleans a war in one pass over its whole file, which suits
+finished wars. The live war grows with every poll, and re-running every
+stage on all of it each time gets slower as the war goes on. A LiveWar
+keeps the small amount of state the cleaning needs between batches: the
+last raw casualties, to spot a reset, and whether the fighting has
+started since that reset, to spot mid-war zero rows. Each poll appends
+only the new raw rows, cleans them and appends them to the war's section
+at the end of every combined dataset.
+
+The labels are the exception. Target and WinMargin come from the war's
+latest capture counts, so when they change, the live war's section of
+that combined file is rewritten with the new value. That only touches
+one war, never the whole dataset.
+
+The state is kept in .live_WC<n>.json next to the raw file. If a combined
+file was rebuilt since the last poll (e.g. by the pipeline), the next
+poll rebuilds the live war's section from its raw file.
+
+Only cleaner2's cleaning under the default reset policy,
+keep-after-last-reset, can be carried from batch to batch. Under the
+other policies, and in the basic dataset, which is cleaned like cleaner1
+by truncating after the casualty peak, the rows kept depend on the whole
+war, so every poll rebuilds the war's sections.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from warwatch import instrument, resets, storage, transforms
+from warwatch.pipeline import DATASETS, REPO_ROOT, label_rows, process_war, shared_columns
+from warwatch.resets import DEFAULT_POLICY, KEEP_AFTER_LAST_RESET
+from warwatch.schema import canonical_name
+
+CASUALTY_COLUMNS = ['WardenCasualties', 'ColonialCasualties']
+
+
+class LiveWar:
+    """
+    The ongoing war in one dataset, with its raw file, its sections of the
+    combined files and the running cleaning state.
+    """
+    def __init__(self, war_number, dataset_name, reset_policy=DEFAULT_POLICY):
+        self.war_number = war_number
+        self.dataset_name = dataset_name
+        self.reset_policy = reset_policy
+        self.dataset = DATASETS[dataset_name]
+        self.dataset_path = os.path.join(REPO_ROOT, self.dataset.folder)
+
+        name = f"war_data_WC{war_number}"
+        self.raw_path = storage.find_table(self.dataset_path, name) or storage.table_path(self.dataset_path, name)
+        self.state_path = os.path.join(self.dataset_path, f".live_WC{war_number}.json")
+        self.state = None
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                self.state = json.load(f)
+
+    @property
+    def last_timestamp_ms(self):
+        """
+        The timestamp of the newest row ingested so far, or None before the
+        first poll.
+        """
+        return self.state['last_timestamp_ms'] if self.state else None
+
+    @property
+    def incremental(self):
+        """
+        True if new rows can be cleaned against the running state rather
+        than by rebuilding the whole war.
+        """
+        return (self.dataset.stages[0].transform is transforms.advanced_clean
+                and self.reset_policy == KEEP_AFTER_LAST_RESET)
+
+    def output_path(self, branch):
+        return os.path.join(self.dataset_path, branch.output_filename)
+
+    def ingest(self, header, rows, last_timestamp_ms=None):
+        """
+        Adds newly scraped rows to the war and returns the number of cleaned
+        rows they added to the combined files. The raw rows are appended to
+        the war's file, cleaned against the running state, and appended to
+        each combined file.
+
+        The first call has no state yet, so it writes the raw file from
+        `rows` and builds the war's sections from it in one pass.
+        """
+        with instrument.span('live', war=self.war_number, rows_in=len(rows)) as span:
+            if self.state is None:
+                storage.write_rows(self.raw_path, header, rows)
+                added = self.rebuild()
+            else:
+                if rows:
+                    storage.append_rows(self.raw_path, header, rows)
+                if not self._sections_intact() or (rows and not self.incremental):
+                    added = self.rebuild()
+                elif rows:
+                    added = self._clean_and_append(storage.rows_to_frame(header, rows))
+                else:
+                    added = 0
+
+            if last_timestamp_ms is not None:
+                self.state['last_timestamp_ms'] = last_timestamp_ms
+            self._save_state()
+            span['rows_out'] = added
+        return added
+
+    def rebuild(self):
+        """
+        Cleans the whole war from its raw file the way the pipeline does,
+        replaces its section of every combined file, and resets the running
+        state to match. Returns the number of cleaned rows.
+        """
+        print(f"  - Rebuilding War {self.war_number} from {os.path.basename(self.raw_path)}.")
+        result = process_war(self.war_number, self.dataset_name, reset_policy=self.reset_policy)
+
+        state = {'last_timestamp_ms': self.last_timestamp_ms, 'reset_policy': self.reset_policy,
+                 'labels': {}, 'sections': {}}
+        state.update(running_state(storage.read_table(self.raw_path, columns=CASUALTY_COLUMNS)))
+
+        for branch in self.dataset.branches:
+            path = self.output_path(branch)
+            df = None if result is None else label_rows(*result, branch)
+            if not os.path.exists(path):
+                columns = list(df.columns) if df is not None else branch.final_columns
+                pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+            offset = find_war_section(path, self.war_number)
+            replace_section(path, offset, df)
+            state['sections'][branch.output_filename] = {'offset': offset, 'size': os.path.getsize(path)}
+            state['labels'][branch.output_filename] = None if result is None else result[1][branch.label]
+
+        self.state = state
+        return 0 if result is None else len(result[0])
+
+    def _sections_intact(self):
+        """
+        Returns True if every combined file is as this war last left it,
+        under the same reset policy.
+        """
+        if self.state.get('reset_policy', DEFAULT_POLICY) != self.reset_policy:
+            return False
+        for branch in self.dataset.branches:
+            section = self.state['sections'].get(branch.output_filename)
+            path = self.output_path(branch)
+            if section is None or not os.path.exists(path) or os.path.getsize(path) != section['size']:
+                return False
+        return True
+
+    def _clean_and_append(self, df):
+        """
+        Runs a batch of new raw rows through the cleaning chain, carrying
+        the reset and zero-casualty state over from the previous batch, and
+        adds the result to each combined file. Returns the number of
+        cleaned rows.
+        """
+        if df.empty or not set(CASUALTY_COLUMNS) <= set(df.columns):
+            print("  - No new rows with casualty columns. Nothing to add.")
+            return 0
+
+        # The first stage is cleaner2's advanced_clean; these are its steps
+        # with the state of the rows before this batch carried over
+        for col in CASUALTY_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        df = df.dropna(subset=CASUALTY_COLUMNS).astype({col: int for col in CASUALTY_COLUMNS})
+        if df.empty:
+            return 0
+
+        warden = df['WardenCasualties'].to_numpy()
+        colonial = df['ColonialCasualties'].to_numpy()
+        previous = self.state['casualties']
+        self.state['casualties'] = [int(warden[-1]), int(colonial[-1])]
+
+        # Step 1: a reset in this batch throws away everything before it,
+        # including the rows already in the combined files
+        start = last_reset(warden, colonial, previous)
+        reset = start is not None
+        if reset:
+            print(f"  - Casualty reset found. Restarting War {self.war_number} from its new data.")
+            df, warden, colonial = df.iloc[start:], warden[start:], colonial[start:]
+            self.state['fighting'] = False
+
+        # Step 2: once either side has casualties, rows where both are zero
+        # are dropped
+        active = (warden > 0) | (colonial > 0)
+        if self.state['fighting']:
+            first_action = -1
+        elif active.any():
+            first_action = int(np.argmax(active))
+        else:
+            first_action = len(active)
+        keep = active | (np.arange(len(active)) <= first_action)
+        if not keep.all():
+            print(f"  - Removing {int((~keep).sum())} mid-war rows with zero casualties.")
+        df = df[keep]
+        self.state['fighting'] = self.state['fighting'] or bool(active.any())
+
+        # Step 3, then the remaining stages as they are
+        df = transforms.drop_unnamed_columns(df)
+        for stage in self.dataset.stages[1:]:
+            df = stage.transform(df)
+
+        # The labels come from the latest captures, so the new rows decide them
+        labels = transforms.war_labels(df) if not df.empty else None
+        if labels is not None:
+            columns = [col for col in shared_columns(self.dataset) if col in df.columns or col == 'WarNumber']
+            rows = df.assign(WarNumber=self.war_number)[columns]
+            for branch in self.dataset.branches:
+                self._add_to_section(branch, label_rows(rows, labels, branch), labels[branch.label], reset)
+        return len(df)
+
+    def _add_to_section(self, branch, new_rows, label, reset):
+        """
+        Adds cleaned rows to the war's section of a branch's combined file.
+        The section is replaced after a reset and relabelled when the label
+        changes; otherwise the rows are simply appended.
+        """
+        output = branch.output_filename
+        path = self.output_path(branch)
+        section = self.state['sections'][output]
+
+        if reset:
+            replace_section(path, section['offset'], new_rows)
+        elif label != self.state['labels'].get(output):
+            relabel_section(path, section['offset'], branch.label, label)
+            append_section(path, new_rows)
+        else:
+            append_section(path, new_rows)
+
+        self.state['labels'][output] = label
+        section['size'] = os.path.getsize(path)
+
+    def _save_state(self):
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+
+
+def last_reset(warden, colonial, previous=None):
+    """
+    Returns the position of the last row where both sides' casualties fall
+    below the row before, or None if there isn't one. `previous` is the
+    (Warden, Colonial) casualties of the row before the first.
+    """
+    if previous is not None:
+        warden = np.concatenate([[previous[0]], warden])
+        colonial = np.concatenate([[previous[1]], colonial])
+    starts = resets.scan(warden, colonial).starts
+    if len(starts) == 1:
+        return None
+    return int(starts[-1]) - (1 if previous is not None else 0)
+
+
+def running_state(df):
+    """
+    Returns the cleaning state after every row of a raw war: the last
+    row's casualties and whether either side has scored since the last
+    reset.
+    """
+    if not set(CASUALTY_COLUMNS) <= set(df.columns):
+        return {'casualties': None, 'fighting': False}
+    casualties = df[CASUALTY_COLUMNS].apply(pd.to_numeric, errors='coerce').dropna()
+    if casualties.empty:
+        return {'casualties': None, 'fighting': False}
+
+    warden = casualties['WardenCasualties'].to_numpy()
+    colonial = casualties['ColonialCasualties'].to_numpy()
+    start = last_reset(warden, colonial) or 0
+    fighting = bool(((warden[start:] > 0) | (colonial[start:] > 0)).any())
+    return {'casualties': [int(warden[-1]), int(colonial[-1])], 'fighting': fighting}
+
+
+def find_war_section(path, war_number):
+    """
+    Returns the byte offset where a war's rows start in a combined CSV, or
+    the end of the file if it has none yet. A followed war's rows must be
+    the last ones in the file, so new rows can be appended after them.
+    """
+    war = str(war_number)
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8')]))
+        column = header.index('WarNumber')
+        offset = None
+        position = f.tell()
+        for line in iter(f.readline, b''):
+            is_war = line.decode('utf-8').rstrip('\r\n').split(',')[column] == war
+            if is_war and offset is None:
+                offset = position
+            elif not is_war and offset is not None:
+                raise ValueError(f"War {war_number} isn't the last war in '{os.path.basename(path)}', "
+                                 f"so it can't be followed.")
+            position = f.tell()
+    return position if offset is None else offset
+
+
+def _header(path):
+    """
+    Returns a combined CSV's columns under their canonical names, so rows
+    line up with a file written under an older spelling.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        return [canonical_name(col) for col in next(csv.reader(f))]
+
+
+def replace_section(path, offset, df):
+    """
+    Cuts a combined CSV off at `offset` and writes `df` (if any) in its place.
+    """
+    with open(path, 'r+b') as f:
+        f.truncate(offset)
+    if df is not None:
+        append_section(path, df)
+
+
+def append_section(path, df):
+    """
+    Appends rows to a combined CSV in the order of its header, matching
+    old column spellings to their canonical names.
+    """
+    df.reindex(columns=_header(path)).to_csv(path, mode='a', header=False, index=False)
+
+
+def relabel_section(path, offset, column, label):
+    """
+    Sets `column` to `label` in every row from `offset` on. The rows are
+    read back as text, so every other value is written out unchanged.
+    """
+    if os.path.getsize(path) == offset:
+        return
+    header = _header(path)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        section = pd.read_csv(f, header=None, names=header, dtype=str, keep_default_na=False)
+    if column in section.columns:
+        section[column] = str(label)
+    replace_section(path, offset, section)
@@ -0,0 +1,210 @@
+"""
+A build manifest that lets each stage skip work whose inputs haven't changed.
+
+For every stage and output, the manifest records a hash of each input file
+and a hash of the stage's parameters (column lists, war ranges, the schema
+version and the source of the code doing the work). A file is only processed again when one
+of those hashes changes or its output has gone missing. A nightly refresh
+where only the live war's CSV changed then touches just that war in every
+stage, and the combiners only re-concatenate when one of their inputs did.
+
+Hashing ~110 files is cheap, but to keep no-op runs instant the manifest
+also remembers each file's size and modification time and only re-hashes a
+file when those change.
+
+Scripts in the same folder can run at the same time (see
+warwatch.orchestrate), so saving merges this run's records into whatever
+is on disk, under a lock file, rather than overwriting it.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import time
+
+from warwatch import combine, features, instrument, labels, resample, resets, schema, storage, transforms, windows
+from warwatch.parallel import run_per_file, StageError
+from warwatch.schema import SCHEMA_VERSION
+
+MANIFEST_FILENAME = '.warwatch_manifest.json'
+
+# The shared modules whose code decides what the stages write: the
+# cleaning steps, the casualty-reset scan, the column schema and the way
+# tables are read and written. Hashed along with each stage's own script
+SHARED_SOURCES = [transforms.__file__, resets.__file__, schema.__file__, storage.__file__]
+
+# The modules that work out the label table, and those that build the
+# combined files from the cleaned wars: the streaming combine, the
+# feature matrix, the rolling-window features and the label table joined
+# onto every war. The pipeline also resamples them
+LABEL_SOURCES = [labels.__file__]
+COMBINE_SOURCES = [combine.__file__, features.__file__, windows.__file__] + LABEL_SOURCES
+PIPELINE_SOURCES = COMBINE_SOURCES + [resample.__file__]
+
+# How long to wait for another process to finish saving the manifest
+LOCK_TIMEOUT = 60
+
+
+def hash_params(params):
+    """
+    Returns a stable hash of a JSON-serializable parameter dict.
+    """
+    encoded = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def hash_source(*paths):
+    """
+    Returns a hash of the given source files, so a change to a script or the
+    shared modules (SHARED_SOURCES) invalidates everything it produced.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def code_hash(*paths):
+    """
+    Returns the code hash a stage records in its parameters: its own
+    source files plus SHARED_SOURCES, which every stage depends on. Every
+    manifest record goes through this, so none can leave them out.
+    """
+    return hash_source(*SHARED_SOURCES, *paths)
+
+
+@contextlib.contextmanager
+def _locked(path, timeout=LOCK_TIMEOUT):
+    """
+    Holds `path`.lock for the duration of the block. Creating the lock file
+    with O_EXCL works the same on every platform.
+    """
+    lock_path = path + '.lock'
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"'{lock_path}' has been locked for {timeout}s. "
+                                   f"Delete it if no other script is running.")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+class BuildManifest:
+    """
+    The manifest for one dataset folder, stored as JSON next to the data.
+    """
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.path = os.path.join(folder, MANIFEST_FILENAME)
+        self.data = self._load()
+        self._recorded = set()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {"hashes": {}, "stages": {}}
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self):
+        """
+        Writes this run's records into the manifest on disk, keeping any
+        that other scripts saved since it was loaded.
+        """
+        with _locked(self.path):
+            data = self._load()
+            data["hashes"].update(self.data["hashes"])
+            for stage, key in self._recorded:
+                data["stages"].setdefault(stage, {})[key] = self.data["stages"][stage][key]
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        self.data = data
+        self._recorded.clear()
+
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.folder)
+
+    def file_hash(self, path):
+        """
+        Returns the SHA-256 of a file, reusing the recorded hash while its
+        size and modification time are unchanged.
+        """
+        stat = os.stat(path)
+        key = self._key(path)
+        cached = self.data["hashes"].get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.data["hashes"][key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def _signature(self, inputs, params):
+        return {
+            "params": hash_params(params),
+            "inputs": {self._key(path): self.file_hash(path) for path in inputs},
+        }
+
+    def is_fresh(self, stage, key, inputs, params, outputs):
+        """
+        True if `key` was last built by `stage` from exactly these inputs and
+        parameters, and all of its outputs still exist.
+        """
+        record = self.data["stages"].get(stage, {}).get(key)
+        if record is None or not all(os.path.exists(path) for path in outputs):
+            return False
+        return record == self._signature(inputs, params)
+
+    def record(self, stage, key, inputs, params):
+        self.data["stages"].setdefault(stage, {})[key] = self._signature(inputs, params)
+        self._recorded.add((stage, key))
+
+
+def run_incremental(stage, func, files, *args, folder, output_folder, params, source_files=(), jobs=1, force=False):
+    """
+    Like run_per_file, but skips files that the manifest in `folder` says are
+    unchanged since `stage` last built them into `output_folder`. Files that
+    succeed are recorded even if others fail. Returns the number of files
+    processed.
+    """
+    params = dict(params, schema=SCHEMA_VERSION, code=code_hash(*source_files))
+
+    manifest = BuildManifest(folder)
+
+    def output_for(filename):
+        return storage.table_path(output_folder, os.path.basename(filename))
+
+    stale = [
+        filename for filename in files
+        if force or not manifest.is_fresh(stage, os.path.basename(filename), [filename], params, [output_for(filename)])
+    ]
+    if len(stale) < len(files):
+        print(f"Skipping {len(files) - len(stale)} unchanged file(s).\n")
+
+    results = []
+    try:
+        with instrument.span('stage', stage=stage, files=len(files), skipped=len(files) - len(stale), jobs=jobs):
+            results = run_per_file(func, stale, *args, jobs=jobs, stage=stage)
+    except StageError as e:
+        results = e.results
+        raise
+    finally:
+        for result in results:
+            if result.error is None:
+                manifest.record(stage, os.path.basename(result.item), [result.item], params)
+        manifest.save()
+
+    return len(stale)
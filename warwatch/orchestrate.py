@@ -0,0 +1,345 @@
+"""
+Runs the folder scripts of both datasets as one DAG of stages.
+
+Each dataset folder's scripts read the folder the one before wrote, so
+they have to be run in the right order. This declares that order once:
+
+    basic     cleaner1 -> removeredundants -> makelabels ------------> combiner
+                                          (-> onehotencoder)
+                                          (-> forregressionbasic)
+             (cleaner2)
+    extended  removeredundants -> removecolumns -> makelabels -> combiner
+                                               (-> onehotencoder)
+                                               (-> forregression)
+             (cleaner2)
+
+The extended folder has no cleaner1, so its cleaned_data is an input of
+the DAG rather than something a stage builds. The pipeline builds that
+dataset from the raw files with cleaner2's cleaning instead.
+
+The stages in brackets are optional. Each writes its own copy of every
+war that no combiner reads (the combiners take the labels from
+makelabels' war_labels table), so they only run when asked for with
+--with STAGE, or as the target of --until.
+
+Each script runs as its own process once the stages it needs have
+finished. Stages that don't depend on each other (the two datasets, or a
+dataset's label branches) run at the same time, up to --concurrency. The
+combiners write DataNoPopulationRegr2.csv and DataWithPopulationRegr.csv;
+the other combined files are only built by warwatch.pipeline.
+
+A stage whose input files, script, the warwatch modules it is built with
+and storage format are unchanged since it last succeeded, and whose
+outputs are all there, is skipped without starting it. The scripts skip
+unchanged files themselves too, so a stage that does run only redoes the
+wars that changed.
+
+Usage:
+    python -m warwatch.orchestrate [basic] [extended] [--until combiner] [--with onehotencoder] [--dry-run]
+        [--concurrency N] [--jobs N] [--force] [--format parquet] [--trace run.jsonl]
+
+--until STAGE runs only STAGE and the stages it needs, in every selected
+dataset; use e.g. "basic:makelabels" for one dataset. --with STAGE adds an
+optional stage, named the same way, to a full run. --dry-run prints
+which stages would run, in the order they would start, without running
+anything.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from warwatch import instrument, storage
+from warwatch.labels import LABEL_TABLE
+from warwatch.manifest import COMBINE_SOURCES, LABEL_SOURCES, BuildManifest, code_hash
+from warwatch.parallel import add_force_argument, add_jobs_argument
+from warwatch.pipeline import DATASETS, REPO_ROOT
+
+# A script in a dataset's stage DAG: the tables it reads and writes, as
+# patterns relative to the dataset folder, the stages that must finish
+# first, whether it takes --jobs, whether it only runs when asked for and
+# the warwatch modules beyond SHARED_SOURCES its output is built with
+Task = namedtuple('Task', ['name', 'inputs', 'outputs', 'needs', 'per_file', 'optional', 'sources'],
+                  defaults=[False, ()])
+
+# What happened to one stage: 'ran', 'fresh', 'failed' or 'skipped'
+TaskResult = namedtuple('TaskResult', ['task_id', 'status', 'output', 'seconds'])
+
+MANIFEST_STAGE = 'orchestrate'
+
+
+DAGS = {
+    'basic': [
+        Task('cleaner1', ['war_data_WC*'], ['cleaned_data/war_data_WC*'], [], True),
+        Task('cleaner2', ['war_data_WC*'], ['cleaned_data_advanced/war_data_WC*'], [], True, optional=True),
+        Task('removeredundants', ['cleaned_data/war_data_WC*'], ['final_cleaned_data/war_data_WC*'],
+             ['cleaner1'], True),
+        Task('makelabels', ['final_cleaned_data/war_data_WC*'], [LABEL_TABLE], ['removeredundants'], False,
+             sources=LABEL_SOURCES),
+        Task('onehotencoder', ['final_cleaned_data/war_data_WC*'], ['final_data_with_target/war_data_WC*'],
+             ['removeredundants'], True, optional=True),
+        Task('forregressionbasic', ['final_cleaned_data/war_data_WC*'],
+             ['data_with_win_margin_basic/war_data_WC*'], ['removeredundants'], True, optional=True),
+        Task('combiner', ['final_cleaned_data/war_data_WC*', LABEL_TABLE], ['DataNoPopulationRegr2'],
+             ['removeredundants', 'makelabels'], False, sources=COMBINE_SOURCES),
+    ],
+    'extended': [
+        Task('cleaner2', ['war_data_WC*'], ['cleaned_data_advanced/war_data_WC*'], [], True, optional=True),
+        Task('removeredundants', ['cleaned_data/war_data_WC*'], ['final_cleaned_data/war_data_WC*'], [], True),
+        Task('removecolumns', ['final_cleaned_data/war_data_WC*'], ['model_ready_data/war_data_WC*'],
+             ['removeredundants'], True),
+        Task('makelabels', ['model_ready_data/war_data_WC*'], [LABEL_TABLE], ['removecolumns'], False,
+             sources=LABEL_SOURCES),
+        Task('onehotencoder', ['model_ready_data/war_data_WC*'], ['final_data_with_target/war_data_WC*'],
+             ['removecolumns'], True, optional=True),
+        Task('forregression', ['model_ready_data/war_data_WC*'], ['data_with_win_margin/war_data_WC*'],
+             ['removecolumns'], True, optional=True),
+        Task('combiner', ['model_ready_data/war_data_WC*', LABEL_TABLE], ['DataWithPopulationRegr'],
+             ['removecolumns', 'makelabels'], False, sources=COMBINE_SOURCES),
+    ],
+}
+
+
+def task_id(name, task):
+    return f"{name}:{task.name}"
+
+
+def dataset_path(name):
+    return os.path.join(REPO_ROOT, DATASETS[name].folder)
+
+
+def script_path(name, task):
+    return os.path.join(dataset_path(name), f"{task.name}.py")
+
+
+def find_files(name, patterns):
+    """
+    Returns {pattern: [paths]} of the tables each pattern matches in the
+    dataset folder.
+    """
+    folder = dataset_path(name)
+    return {pattern: storage.find_tables(os.path.join(folder, os.path.dirname(pattern)), os.path.basename(pattern))
+            for pattern in patterns}
+
+
+def signature(name, task):
+    """
+    Returns the (inputs, params) a stage's freshness is judged on.
+    """
+    inputs = [path for paths in find_files(name, task.inputs).values() for path in paths]
+    params = {'format': storage.get_format(),
+              'code': code_hash(script_path(name, task), *task.sources)}
+    return inputs, params
+
+
+def is_fresh(name, task):
+    """
+    True if the stage last succeeded on exactly its current inputs and
+    every one of its outputs exists.
+    """
+    outputs = find_files(name, task.outputs)
+    if not all(outputs.values()):
+        return False
+    inputs, params = signature(name, task)
+    manifest = BuildManifest(dataset_path(name))
+    return manifest.is_fresh(MANIFEST_STAGE, task.name, inputs, params,
+                             [path for paths in outputs.values() for path in paths])
+
+
+def named_stage(spec, name):
+    """
+    Returns the stage a "STAGE" or "DATASET:STAGE" option names in dataset
+    `name`, or None if it names none there.
+    """
+    dataset, _, stage = spec.rpartition(':')
+    if (dataset and dataset != name) or stage not in {task.name for task in DAGS[name]}:
+        return None
+    return stage
+
+
+def select_tasks(names, until=None, extra=()):
+    """
+    Returns {task id: (dataset, task)} of the stages to run, in an order
+    where every stage comes after the ones it needs. By default that is
+    every stage that isn't optional, plus the optional ones named in
+    `extra`. With `until`, only that stage and the stages it needs are
+    kept.
+    """
+    selected = {}
+    for name in names:
+        tasks = {task.name: task for task in DAGS[name]}
+        if until is None:
+            pending = [task.name for task in DAGS[name] if not task.optional]
+            pending += [stage for stage in (named_stage(spec, name) for spec in extra) if stage]
+        else:
+            stage = named_stage(until, name)
+            if stage is None:
+                continue
+            pending = [stage]
+
+        keep = set()
+        while pending:
+            stage = pending.pop()
+            if stage not in keep:
+                keep.add(stage)
+                pending += tasks[stage].needs
+        for task in DAGS[name]:
+            if task.name in keep:
+                selected[task_id(name, task)] = (name, task)
+    return selected
+
+
+def waves(selected):
+    """
+    Groups the stages into waves: each wave needs only stages in earlier
+    waves, so a wave's stages can all run at once.
+    """
+    depth = {}
+    for tid, (name, task) in selected.items():
+        depth[tid] = 1 + max((depth[f"{name}:{need}"] for need in task.needs if f"{name}:{need}" in depth), default=-1)
+    return [[tid for tid in selected if depth[tid] == level] for level in range(max(depth.values(), default=-1) + 1)]
+
+
+def run_task(name, task, jobs=1, force=False):
+    """
+    Runs one stage's script in its own process unless it is fresh, and
+    records it in the dataset's manifest if it succeeds.
+    """
+    tid = task_id(name, task)
+    start = time.perf_counter()
+    with instrument.span('task', task=tid) as span:
+        if not force and is_fresh(name, task):
+            span['status'] = 'fresh'
+            return TaskResult(tid, 'fresh', '', time.perf_counter() - start)
+
+        inputs, params = signature(name, task)
+        command = [sys.executable, script_path(name, task)]
+        if task.per_file:
+            command += ['--jobs', str(jobs)]
+        if force:
+            command.append('--force')
+        # The children inherit --format, --csv-engine and --trace through
+        # the environment; their output is captured, so make it UTF-8
+        process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace',
+                                 env=dict(os.environ, PYTHONIOENCODING='utf-8'))
+        output = process.stdout + process.stderr
+        if process.returncode != 0:
+            span['status'] = 'failed'
+            return TaskResult(tid, 'failed', output, time.perf_counter() - start)
+
+        manifest = BuildManifest(dataset_path(name))
+        manifest.record(MANIFEST_STAGE, task.name, inputs, params)
+        manifest.save()
+        span['status'] = 'ran'
+    return TaskResult(tid, 'ran', output, time.perf_counter() - start)
+
+
+def report(result):
+    if result.status == 'fresh':
+        print(f"✅ {result.task_id} is up to date.")
+    elif result.status == 'skipped':
+        print(f"⚠️ {result.task_id} skipped: a stage it needs failed.")
+    else:
+        print(f"\n--- {result.task_id} ({result.seconds:.1f}s) ---")
+        print(result.output.rstrip())
+        if result.status == 'failed':
+            print(f"❌ {result.task_id} failed.")
+
+
+def run(selected, concurrency=4, jobs=1, force=False):
+    """
+    Runs the selected stages, each as soon as the stages it needs have
+    succeeded, at most `concurrency` at a time. Returns the TaskResults in
+    the order the stages finished.
+    """
+    results = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        while len(results) < len(selected):
+            for tid, (name, task) in selected.items():
+                if tid in results or tid in running or len(running) >= max(concurrency, 1):
+                    continue
+                needs = [f"{name}:{need}" for need in task.needs if f"{name}:{need}" in selected]
+                statuses = [results[need].status for need in needs if need in results]
+                if any(status in ('failed', 'skipped') for status in statuses):
+                    results[tid] = TaskResult(tid, 'skipped', '', 0)
+                    report(results[tid])
+                elif len(statuses) == len(needs):
+                    running[tid] = executor.submit(run_task, name, task, jobs, force)
+            if not running:
+                continue
+
+            done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for tid in [tid for tid, future in running.items() if future in done]:
+                results[tid] = running.pop(tid).result()
+                report(results[tid])
+    return list(results.values())
+
+
+def dry_run(selected, force=False):
+    """
+    Prints each wave of stages and whether each would run. A stage runs if
+    it isn't fresh or a stage it needs would run.
+    """
+    would_run = {}
+    for tid, (name, task) in selected.items():
+        upstream = any(would_run.get(f"{name}:{need}") for need in task.needs)
+        would_run[tid] = force or upstream or not is_fresh(name, task)
+
+    for level, wave in enumerate(waves(selected), start=1):
+        print(f"Wave {level}:")
+        for tid in wave:
+            print(f"  {'run       ' if would_run[tid] else 'up to date'}  {tid}")
+    print(f"\n{sum(would_run.values())} of {len(selected)} stage(s) would run.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every dataset's folder scripts in dependency order.")
+    parser.add_argument("datasets", nargs="*", metavar="dataset",
+                        help=f"Datasets to build: {', '.join(sorted(DAGS))} (default: all)")
+    parser.add_argument("--until", metavar="STAGE",
+                        help='Stop after this stage, e.g. "makelabels" or "basic:makelabels"')
+    parser.add_argument("--with", dest="extra", action="append", default=[], metavar="STAGE",
+                        help='Also run an optional stage, e.g. "onehotencoder" or "basic:forregressionbasic"; '
+                             'repeatable')
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run, without running it")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Number of stages to run at the same time (default: 4)")
+    add_jobs_argument(parser)
+    add_force_argument(parser)
+    storage.add_format_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args()
+    storage.apply_storage_arguments(args)
+    instrument.configure(args)
+
+    unknown = [name for name in args.datasets if name not in DAGS]
+    if unknown:
+        parser.error(f"unknown dataset(s): {', '.join(unknown)}")
+    names = args.datasets or sorted(DAGS)
+    unknown = [spec for spec in args.extra if not any(named_stage(spec, name) for name in names)]
+    if unknown:
+        parser.error(f"no stage called {', '.join(repr(spec) for spec in unknown)} in the selected dataset(s)")
+    selected = select_tasks(names, args.until, args.extra)
+    if not selected:
+        parser.error(f"no stage called '{args.until}' in the selected dataset(s)")
+
+    if args.dry_run:
+        dry_run(selected, force=args.force)
+        return
+
+    with instrument.profiled(args.profile):
+        results = run(selected, concurrency=args.concurrency, jobs=args.jobs, force=args.force)
+
+    failed = [result.task_id for result in results if result.status == 'failed']
+    ran = sum(result.status == 'ran' for result in results)
+    if failed:
+        sys.exit(f"\n❌ {len(failed)} stage(s) failed: {', '.join(failed)}")
+    print(f"\n✅ Ran {ran} of {len(results)} stage(s); the rest were up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Runs a per-file function over many war files on a process pool.
+
+Every war file is independent, so the scripts hand their per-file function
+to run_per_file instead of looping themselves. Each call's printed output is
+captured and reported in file order, so the log reads the same however many
+jobs run. A failure in one file doesn't stop the others. Once every file has
+been reported, a StageError lists the files that failed.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from warwatch import instrument, storage
+
+# The outcome of one call: its return value, captured output and any traceback
+FileResult = namedtuple('FileResult', ['item', 'value', 'output', 'error'])
+
+
+class StageError(Exception):
+    """
+    Raised once all files have been processed if any of them failed.
+    """
+    def __init__(self, failed, results):
+        self.failed = failed
+        self.results = results
+        names = ', '.join(describe(result.item) for result in failed)
+        super().__init__(f"{len(failed)} file(s) failed: {names}")
+
+
+def describe(item):
+    return os.path.basename(item) if isinstance(item, str) else str(item)
+
+
+def resolve_jobs(jobs):
+    """
+    Returns the number of worker processes to use; 0 means one per CPU core.
+    """
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+
+def _run_captured(func, item, args, stage):
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer), instrument.span('file', stage=stage, item=describe(item)):
+            value = func(item, *args)
+        return FileResult(item, value, buffer.getvalue(), None)
+    except Exception:
+        return FileResult(item, None, buffer.getvalue(), traceback.format_exc())
+
+
+def run_per_file(func, items, *args, jobs=1, stage=None):
+    """
+    Calls func(item, *args) for every item, on `jobs` worker processes, and
+    prints each call's output in the order of `items`. Returns the list of
+    FileResults, or raises StageError after reporting if any call failed.
+    Each call is traced as a 'file' span of `stage` (default: func's name).
+
+    `func` must be a module-level function so it can be sent to the workers.
+    """
+    items = list(items)
+    jobs = min(resolve_jobs(jobs), max(len(items), 1))
+    stage = stage or func.__name__
+
+    if jobs == 1:
+        results = (_run_captured(func, item, args, stage) for item in items)
+        results = [report(result) for result in results]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            count = len(items)
+            results = executor.map(_run_captured, [func] * count, items, [args] * count, [stage] * count)
+            results = [report(result) for result in results]
+
+    failed = [result for result in results if result.error is not None]
+    if failed:
+        raise StageError(failed, results)
+    return results
+
+
+def report(result):
+    print(result.output, end='')
+    if result.error is not None:
+        print(f"  - ❌ An error occurred while processing {describe(result.item)}:")
+        print(''.join(f"      {line}\n" for line in result.error.rstrip().splitlines()), end='')
+    return result
+
+
+def add_jobs_argument(parser):
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes; 0 uses every CPU core (default: 1)")
+
+
+def add_force_argument(parser):
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild every file, even those the build manifest says are unchanged")
+
+
+def script_main(func, description):
+    """
+    Command-line entry point shared by the per-file scripts: parses --jobs,
+    --force, --format, --csv-engine, --trace and --profile, runs
+    func(jobs=..., force=...) and exits with status 1 if any file failed.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    add_jobs_argument(parser)
+    add_force_argument(parser)
+    storage.add_format_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args()
+    storage.apply_storage_arguments(args)
+    instrument.configure(args)
+
+    try:
+        with instrument.profiled(args.profile):
+            func(jobs=args.jobs, force=args.force)
+    except StageError as e:
+        sys.exit(f"\n❌ {e}")
@@ -0,0 +1,340 @@
+"""
+Runs the whole cleaning chain for a dataset in memory, one pass per war.
+
+The standalone scripts each read a folder of CSVs, change them, and write a
+new folder for the next script to read back. This runner reads each raw
+war_data_WC*.csv once and pushes the DataFrame through the same transforms.
+Every label is worked out once per war and joined onto each combined file
+as it is written, along with a per-war label table. It then writes only the
+combined datasets, each with its rolling-window features (see
+warwatch.windows), plus a copy of each resampled onto every cadence given
+with --resample (see warwatch.resample). Pass --write-intermediate to
+also write every stage's folder, e.g. to compare them with the scripts'
+output, in the format chosen with --format. Each dataset is cleaned the
+way its scripts clean it, so both write the same combined files: basic
+with cleaner1's truncation after the casualty peak, extended with
+cleaner2's cleaning. The extended dataset's casualty resets are handled
+by the reset policy chosen with --reset-policy (see warwatch.resets);
+with 'split-into-segments' its combined files gain a Segment column. A
+dataset whose raw files and code are unchanged since its last build is
+skipped; pass --force to rebuild it anyway. A dataset with wars in its
+ranges that have no raw file isn't built, so a partial checkout never
+replaces the published files with part of the data; pass
+--allow-missing to build it from the wars that are there.
+
+Usage:
+    python -m warwatch.pipeline basic extended [--write-intermediate] [--format parquet] [--jobs N] [--force]
+        [--allow-missing] [--resample 1h] [--reset-policy keep-after-last-reset] [--trace run.jsonl]
+        [--profile run.prof]
+"""
+import argparse
+import os
+import sys
+from collections import namedtuple
+from functools import partial
+
+import pandas as pd
+
+from warwatch import instrument, resets, storage, transforms
+from warwatch.combine import stream_combine
+from warwatch.features import features_path
+from warwatch.labels import LABEL_COLUMNS, LABEL_TABLE
+from warwatch.manifest import PIPELINE_SOURCES, BuildManifest, code_hash
+from warwatch.resample import resample_wars, resampled_path, write_resampled
+from warwatch.parallel import add_force_argument, add_jobs_argument, run_per_file, StageError
+from warwatch.resets import DEFAULT_POLICY, SEGMENT_COLUMN
+from warwatch.schema import QUEUE_COLUMNS, REDUNDANT_COLUMNS, SCHEMA_VERSION
+from warwatch.windows import DEFAULT_WINDOWS, windows_path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One step of the per-war cleaning chain and the folder its script writes to
+Stage = namedtuple('Stage', ['folder', 'transform'])
+
+# A label, the folder its script used to write and the combined file it feeds
+Branch = namedtuple('Branch', ['folder', 'label', 'output_filename', 'final_columns'])
+
+# A dataset folder with its war ranges, cleaning chain and label branches
+Dataset = namedtuple('Dataset', ['folder', 'war_numbers', 'stages', 'branches'])
+
+BASIC_COLUMNS = [
+    "WarNumber", "Timestamp", "WardenCaptures", "ColonialCaptures", "WardenCasualties",
+    "ColonialCasualties", "WardenCasualtyRate", "ColonialCasualtyRate", "SteamPlayers"
+]
+EXTENDED_COLUMNS = [
+    "WarNumber", "Timestamp", "WardenPlayers", "ColonialPlayers", "WardenCaptures", "ColonialCaptures",
+    "WardenCasualties", "ColonialCasualties", "WardenCasualtyRate", "ColonialCasualtyRate",
+    "SteamPlayers", "WardenPlayHours", "ColonialPlayHours"
+]
+
+DATASETS = {
+    # cleaner1 -> removeredundants -> makelabels -> combiner
+    'basic': Dataset(
+        folder='Basic Data (Uncleaned)',
+        war_numbers=list(range(20, 63)) + list(range(112, 126)),
+        stages=[
+            Stage('cleaned_data', transforms.truncate_after_peak),
+            Stage('final_cleaned_data', partial(transforms.drop_columns, columns=REDUNDANT_COLUMNS)),
+        ],
+        branches=[
+            Branch('final_data_with_target', 'Target',
+                   'DataNoPopulation.csv', BASIC_COLUMNS + ['Target']),
+            Branch('data_with_win_margin_basic', 'WinMargin',
+                   'DataNoPopulationRegr.csv', BASIC_COLUMNS + ['WinMargin']),
+            Branch('data_with_squared_margin_basic', 'SquaredWinMargin',
+                   'DataNoPopulationRegr2.csv', BASIC_COLUMNS + ['SquaredWinMargin']),
+        ],
+    ),
+    # cleaner2 -> removeredundants -> removecolumns -> makelabels -> combiner
+    'extended': Dataset(
+        folder='Population Extended (Uncleaned)',
+        war_numbers=list(range(63, 112)),
+        stages=[
+            Stage('cleaned_data', transforms.advanced_clean),
+            Stage('final_cleaned_data', partial(transforms.drop_columns, columns=REDUNDANT_COLUMNS)),
+            Stage('model_ready_data', partial(transforms.drop_columns, columns=QUEUE_COLUMNS)),
+        ],
+        branches=[
+            Branch('final_data_with_target', 'Target',
+                   'DataWithPopulation.csv', EXTENDED_COLUMNS + ['Target']),
+            Branch('data_with_win_margin', 'WinMargin',
+                   'DataWithPopulationRegr.csv', EXTENDED_COLUMNS + ['WinMargin']),
+        ],
+    ),
+}
+
+
+def process_war(war_number, name, write_intermediate=False, reset_policy=DEFAULT_POLICY):
+    """
+    Reads one raw war file, runs it through the cleaning chain with the
+    given reset policy and works out its labels. Returns (rows, labels):
+    the cleaned rows cut down to the columns the combined files share, and
+    {label: value}. Returns None if the war has no usable data.
+    """
+    dataset = DATASETS[name]
+    dataset_path = os.path.join(REPO_ROOT, dataset.folder)
+    raw_path = storage.find_table(dataset_path, f"war_data_WC{war_number}")
+    if raw_path is None:
+        print(f"  - Warning: Could not find data for War {war_number}. Skipping.")
+        return None
+
+    base_filename = os.path.basename(raw_path)
+    print(f"Processing: {base_filename}")
+    df = storage.read_table(raw_path)
+
+    for stage in dataset.stages:
+        df = run_transform(stage_transform(stage, reset_policy), df, stage.folder, war_number)
+        if df is None:
+            return None
+        if write_intermediate:
+            write_stage_file(df, dataset_path, stage.folder, base_filename)
+
+    with instrument.span('transform', stage='labels', war=war_number, rows_in=len(df)):
+        labels = transforms.war_labels(df)
+    if labels is None:
+        return None
+
+    if write_intermediate:
+        for branch in dataset.branches:
+            write_stage_file(df.assign(**{branch.label: labels[branch.label]}),
+                             dataset_path, branch.folder, base_filename)
+
+    # Project down to the combined files' columns straight away so only
+    # the columns that end up in the output are kept for every war
+    columns = [col for col in shared_columns(dataset) if col in df.columns or col == 'WarNumber']
+    return df.assign(WarNumber=war_number)[with_segment(columns, df)], labels
+
+
+def stage_transform(stage, reset_policy):
+    """
+    Returns a stage's transform, with the reset policy passed to
+    cleaner2's cleaning stage.
+    """
+    if stage.transform is transforms.advanced_clean:
+        return partial(transforms.advanced_clean, policy=reset_policy)
+    return stage.transform
+
+
+def shared_columns(dataset):
+    """
+    Returns every column of the dataset's combined files except the labels.
+    """
+    columns = []
+    for branch in dataset.branches:
+        columns += [col for col in branch.final_columns if col not in LABEL_COLUMNS and col not in columns]
+    return columns
+
+
+def with_segment(columns, df):
+    """
+    Adds the Segment column after WarNumber if the rows were split into
+    segments.
+    """
+    if SEGMENT_COLUMN not in df.columns:
+        return columns
+    position = columns.index('WarNumber') + 1
+    return columns[:position] + [SEGMENT_COLUMN] + columns[position:]
+
+
+def label_rows(rows, labels, branch):
+    """
+    Returns a war's projected rows with the branch's label joined on, in
+    the order of the branch's combined file.
+    """
+    labelled = rows.assign(**{branch.label: labels[branch.label]})
+    return labelled[[col for col in with_segment(branch.final_columns, rows) if col in labelled.columns]]
+
+
+def run_transform(transform, df, stage, war_number):
+    """
+    Applies one transform, traced as a 'transform' span with its row counts.
+    """
+    with instrument.span('transform', stage=stage, war=war_number, rows_in=len(df)) as span:
+        df = transform(df)
+        span['rows_out'] = 0 if df is None else len(df)
+    return df
+
+
+def write_stage_file(df, dataset_path, folder, base_filename):
+    output_folder = os.path.join(dataset_path, folder)
+    os.makedirs(output_folder, exist_ok=True)
+    storage.write_table(df, storage.table_path(output_folder, base_filename))
+
+
+def describe_wars(war_numbers):
+    """
+    Returns sorted war numbers as runs, e.g. "20-62, 75, 112-125".
+    """
+    runs = []
+    for war_number in sorted(war_numbers):
+        if runs and runs[-1][1] == war_number - 1:
+            runs[-1][1] = war_number
+        else:
+            runs.append([war_number, war_number])
+    return ', '.join(str(first) if first == last else f"{first}-{last}" for first, last in runs)
+
+
+def run_dataset(name, write_intermediate=False, jobs=1, force=False, resample=(), reset_policy=DEFAULT_POLICY,
+                allow_missing=False):
+    """
+    Runs the full pipeline for one dataset and writes its combined files,
+    and a resampled copy of each for every cadence in `resample`. Wars are
+    processed on `jobs` worker processes and combined in war order. Skips
+    the dataset if the build manifest says nothing has changed. Returns
+    False, without writing anything, if a war in the dataset's ranges has
+    no raw file, unless `allow_missing` is set.
+    """
+    dataset = DATASETS[name]
+    dataset_path = os.path.join(REPO_ROOT, dataset.folder)
+
+    print(f"=== Running the '{name}' pipeline in '{dataset.folder}' ===\n")
+
+    manifest = BuildManifest(dataset_path)
+    raw_paths = {war_number: storage.find_table(dataset_path, f"war_data_WC{war_number}")
+                 for war_number in dataset.war_numbers}
+    raw_files = [path for path in raw_paths.values() if path is not None]
+    missing = [war_number for war_number, path in raw_paths.items() if path is None]
+    if missing:
+        print(f"⚠️ No raw file for {len(missing)} of the {len(raw_paths)} wars: {describe_wars(missing)}.")
+        if not allow_missing:
+            print(f"❌ Not building '{name}', so its published files aren't replaced with part of the data. "
+                  f"Pass --allow-missing to build it from the {len(raw_files)} wars found.\n")
+            return False
+    params = {'wars': dataset.war_numbers, 'schema': SCHEMA_VERSION, 'resample': list(resample),
+              'windows': DEFAULT_WINDOWS, 'reset_policy': reset_policy,
+              'code': code_hash(*PIPELINE_SOURCES, __file__)}
+    combined = [os.path.join(dataset_path, branch.output_filename) for branch in dataset.branches]
+    outputs = combined + [features_path(path) for path in combined] + [windows_path(path) for path in combined]
+    outputs += [storage.table_path(dataset_path, LABEL_TABLE)]
+    outputs += [resampled_path(path, cadence) for path in combined for cadence in resample]
+    # The intermediate folders aren't tracked, so always rebuild when asked for them
+    if not (force or write_intermediate) and manifest.is_fresh('pipeline', name, raw_files, params, outputs):
+        print(f"✅ Nothing changed since the last build. Skipping '{name}'.\n")
+        return True
+
+    with instrument.span('dataset', dataset=name, wars=len(raw_files), jobs=jobs):
+        results = run_per_file(process_war, dataset.war_numbers, name, write_intermediate, reset_policy,
+                               jobs=jobs, stage=f"pipeline:{name}")
+        combine_results(dataset, dataset_path, results, resample)
+
+    manifest.record('pipeline', name, raw_files, params)
+    manifest.save()
+    print()
+    return True
+
+
+def combine_results(dataset, dataset_path, results, resample=()):
+    """
+    Writes the dataset's label table, then streams the wars in war order
+    into each branch's combined file, feature matrix and rolling-window
+    features, joining each war's labels on as it goes (see
+    warwatch.combine), and resamples them onto every cadence in
+    `resample` a war at a time.
+    """
+    wars = [result.value for result in results if result.value is not None]
+    if wars:
+        label_table = pd.DataFrame([{'WarNumber': rows['WarNumber'].iloc[0], **labels} for rows, labels in wars],
+                                   columns=['WarNumber'] + LABEL_COLUMNS)
+        storage.write_table(label_table, storage.table_path(dataset_path, LABEL_TABLE))
+    war_rows = [(int(rows['WarNumber'].iloc[0]), rows) for rows, _ in wars]
+    war_labels = {war_number: labels for (war_number, _), (_, labels) in zip(war_rows, wars)}
+
+    for branch in dataset.branches:
+        if not wars:
+            print(f"❌ No data to combine into '{branch.output_filename}'.")
+            continue
+
+        output_path = os.path.join(dataset_path, branch.output_filename)
+        stream_combine(war_rows, with_segment(branch.final_columns, wars[0][0]), output_path,
+                       features_path=features_path(output_path), labels=war_labels,
+                       windows_path=windows_path(output_path))
+        print(f"✅ Combined {len(wars)} wars into '{branch.output_filename}'.")
+
+        for cadence in resample:
+            resampled = resample_wars((label_rows(rows, labels, branch) for rows, labels in wars), cadence)
+            write_resampled(resampled, resampled_path(output_path, cadence))
+            print(f"✅ Resampled '{branch.output_filename}' every {cadence} into {len(resampled)} rows.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the cleaning pipeline in memory, one pass per war.")
+    parser.add_argument("datasets", nargs="*", metavar="dataset",
+                        help=f"Datasets to build: {', '.join(sorted(DATASETS))} (default: all)")
+    parser.add_argument("--write-intermediate", action="store_true",
+                        help="Also write every stage's output folder, for debugging")
+    parser.add_argument("--resample", action="append", default=[], metavar="CADENCE",
+                        help='Also write each combined file resampled every CADENCE, e.g. "1h"; repeatable')
+    resets.add_reset_policy_argument(parser)
+    add_jobs_argument(parser)
+    add_force_argument(parser)
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Build a dataset even if some of its wars have no raw file")
+    storage.add_format_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args()
+    storage.apply_storage_arguments(args)
+    instrument.configure(args)
+
+    unknown = [name for name in args.datasets if name not in DATASETS]
+    if unknown:
+        parser.error(f"unknown dataset(s): {', '.join(unknown)}")
+    for cadence in args.resample:
+        try:
+            pd.Timedelta(cadence)
+        except ValueError:
+            parser.error(f"'{cadence}' isn't a cadence, e.g. \"10min\", \"1h\" or \"1D\"")
+
+    try:
+        with instrument.profiled(args.profile):
+            refused = [name for name in args.datasets or sorted(DATASETS)
+                       if not run_dataset(name, write_intermediate=args.write_intermediate, jobs=args.jobs,
+                                          force=args.force, resample=args.resample, reset_policy=args.reset_policy,
+                                          allow_missing=args.allow_missing)]
+    except StageError as e:
+        sys.exit(f"\n❌ {e}")
+    if refused:
+        sys.exit(f"❌ Not built, as wars are missing: {', '.join(refused)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Indexed queries over the combined war datasets.
+
+Slicing a combined CSV by war or time window used to mean loading all of
+it and filtering. The index built here records where every row starts in
+the file, along with its WarNumber and Timestamp. Queries look up the rows
+they need and read only those bytes.
+
+The index is saved next to the CSV as .<name>.idx.npz and rebuilt on the
+next query once the CSV's size or modification time changes, so rewriting
+a combined file (combiner, pipeline or --follow) invalidates it.
+
+    from warwatch.query import CombinedIndex
+
+    index = CombinedIndex("Usable Data/DataWithPopulationRegr.csv")
+    index.war(87, days=(3, 5))     # War 87, days 3 to 5
+    index.last_rows()              # The last row of every war
+
+Or from the command line:
+    python -m warwatch.query "Usable Data/DataWithPopulationRegr.csv" --war 87 --days 3-5
+"""
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from warwatch.schema import TIMESTAMP_FORMAT, apply_schema
+
+# Bump when the index layout changes so old index files are rebuilt
+INDEX_VERSION = 1
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+
+def index_path(path):
+    """
+    Returns where the index of the CSV at `path` is stored.
+    """
+    folder, filename = os.path.split(path)
+    return os.path.join(folder, f".{os.path.splitext(filename)[0]}.idx.npz")
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return np.array([INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+class CombinedIndex:
+    """
+    A (WarNumber, Timestamp) index over one combined CSV. Loads the saved
+    index, or builds and saves it if it is missing or out of date.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._load_or_build()
+
+    def _load_or_build(self):
+        stamp = _stamp(self.path)
+        saved = index_path(self.path)
+        if os.path.exists(saved):
+            with np.load(saved) as index:
+                if np.array_equal(index['stamp'], stamp):
+                    self._set(index['header'].tolist(), index['offsets'], index['wars'],
+                              index['war_starts'], index['timestamps'])
+                    return
+        self.build()
+
+    def _set(self, header, offsets, wars, war_starts, timestamps):
+        self.header = header
+        self.offsets = offsets
+        self.wars = wars
+        self.war_starts = war_starts
+        self.timestamps = timestamps
+        self.stamp = _stamp(self.path)
+
+    def build(self):
+        """
+        Scans the CSV once and saves its index.
+        """
+        with open(self.path, 'rb') as f:
+            data = np.frombuffer(f.read(), dtype=np.uint8)
+
+        # Every row starts after a newline; the last offset is the end of
+        # the file, so row i is the bytes offsets[i]:offsets[i + 1]
+        line_ends = np.flatnonzero(data == ord('\n')) + 1
+        if not len(line_ends) or line_ends[-1] != len(data):
+            line_ends = np.append(line_ends, len(data))
+        offsets = line_ends.astype(np.int64)
+
+        keys = pd.read_csv(self.path, usecols=['WarNumber', 'Timestamp'], skip_blank_lines=False)
+        if len(keys) != len(offsets) - 1:
+            raise ValueError(f"Can't index '{os.path.basename(self.path)}': it has blank or multi-line rows.")
+
+        war_numbers = keys['WarNumber'].to_numpy()
+        timestamps = pd.to_datetime(keys['Timestamp'], format=TIMESTAMP_FORMAT).to_numpy().astype('datetime64[s]')
+
+        # Each war's rows must be one contiguous run, as the combiners write them
+        changes = np.flatnonzero(war_numbers[1:] != war_numbers[:-1]) + 1
+        war_starts = np.concatenate([[0], changes, [len(war_numbers)]] if len(war_numbers) else [[0]]).astype(np.int64)
+        wars = war_numbers[war_starts[:-1]].astype(np.int64)
+        if len(np.unique(wars)) != len(wars):
+            raise ValueError(f"Can't index '{os.path.basename(self.path)}': its wars aren't in contiguous runs.")
+
+        header = pd.read_csv(self.path, nrows=0).columns.tolist()
+        self._set(header, offsets, wars, war_starts, timestamps)
+        np.savez(index_path(self.path), stamp=self.stamp, header=np.array(header), offsets=offsets,
+                 wars=wars, war_starts=war_starts, timestamps=timestamps)
+
+    def refresh(self):
+        """
+        Rebuilds the index if the CSV has changed since it was loaded.
+        """
+        if not np.array_equal(_stamp(self.path), self.stamp):
+            self._load_or_build()
+
+    def war_numbers(self):
+        return self.wars.tolist()
+
+    def _war_rows(self, war_number):
+        found = np.flatnonzero(self.wars == war_number)
+        if not len(found):
+            raise KeyError(f"War {war_number} isn't in '{os.path.basename(self.path)}'.")
+        return self.war_starts[found[0]], self.war_starts[found[0] + 1]
+
+    def war(self, war_number, start=None, end=None, days=None, columns=None, as_array=False):
+        """
+        Returns a war's rows, optionally only those from `start` up to (not
+        including) `end`. `days=(first, last)` selects by day of the war
+        instead: day 1 is the first 24 hours after the war's first row, and
+        both days are included.
+        """
+        self.refresh()
+        first, stop = self._war_rows(war_number)
+        timestamps = self.timestamps[first:stop]
+
+        if days is not None:
+            war_start = timestamps.min()
+            start = war_start + (days[0] - 1) * ONE_DAY
+            end = war_start + days[1] * ONE_DAY
+        selected = np.ones(len(timestamps), dtype=bool)
+        if start is not None:
+            selected &= timestamps >= np.datetime64(pd.Timestamp(start), 's')
+        if end is not None:
+            selected &= timestamps < np.datetime64(pd.Timestamp(end), 's')
+
+        # Read the span from the first to the last selected row, then drop
+        # any unselected rows inside it (the clocks can go back an hour)
+        rows = np.flatnonzero(selected)
+        if not len(rows):
+            return self._result(self._read_spans([]), columns, as_array)
+        df = self._read_spans([(first + rows[0], first + rows[-1] + 1)])
+        df = df[selected[rows[0]:rows[-1] + 1]].reset_index(drop=True)
+        return self._result(df, columns, as_array)
+
+    def last_rows(self, columns=None, as_array=False):
+        """
+        Returns the last row of every war, in war order.
+        """
+        self.refresh()
+        ends = self.war_starts[1:]
+        return self._result(self._read_spans(zip(ends - 1, ends)), columns, as_array)
+
+    def _read_spans(self, spans):
+        """
+        Reads the rows in each (first, stop) span of row numbers.
+        """
+        buffer = io.BytesIO()
+        with open(self.path, 'rb') as f:
+            for first, stop in spans:
+                f.seek(self.offsets[first])
+                buffer.write(f.read(self.offsets[stop] - self.offsets[first]))
+        if not buffer.tell():
+            # Nothing matched; type the empty result like a real row would be
+            if len(self.offsets) < 2:
+                return pd.DataFrame(columns=self.header)
+            return self._read_spans([(0, 1)]).iloc[:0]
+        buffer.seek(0)
+        return apply_schema(pd.read_csv(buffer, header=None, names=self.header))
+
+    @staticmethod
+    def _result(df, columns, as_array):
+        if columns is not None:
+            df = df[columns]
+        return df.to_numpy() if as_array else df
+
+
+def parse_days(text):
+    first, _, last = text.partition('-')
+    return int(first), int(last or first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a combined dataset by war and time window.")
+    parser.add_argument("path", help="A combined CSV, e.g. 'Usable Data/DataWithPopulationRegr.csv'")
+    parser.add_argument("--war", type=int, help="The war to return")
+    parser.add_argument("--days", type=parse_days, help='Days of the war to return, e.g. "3-5" (default: all)')
+    parser.add_argument("--start", help="Return rows from this timestamp on")
+    parser.add_argument("--end", help="Return rows before this timestamp")
+    parser.add_argument("--last", action="store_true", help="Return the last row of every war instead")
+    parser.add_argument("--columns", help="Comma-separated columns to return (default: all)")
+    args = parser.parse_args()
+    if args.last == (args.war is not None):
+        parser.error("pass either --war or --last")
+
+    index = CombinedIndex(args.path)
+    columns = args.columns.split(',') if args.columns else None
+    if args.last:
+        df = index.last_rows(columns=columns)
+    else:
+        df = index.war(args.war, start=args.start, end=args.end, days=args.days, columns=columns)
+    print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
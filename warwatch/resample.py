@@ -0,0 +1,180 @@
+"""
+Resamples the combined war datasets onto a fixed cadence.
+
+The site's snapshots come at uneven intervals (10 minutes for some wars,
+30 for others) and cleaning leaves holes where it drops rows. Resampling
+puts every war on the same grid, e.g. one row per hour, so wars of the
+same length have the same number of rows.
+
+Each grid point is the state of the war as of that time. A column's rule
+says how the rows since the previous grid point become one value:
+
+    'last'         the latest value, for running totals such as captures
+    'mean', 'max', 'min', 'first', 'sum'
+                   the usual aggregations
+    'interpolate'  linear in time between the rows either side
+
+A grid point with no rows since the previous one keeps the previous value
+('sum' gives 0). Every resampled war also gets an ElapsedHours column, the
+time since the war's first row.
+
+    python -m warwatch.resample "Usable Data/DataWithPopulationRegr.csv" --cadence 1h
+        [--rule WardenPlayers=interpolate]
+
+writes DataWithPopulationRegr_1h.csv next to the input. The pipeline's
+--resample option does the same for every combined file it writes.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from warwatch import instrument
+from warwatch.schema import TIMESTAMP_FORMAT
+from warwatch.storage import read_table
+
+AGGREGATIONS = ['last', 'first', 'mean', 'max', 'min', 'sum']
+INTERPOLATE = 'interpolate'
+
+# How each column is resampled unless told otherwise; anything else uses 'last'
+DEFAULT_RULES = {
+    # Players online and casualty rates are readings at a moment in time
+    'WardenPlayers': 'mean', 'ColonialPlayers': 'mean', 'SteamPlayers': 'mean',
+    'WardenCasualtyRate': 'mean', 'ColonialCasualtyRate': 'mean',
+    'WardenQueued': 'mean', 'ColonialQueued': 'mean',
+    'WardenPlayersMore': 'mean', 'ColonialPlayersMore': 'mean',
+    # A queue warning at any point since the last grid point counts
+    'WardenQueueWarning': 'max', 'ColonialQueueWarning': 'max',
+}
+
+# Columns that place a row rather than describe the war
+KEY_COLUMNS = ['WarNumber', 'Timestamp']
+
+
+def resampled_path(path, cadence):
+    """
+    Returns where the resampled copy of a combined CSV is written.
+    """
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_{cadence}{extension}"
+
+
+def resample_war(df, cadence, rules=None):
+    """
+    Resamples one war's rows onto a grid every `cadence` (anything
+    pd.Timedelta accepts, e.g. '10min', '1h' or '1D'). The grid runs from
+    the first multiple of the cadence at or after the war's first row to
+    the first at or after its last, so every row falls into exactly one
+    grid point. `rules` maps columns to rules and overrides DEFAULT_RULES.
+    """
+    rules = dict(DEFAULT_RULES, **(rules or {}))
+    step = int(pd.Timedelta(cadence).total_seconds())
+    if step <= 0:
+        raise ValueError(f"The cadence must be positive, not '{cadence}'.")
+
+    # The timestamps are local time, so the clocks going back an hour can
+    # put rows out of order; a stable sort keeps same-time rows in order
+    seconds = df['Timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    order = np.argsort(seconds, kind='stable')
+    seconds = seconds[order]
+    df = df.iloc[order]
+    columns = [col for col in df.columns if col not in KEY_COLUMNS]
+    if not len(seconds):
+        return pd.DataFrame(columns=[col for col in KEY_COLUMNS if col in df.columns] + ['ElapsedHours'] + columns)
+
+    first = -(-seconds[0] // step) * step
+    last = -(-seconds[-1] // step) * step
+    grid = np.arange(first, last + 1, step)
+    # Each row belongs to the first grid point at or after it
+    bins = np.searchsorted(grid, seconds, side='left')
+
+    resampled = {}
+    if 'WarNumber' in df.columns:
+        resampled['WarNumber'] = np.repeat(df['WarNumber'].iloc[0], len(grid))
+    resampled['Timestamp'] = grid.astype('datetime64[s]')
+    resampled['ElapsedHours'] = (grid - seconds[0]) / 3600
+
+    grouped = df[columns].groupby(bins, sort=True)
+    for col in columns:
+        rule = rules.get(col, 'last')
+        if rule == INTERPOLATE:
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+            known = ~np.isnan(values)
+            resampled[col] = np.interp(grid, seconds[known], values[known]) if known.any() else np.full(len(grid), np.nan)
+        elif rule in AGGREGATIONS:
+            values = grouped[col].agg(rule).reindex(range(len(grid)))
+            resampled[col] = values.fillna(0) if rule == 'sum' else values.ffill()
+        else:
+            raise ValueError(f"Unknown resampling rule '{rule}' for '{col}'. "
+                             f"Use one of: {', '.join(AGGREGATIONS + [INTERPOLATE])}.")
+
+    return pd.DataFrame(resampled)
+
+
+def resample_combined(df, cadence, rules=None):
+    """
+    Resamples every war in a combined dataset onto the same cadence and
+    returns them in the order the wars first appear.
+    """
+    wars = [war for _, war in df.groupby('WarNumber', sort=False, observed=True)]
+    return resample_wars(wars or [df], cadence, rules)
+
+
+def resample_wars(wars, cadence, rules=None):
+    """
+    Resamples each of a sequence of one-war frames onto the same cadence
+    and returns them as one dataset, in order. Only the resampled rows are
+    kept, so the wars can be handed over one at a time rather than
+    combined first.
+    """
+    with instrument.span('resample', cadence=cadence) as span:
+        rows_in = 0
+        resampled = []
+        for war in wars:
+            rows_in += len(war)
+            resampled.append(resample_war(war, cadence, rules))
+        resampled = pd.concat(resampled, ignore_index=True)
+        span['rows_in'] = rows_in
+        span['rows_out'] = len(resampled)
+    return resampled
+
+
+def write_resampled(df, path):
+    """
+    Writes a resampled dataset to `path`. The timestamps always get their
+    time of day: on a cadence such as '1D' every grid point is midnight,
+    and pandas would otherwise write dates only, which read_table doesn't
+    load as timestamps.
+    """
+    df.to_csv(path, index=False, date_format=TIMESTAMP_FORMAT)
+
+
+def parse_rule(text):
+    column, _, rule = text.partition('=')
+    if rule not in AGGREGATIONS + [INTERPOLATE]:
+        raise argparse.ArgumentTypeError(f"'{text}' isn't COLUMN=RULE with a known rule")
+    return column, rule
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resample a combined dataset onto a fixed cadence.")
+    parser.add_argument("paths", nargs="+", help="Combined CSVs, e.g. 'Usable Data/DataWithPopulationRegr.csv'")
+    parser.add_argument("--cadence", action="append", required=True,
+                        help='The grid spacing, e.g. "10min", "1h" or "1D"; repeat for several')
+    parser.add_argument("--rule", type=parse_rule, action="append", default=[],
+                        help='How to resample a column, e.g. "WardenPlayers=interpolate"; repeatable')
+    args = parser.parse_args()
+    rules = dict(args.rule)
+
+    for path in args.paths:
+        df = read_table(path)
+        for cadence in args.cadence:
+            resampled = resample_combined(df, cadence, rules)
+            write_resampled(resampled, resampled_path(path, cadence))
+            print(f"✅ Resampled {len(df)} rows of '{os.path.basename(path)}' into {len(resampled)} "
+                  f"rows every {cadence}: '{os.path.basename(resampled_path(path, cadence))}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Finds the casualty resets in a war and decides which rows to keep.
+
+A raw war file can hold more than one war's worth of casualties: a "mini
+war" before the real one, or counters that were reset partway through. A
+reset is a row where both sides' casualties fall below the row before.
+scan() finds every reset, and the Warden casualty peak, in one vectorized
+pass over the casualty columns. The resets split the war into segments,
+each starting at a reset.
+
+The reset policy says which rows to keep:
+
+    'keep-after-last-reset'  the last segment, i.e. the real war (cleaner2)
+    'keep-before-peak'       everything up to the Warden casualty peak, if
+                             the row after it drops below it (cleaner1)
+    'split-into-segments'    every row, with its segment numbered in a
+                             Segment column
+
+The extended dataset is cleaned with 'keep-after-last-reset' unless the
+pipeline is run with --reset-policy. The basic dataset is always cleaned
+like cleaner1 (transforms.truncate_after_peak).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+KEEP_AFTER_LAST_RESET = 'keep-after-last-reset'
+KEEP_BEFORE_PEAK = 'keep-before-peak'
+SPLIT_SEGMENTS = 'split-into-segments'
+POLICIES = [KEEP_AFTER_LAST_RESET, KEEP_BEFORE_PEAK, SPLIT_SEGMENTS]
+DEFAULT_POLICY = KEEP_AFTER_LAST_RESET
+
+# The column 'split-into-segments' numbers each row's segment in
+SEGMENT_COLUMN = 'Segment'
+
+# Where a war's segments start, where its Warden casualties first peak and
+# whether the row after the peak drops below it
+ResetScan = namedtuple('ResetScan', ['starts', 'peak', 'peak_drops'])
+
+
+def scan(warden, colonial=None):
+    """
+    Scans a war's casualty arrays once. The first segment always starts at
+    row 0. Without `colonial`, any drop in the Warden casualties counts as
+    a reset.
+    """
+    warden = np.asarray(warden)
+    if not len(warden):
+        return ResetScan(np.zeros(1, dtype=np.int64), None, False)
+
+    # Compare each row against the one before it
+    drops = warden[1:] < warden[:-1]
+    if colonial is not None:
+        colonial = np.asarray(colonial)
+        drops &= colonial[1:] < colonial[:-1]
+    starts = np.r_[0, np.flatnonzero(drops) + 1]
+
+    peak = int(np.argmax(warden))
+    peak_drops = bool(peak + 1 < len(warden) and warden[peak + 1] < warden[peak])
+    return ResetScan(starts, peak, peak_drops)
+
+
+def kept_range(resets, rows, policy=DEFAULT_POLICY):
+    """
+    Returns the (start, stop) positions of the rows a policy keeps out of
+    a scanned war of `rows` rows.
+    """
+    if policy == KEEP_AFTER_LAST_RESET:
+        return int(resets.starts[-1]), rows
+    if policy == KEEP_BEFORE_PEAK:
+        return 0, resets.peak + 1 if resets.peak_drops else rows
+    if policy == SPLIT_SEGMENTS:
+        return 0, rows
+    raise ValueError(f"Unknown reset policy '{policy}'. Choose one of: {', '.join(POLICIES)}")
+
+
+def segment_ids(resets, rows):
+    """
+    Returns the segment number of each of a scanned war's rows, from 0.
+    """
+    return np.repeat(np.arange(len(resets.starts)), np.diff(np.r_[resets.starts, rows]))
+
+
+def add_reset_policy_argument(parser):
+    parser.add_argument("--reset-policy", choices=POLICIES, default=DEFAULT_POLICY,
+                        help=f"What to keep of a war with casualty resets (default: {DEFAULT_POLICY})")
@@ -0,0 +1,215 @@
+"""
+The column layouts and declared column types for every war table.
+
+The stats site has used three column layouts over the wars. LAYOUTS maps
+each range of wars to its layout, with every column under its one canonical
+name and None for the positions the site fills that no stage uses. The
+scraper keeps only the columns in scraped_columns(), so the unnamed and
+redundant columns are never written to a raw file; the cleaning stages
+still drop them from raw files scraped before. Columns that used to be
+spelt differently are renamed to their canonical name when a table is
+read, so both datasets use the same names.
+
+Bump SCHEMA_VERSION whenever a layout or a name changes, so every build
+that depends on the schema is redone.
+
+Every column we know gets a compact type sized to the values the site reports:
+captures and per-faction player counts fit in int16, casualties and
+casualty rates in int32, and the queue warnings are 0/1 flags. `Timestamp`
+is a datetime and the combined datasets' `WarNumber` is categorical.
+
+storage.read_table loads every stage through these types, so pandas skips
+dtype inference and each war takes a fraction of the memory. A file that
+doesn't fit its declared types is read as before and only the columns that
+convert without loss are narrowed.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# 2: canonical 'Colonial*' spellings, and only the used columns are scraped
+SCHEMA_VERSION = 2
+
+# The timestamp layout written by the scraper
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Old column names and the canonical names they are read as
+RENAMED_COLUMNS = {
+    "ColonialCasualityRate": "ColonialCasualtyRate",
+    "ColonialCasualityRateHr": "ColonialCasualtyRateHr",
+}
+
+# The "1234/hr" display strings repeat the rate columns
+REDUNDANT_COLUMNS = ['WardenCasualtyRateHr', 'ColonialCasualtyRateHr']
+
+# The queue columns, which the extended models don't use
+QUEUE_COLUMNS = [
+    'WardenQueued', 'ColonialQueued', 'WardenPlayersMore',
+    'ColonialPlayersMore', 'WardenQueueWarning', 'ColonialQueueWarning'
+]
+
+# --- The 3 header structures the stats site uses ---
+HEADERS_POP_16_19 = [
+    "Timestamp", "WardenPlayers", "ColonialPlayers", "WardenCaptures", "ColonialCaptures", "WardenCasualties",
+    "ColonialCasualties", "WardenCasualtyRate", "WardenCasualtyRateHr", "ColonialCasualtyRate",
+    "ColonialCasualtyRateHr", "SteamPlayers", "WardenPlayHours", "ColonialPlayHours", None,
+    None, "WardenPlayersMore", "ColonialPlayersMore", None, None
+]
+HEADERS_POP_EXT_63_111 = [
+    "Timestamp", "WardenPlayers", "ColonialPlayers", "WardenCaptures", "ColonialCaptures", "WardenCasualties",
+    "ColonialCasualties", "WardenCasualtyRate", "WardenCasualtyRateHr", "ColonialCasualtyRate",
+    "ColonialCasualtyRateHr", "SteamPlayers", "WardenPlayHours", "ColonialPlayHours", "WardenQueued",
+    "ColonialQueued", "WardenPlayersMore", "ColonialPlayersMore", "WardenQueueWarning", "ColonialQueueWarning", None
+]
+HEADERS_BASIC = [
+    "Timestamp", None, None, "WardenCaptures", "ColonialCaptures", "WardenCasualties",
+    "ColonialCasualties", "WardenCasualtyRate", "WardenCasualtyRateHr", "ColonialCasualtyRate",
+    "ColonialCasualtyRateHr", "SteamPlayers", None, None, None, None,
+    None, None, None, None, None
+]
+
+# A column layout, the wars that use it and its columns in page order
+Layout = namedtuple('Layout', ['name', 'wars', 'columns'])
+
+LAYOUTS = [
+    Layout("Population Data (16-19)", range(16, 20), HEADERS_POP_16_19),
+    Layout("Population Data Extended (63-111)", range(63, 112), HEADERS_POP_EXT_63_111),
+    # Every other war, including any after the last one we know of
+    Layout("Basic Data", None, HEADERS_BASIC),
+]
+
+# The type of every named column, in any layout or stage. The unnamed
+# 'Column_*' columns of older raw files are dropped by cleaning, so they
+# are left to pandas.
+COLUMN_TYPES = {
+    "Timestamp": "datetime64[s]",
+    "WarNumber": "category",
+    # Counts in the hundreds or thousands
+    "WardenPlayers": "int16", "ColonialPlayers": "int16",
+    "WardenCaptures": "int16", "ColonialCaptures": "int16",
+    "WardenQueued": "int16", "ColonialQueued": "int16",
+    "WardenPlayersMore": "int16", "ColonialPlayersMore": "int16",
+    "WardenQueueWarning": "int8", "ColonialQueueWarning": "int8",
+    # Steam-wide players and running totals can pass 32,767
+    "SteamPlayers": "int32",
+    "WardenCasualties": "int32", "ColonialCasualties": "int32",
+    "WardenCasualtyRate": "int32", "ColonialCasualtyRate": "int32",
+    "WardenPlayHours": "int32", "ColonialPlayHours": "int32",
+    # The "1234/hr" display strings
+    "WardenCasualtyRateHr": "str", "ColonialCasualtyRateHr": "str",
+    # Labels added by the later stages
+    "Target": "int8", "WinMargin": "int16", "SquaredWinMargin": "int32",
+}
+
+# The declared types of each raw layout
+SCHEMAS = {
+    layout.name: {col: COLUMN_TYPES[col] for col in layout.columns if col in COLUMN_TYPES}
+    for layout in LAYOUTS
+}
+
+
+def layout_for_war(war_number):
+    """
+    Returns the layout the stats site uses for a war.
+    """
+    for layout in LAYOUTS:
+        if layout.wars is None or war_number in layout.wars:
+            return layout
+
+
+def scraped_columns(layout):
+    """
+    Returns (header, positions) for the columns the scraper keeps from a
+    layout: every named column except the redundant ones. `positions` are
+    the kept values' indexes among the row's values after the timestamp.
+    """
+    kept = [(i, col) for i, col in enumerate(layout.columns)
+            if col is not None and col not in REDUNDANT_COLUMNS]
+    return [col for _, col in kept], [i - 1 for i, _ in kept if i > 0]
+
+
+def canonical_name(column):
+    """
+    Returns the name a column is known by now.
+    """
+    return RENAMED_COLUMNS.get(column, column)
+
+
+def read_dtypes():
+    """
+    Returns the dtypes to pass to read_csv so it skips inference for the
+    declared columns. Integers are read as int64 and narrowed afterwards by
+    apply_schema, because read_csv silently wraps values that overflow a
+    narrow type. Timestamps and categories are also converted after reading.
+    """
+    dtypes = {}
+    for col, dtype in COLUMN_TYPES.items():
+        if dtype.startswith("int"):
+            dtypes[col] = "int64"
+        elif dtype == "str":
+            dtypes[col] = dtype
+    # Older files still use the old names
+    for old, new in RENAMED_COLUMNS.items():
+        if new in dtypes:
+            dtypes[old] = dtypes[new]
+    return dtypes
+
+
+def _convert(values, dtype):
+    """
+    Returns `values` as a numpy array or Categorical of `dtype`, or None if
+    they don't convert without loss.
+    """
+    if dtype == "str":
+        return None
+    if dtype == "category":
+        return pd.Categorical(values)
+    if dtype == "datetime64[s]":
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            try:
+                values = pd.to_datetime(values, format=TIMESTAMP_FORMAT)
+            except (ValueError, TypeError):
+                return None
+        return values.to_numpy().astype(dtype)
+
+    array = values.to_numpy()
+    if array.dtype.kind == 'f':
+        if np.isnan(array).any() or not (array == np.round(array)).all():
+            return None
+    elif array.dtype.kind not in 'iu':
+        return None
+    if len(array):
+        info = np.iinfo(dtype)
+        if array.min() < info.min or array.max() > info.max:
+            return None
+    return array.astype(dtype)
+
+
+def apply_schema(df):
+    """
+    Returns the DataFrame with every column under its canonical name and
+    every declared column in its compact type. Columns whose values don't
+    fit their type (missing values, text or out-of-range numbers) are left
+    as they are, and text columns are left to read_csv.
+    """
+    if any(col in RENAMED_COLUMNS for col in df.columns):
+        df = df.rename(columns=RENAMED_COLUMNS)
+
+    # The frame is rebuilt from arrays in one go; DataFrame.astype costs
+    # more than the read itself on a single war
+    columns = {}
+    changed = False
+    for col in df.columns:
+        values = df[col]
+        dtype = COLUMN_TYPES.get(col)
+        converted = None
+        if dtype is not None and str(values.dtype) != dtype:
+            converted = _convert(values, dtype)
+        if converted is None:
+            columns[col] = values
+        else:
+            columns[col] = converted
+            changed = True
+
+    return pd.DataFrame(columns, index=df.index) if changed else df
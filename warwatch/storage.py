@@ -0,0 +1,357 @@
+"""
+Reads and writes the per-war tables as CSV or Parquet.
+
+CSV is the default and matches what the scripts have always written. With
+Parquet, each table is stored columnar and typed, with narrow integer
+counts and a native datetime `Timestamp`. A reader can then load only the
+columns it needs, with no text parsing or dtype inference. Pick the format with
+--format on any script, or set WARWATCH_FORMAT for a whole run.
+
+Either way, tables are loaded with the types declared in warwatch.schema.
+Readers accept either format, so a folder of raw CSVs can feed a Parquet
+run. Each stage writes its output in the selected format. The combined
+datasets are the published files, so they are always written as CSV.
+
+CSVs are parsed by pyarrow's multithreaded reader when pyarrow is
+installed, with every declared column's type given up front. Any file it
+can't parse with those types (ragged rows, text in a count column) is read
+by pandas instead, as it always was. Pick the engine with --csv-engine on
+any script, or set WARWATCH_CSV_ENGINE; 'pandas' skips pyarrow entirely.
+"""
+import csv
+import glob
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from warwatch import instrument
+from warwatch.schema import TIMESTAMP_FORMAT, apply_schema, canonical_name, read_dtypes
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pa_csv = pq = None
+
+FORMAT_ENV_VAR = 'WARWATCH_FORMAT'
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet'}
+DEFAULT_FORMAT = 'csv'
+
+# 'auto' uses pyarrow if it is installed and pandas otherwise
+CSV_ENGINE_ENV_VAR = 'WARWATCH_CSV_ENGINE'
+CSV_ENGINES = ['auto', 'pyarrow', 'pandas']
+DEFAULT_CSV_ENGINE = 'auto'
+
+
+def get_format():
+    """
+    Returns the storage format selected for this run.
+    """
+    fmt = os.environ.get(FORMAT_ENV_VAR, DEFAULT_FORMAT)
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown storage format '{fmt}'. Choose one of: {', '.join(EXTENSIONS)}")
+    if fmt == 'parquet' and pq is None:
+        raise ImportError("The parquet format needs pyarrow. Install it with 'pip install pyarrow'.")
+    return fmt
+
+
+def set_format(fmt):
+    """
+    Selects the storage format. It is kept in the environment, so worker
+    processes started afterwards use the same format.
+    """
+    os.environ[FORMAT_ENV_VAR] = fmt
+    get_format()
+
+
+def get_csv_engine():
+    """
+    Returns the engine that parses CSVs in this run: 'pyarrow' or 'pandas'.
+    """
+    engine = os.environ.get(CSV_ENGINE_ENV_VAR, DEFAULT_CSV_ENGINE)
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Unknown CSV engine '{engine}'. Choose one of: {', '.join(CSV_ENGINES)}")
+    if engine == 'auto':
+        return 'pandas' if pa_csv is None else 'pyarrow'
+    if engine == 'pyarrow' and pa_csv is None:
+        raise ImportError("The pyarrow CSV engine needs pyarrow. Install it with 'pip install pyarrow'.")
+    return engine
+
+
+def set_csv_engine(engine):
+    """
+    Selects the CSV engine. Like the format, it is kept in the environment
+    for worker processes.
+    """
+    os.environ[CSV_ENGINE_ENV_VAR] = engine
+    get_csv_engine()
+
+
+def add_format_argument(parser):
+    parser.add_argument("--format", choices=sorted(EXTENSIONS),
+                        help=f"Storage format for the per-war files (default: ${FORMAT_ENV_VAR} or {DEFAULT_FORMAT})")
+    parser.add_argument("--csv-engine", choices=CSV_ENGINES,
+                        help=f"Engine that parses CSVs (default: ${CSV_ENGINE_ENV_VAR} or {DEFAULT_CSV_ENGINE})")
+
+
+def apply_storage_arguments(args):
+    """
+    Applies the --format and --csv-engine options added by
+    add_format_argument.
+    """
+    if args.format:
+        set_format(args.format)
+    if args.csv_engine:
+        set_csv_engine(args.csv_engine)
+
+
+def format_of(path):
+    """
+    Returns the storage format of a path from its extension.
+    """
+    extension = os.path.splitext(path)[1]
+    for fmt, fmt_extension in EXTENSIONS.items():
+        if extension == fmt_extension:
+            return fmt
+    raise ValueError(f"Don't know how to read '{os.path.basename(path)}'")
+
+
+def table_path(folder, name, fmt=None):
+    """
+    Returns the path of table `name` in `folder`, with the extension of the
+    given or selected format. `name` may already have an extension.
+    """
+    stem = os.path.splitext(name)[0] if os.path.splitext(name)[1] in EXTENSIONS.values() else name
+    return os.path.join(folder, stem + EXTENSIONS[fmt or get_format()])
+
+
+def _preferred_extensions():
+    preferred = EXTENSIONS[get_format()]
+    return [preferred] + [ext for ext in EXTENSIONS.values() if ext != preferred]
+
+
+def find_table(folder, name):
+    """
+    Returns the path of table `name` in `folder` in whichever format exists,
+    preferring the selected one, or None if there isn't one.
+    """
+    for extension in _preferred_extensions():
+        path = os.path.join(folder, name + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def find_tables(folder, pattern='*'):
+    """
+    Returns every table in `folder` matching `pattern`, one path per table
+    name. When a table exists in both formats the selected one wins.
+    """
+    found = {}
+    for extension in reversed(_preferred_extensions()):
+        for path in glob.glob(os.path.join(folder, pattern + extension)):
+            found[os.path.splitext(os.path.basename(path))[0]] = path
+    return [found[name] for name in sorted(found)]
+
+
+def _stored_columns(path):
+    if format_of(path) == 'parquet':
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def table_columns(path):
+    """
+    Returns a table's column names, as read_table would name them, without
+    reading its data.
+    """
+    return [canonical_name(col) for col in _stored_columns(path)]
+
+
+def read_table(path, columns=None):
+    """
+    Reads a table in either format, with the declared column types. If
+    `columns` is given, only those that exist in the table are read, in the
+    table's own order. Columns are named and asked for by their canonical
+    names, even in tables written under an older schema.
+    """
+    if format_of(path) == 'parquet':
+        if columns is not None:
+            wanted = set(columns)
+            columns = [col for col in _stored_columns(path) if canonical_name(col) in wanted]
+        df = apply_schema(pd.read_parquet(path, columns=columns))
+    elif get_csv_engine() == 'pyarrow':
+        df = _read_csv_arrow(path, columns)
+    else:
+        df = _read_csv(path, _usecols(columns))
+
+    if instrument.enabled():
+        instrument.add(rows_read=len(df), bytes_read=os.path.getsize(path))
+    return df
+
+
+def _usecols(columns):
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return lambda col: canonical_name(col) in wanted
+
+
+def _arrow_types():
+    """
+    Returns the declared column types as pyarrow types, mirroring what
+    read_dtypes gives read_csv.
+    """
+    types = {col: pa.int64() if dtype == 'int64' else pa.string() for col, dtype in read_dtypes().items()}
+    types['Timestamp'] = pa.timestamp('s')
+    return types
+
+
+def _read_csv_arrow(path, columns=None):
+    """
+    Parses a CSV with pyarrow's multithreaded reader, with the declared
+    column types. Falls back to _read_csv for anything pyarrow rejects,
+    so both engines return the same frame.
+    """
+    include = None
+    if columns is not None:
+        wanted = set(columns)
+        include = [col for col in _stored_columns(path) if canonical_name(col) in wanted]
+        if not include:
+            # pyarrow reads every column when given none
+            return _read_csv(path, _usecols(columns))
+    convert_options = pa_csv.ConvertOptions(
+        column_types=_arrow_types(), include_columns=include,
+        timestamp_parsers=[TIMESTAMP_FORMAT], strings_can_be_null=True,
+    )
+    try:
+        table = pa_csv.read_csv(path, read_options=pa_csv.ReadOptions(use_threads=True),
+                                convert_options=convert_options)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Ragged rows, text in a count column or a timestamp in another
+        # layout: let pandas read it the way it always has
+        return _read_csv(path, _usecols(columns))
+
+    # Empty columns come back typed as null; pandas reads them as floats
+    for i, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(i, field.name, pa.nulls(len(table), pa.float64()))
+    return apply_schema(table.to_pandas())
+
+
+def _read_csv(source, usecols=None):
+    # Floats are parsed to the exact value written, as pyarrow does
+    try:
+        df = pd.read_csv(source, usecols=usecols, dtype=read_dtypes(), float_precision='round_trip',
+                         parse_dates=['Timestamp'], date_format=TIMESTAMP_FORMAT)
+    except ValueError:
+        # The table has no Timestamp, or a declared integer column has
+        # missing or non-numeric values as raw scrapes sometimes do, so let
+        # pandas infer every column instead
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        df = pd.read_csv(source, usecols=usecols, float_precision='round_trip')
+    return apply_schema(df)
+
+
+def to_columnar(df):
+    """
+    Returns the DataFrame with the types stored in Parquet: the declared
+    schema, and int32 for any other integer column whose values fit.
+    """
+    df = apply_schema(df).copy()
+    int32 = np.iinfo(np.int32)
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == np.int64:
+            if values.empty or (values.min() >= int32.min and values.max() <= int32.max):
+                df[col] = values.astype(np.int32)
+    return df
+
+
+def write_table(df, path):
+    """
+    Writes a table in the format given by the extension of `path`.
+    """
+    if format_of(path) == 'parquet':
+        to_columnar(df).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+    if instrument.enabled():
+        instrument.add(rows_written=len(df), bytes_written=os.path.getsize(path))
+
+
+def write_rows(path, header, rows):
+    """
+    Writes parsed rows of text under `header`. CSV rows are streamed
+    straight to the file. For Parquet the war is loaded the same way
+    read_table would load the CSV, then stored typed.
+    """
+    if format_of(path) == 'csv':
+        count = [0]
+        if instrument.enabled():
+            rows = _counted(rows, count)
+        with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            writer.writerows(rows)
+        if instrument.enabled():
+            instrument.add(rows_written=count[0], bytes_written=os.path.getsize(path))
+        return
+
+    write_table(rows_to_frame(header, rows), path)
+
+
+def append_rows(path, header, rows):
+    """
+    Appends parsed rows of text to a table, creating it under `header` if it
+    doesn't exist yet. CSV rows are appended to the file in place. If the
+    file was scraped under an older layout, the rows are matched to its
+    columns by name, leaving the columns that are no longer scraped empty.
+    A Parquet file can't be appended to, so it is read back and rewritten.
+    """
+    if not os.path.exists(path):
+        write_rows(path, header, rows)
+        return
+
+    if format_of(path) == 'csv':
+        stored = [canonical_name(col) for col in _stored_columns(path)]
+        if stored != list(header):
+            position = {col: i for i, col in enumerate(header)}
+            order = [position.get(col) for col in stored]
+            rows = ([row[i] if i is not None and i < len(row) else '' for i in order] for row in rows)
+
+        count = [0]
+        if instrument.enabled():
+            rows = _counted(rows, count)
+        size = os.path.getsize(path)
+        with open(path, 'a', newline='', encoding='utf-8') as csvfile:
+            csv.writer(csvfile).writerows(rows)
+        if instrument.enabled():
+            instrument.add(rows_written=count[0], bytes_written=os.path.getsize(path) - size)
+        return
+
+    write_table(pd.concat([read_table(path), rows_to_frame(header, rows)], ignore_index=True), path)
+
+
+def rows_to_frame(header, rows):
+    """
+    Returns parsed rows of text as a DataFrame, loaded the same way
+    read_table would load them from a CSV.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(rows)
+    buffer.seek(0)
+    return _read_csv(buffer)
+
+
+def _counted(rows, count):
+    for row in rows:
+        count[0] += 1
+        yield row
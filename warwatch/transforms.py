@@ -0,0 +1,281 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from warwatch import instrument, resets
+from warwatch.resets import DEFAULT_POLICY, SEGMENT_COLUMN, SPLIT_SEGMENTS
+
+CASUALTY_COLUMNS = ['WardenCasualties', 'ColonialCasualties']
+
+# What cleaner2's cleaning removed from one war
+CleanStats = namedtuple('CleanStats', ['rows_in', 'rows_invalid', 'rows_before_reset', 'rows_after_peak',
+                                       'rows_zero', 'rows_out', 'segments', 'columns_dropped'])
+
+
+# Every transform takes a war's DataFrame and returns the transformed
+# DataFrame, or None when the war should be skipped by later stages.
+
+def truncate_after_peak(df):
+    """
+    cleaner1's cleaning step: removes a "mini war" by truncating the data
+    after the global peak of WardenCasualties if the next row drops below it.
+    """
+    if df.empty or 'WardenCasualties' not in df.columns:
+        print("  - File is empty or missing 'WardenCasualties' column. Copying as-is.")
+        return df
+
+    df['WardenCasualties'] = pd.to_numeric(df['WardenCasualties'], errors='coerce')
+    df.dropna(subset=['WardenCasualties'], inplace=True)
+    df['WardenCasualties'] = df['WardenCasualties'].astype(int)
+
+    if df.empty:
+        print("  - No valid casualty data found after cleaning. Skipping.")
+        return None
+
+    scan = resets.scan(df['WardenCasualties'].to_numpy())
+
+    if scan.peak == len(df) - 1:
+        print("  - Peak casualties at the end of the war. No reset detected.")
+        return df
+
+    if scan.peak_drops:
+        print("  - Reset detected! Truncating the data after the peak.")
+        return df.iloc[:scan.peak + 1]
+
+    print("  - No casualty reset detected after peak.")
+    return df
+
+
+def advanced_clean(df, policy=DEFAULT_POLICY):
+    """
+    cleaner2's three-step cleaning: deals with casualty resets as the reset
+    policy says (by default, truncates everything before the last pre-war
+    reset), removes mid-war rows with zero casualties and drops the unnamed
+    'Column_*' columns. Prints what was removed.
+    """
+    df, stats = clean_war(df, policy)
+    if stats is None:
+        print("  - File is empty or missing required casualty columns. Skipping.")
+        return None
+
+    if stats.rows_before_reset:
+        print(f"  - Pre-war data reset found. Truncating {stats.rows_before_reset} early rows.")
+    if stats.rows_after_peak:
+        print(f"  - Casualty reset after the peak. Truncating {stats.rows_after_peak} late rows.")
+    if policy == SPLIT_SEGMENTS and stats.segments > 1:
+        print(f"  - Split into {stats.segments} segments at casualty resets.")
+    if stats.rows_zero:
+        print(f"  - Removing {stats.rows_zero} mid-war rows with zero casualties.")
+    if stats.columns_dropped:
+        print(f"  - Removed {stats.columns_dropped} unnamed columns.")
+    # The stage's span records rows_out itself
+    instrument.add(**{field: value for field, value in stats._asdict().items() if field != 'rows_out'})
+    return df
+
+
+def clean_war(df, policy=DEFAULT_POLICY):
+    """
+    The three cleaning steps of advanced_clean in one pass. Returns the
+    cleaned frame and a CleanStats of what was removed, or (None, None) if
+    the war is empty or has no casualty columns.
+
+    Every step only decides which rows and columns to keep, so the steps
+    are worked out on the casualty arrays alone and the output is taken
+    from `df` once, each kept column copied a single time. With the
+    'split-into-segments' policy, zero rows are removed within each
+    segment and the segments are numbered in a Segment column.
+    """
+    if df.empty or not set(CASUALTY_COLUMNS) <= set(df.columns):
+        return None, None
+
+    warden = pd.to_numeric(df['WardenCasualties'], errors='coerce').to_numpy()
+    colonial = pd.to_numeric(df['ColonialCasualties'], errors='coerce').to_numpy()
+    valid = np.flatnonzero(~(pd.isna(warden) | pd.isna(colonial)))
+    warden = warden[valid].astype(np.int64)
+    colonial = colonial[valid].astype(np.int64)
+
+    # Step 1: keep the rows the reset policy asks for
+    scan = resets.scan(warden, colonial)
+    start, stop = resets.kept_range(scan, len(warden), policy)
+    warden, colonial = warden[start:stop], colonial[start:stop]
+
+    # Step 2: after the first row with any casualties (in each segment,
+    # when splitting), drop the rows where both sides have none
+    active = (warden > 0) | (colonial > 0)
+    seen = np.cumsum(active) - active
+    if policy == SPLIT_SEGMENTS:
+        segments = resets.segment_ids(scan, len(warden))
+        seen -= seen[scan.starts[segments]]
+    keep = (seen == 0) | (warden != 0) | (colonial != 0)
+    kept = np.flatnonzero(keep)
+    rows = valid[start + kept]
+
+    # Step 3: keep every column but the unnamed ones
+    columns = [col for col in df.columns if not str(col).startswith('Column_')]
+    casualties = {'WardenCasualties': warden, 'ColonialCasualties': colonial}
+    data = {
+        col: casualties[col][kept] if col in casualties else df[col].array.take(rows)
+        for col in columns
+    }
+    if policy == SPLIT_SEGMENTS:
+        data[SEGMENT_COLUMN] = segments[kept]
+    cleaned = pd.DataFrame(data, index=pd.RangeIndex(len(kept)) if keep.all() else pd.Index(kept), copy=False)
+
+    stats = CleanStats(
+        rows_in=len(df), rows_invalid=len(df) - len(valid), rows_before_reset=start,
+        rows_after_peak=len(valid) - stop, rows_zero=int(len(keep) - len(kept)), rows_out=len(cleaned),
+        segments=len(scan.starts), columns_dropped=len(df.columns) - len(columns),
+    )
+    return cleaned, stats
+
+
+def truncate_before_last_reset(df):
+    """
+    Step 1: drops everything before the last pre-war reset, where both
+    sides' casualties fall below the previous row. Expects numeric casualty
+    columns and returns a frame with a fresh index.
+    """
+    scan = resets.scan(df['WardenCasualties'].to_numpy(), df['ColonialCasualties'].to_numpy())
+    last_reset_index, _ = resets.kept_range(scan, len(df))
+
+    if last_reset_index:
+        df = df.iloc[last_reset_index:].copy()
+        print(f"  - Pre-war data reset found. Truncating {last_reset_index} early rows.")
+
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def remove_midwar_zero_rows(df):
+    """
+    Step 2: drops rows where both sides have zero casualties after the
+    first row with any casualties.
+    """
+    if not df.empty:
+        first_action_index = (df['WardenCasualties'] > 0) | (df['ColonialCasualties'] > 0)
+        if first_action_index.any():
+            first_action_index = first_action_index.idxmax()
+            rows_to_remove = df[(df.index > first_action_index) & (df['WardenCasualties'] == 0) & (df['ColonialCasualties'] == 0)]
+            if not rows_to_remove.empty:
+                print(f"  - Removing {len(rows_to_remove)} mid-war rows with zero casualties.")
+                df.drop(rows_to_remove.index, inplace=True)
+    return df
+
+
+def drop_unnamed_columns(df):
+    """
+    Step 3: drops the unnamed 'Column_*' columns, which raw files scraped
+    before the schema registry still have.
+    """
+    cols_before = len(df.columns)
+    cols_to_keep = [col for col in df.columns if not str(col).startswith('Column_')]
+    df = df[cols_to_keep]
+    cols_after = len(df.columns)
+    if cols_before > cols_after:
+        print(f"  - Removed {cols_before - cols_after} unnamed columns.")
+    return df
+
+
+def drop_columns(df, columns):
+    """
+    Drops the given columns, ignoring any the file doesn't have.
+    """
+    return df.drop(columns=columns, errors='ignore')
+
+
+def final_capture_counts(df):
+    """
+    Returns the (Warden, Colonial) capture counts from the last row, or None
+    if the file is empty or missing the capture columns.
+    """
+    if df.empty or 'WardenCaptures' not in df.columns or 'ColonialCaptures' not in df.columns:
+        print("  - ⚠️ File is empty or missing 'Captures' columns. Skipping.")
+        return None
+
+    last_row = df.iloc[-1]
+    warden_captures = pd.to_numeric(last_row['WardenCaptures'], errors='coerce')
+    colonial_captures = pd.to_numeric(last_row['ColonialCaptures'], errors='coerce')
+
+    # Widen to Python numbers so the margins can't overflow the narrow
+    # integer types the columns are loaded with
+    return tuple(
+        value.item() if isinstance(value, np.generic) else value
+        for value in (warden_captures, colonial_captures)
+    )
+
+
+def war_labels(df):
+    """
+    Returns every label for a war from its final capture counts in one
+    go: 'Target' (1 for a Warden lead, 0 for a Colonial lead or a tie),
+    'WinMargin' and 'SquaredWinMargin'. Returns None if the file is empty
+    or missing the capture columns.
+    """
+    captures = final_capture_counts(df)
+    if captures is None:
+        return None
+    warden_captures, colonial_captures = captures
+
+    win_margin = warden_captures - colonial_captures
+    target_value = 1 if warden_captures > colonial_captures else 0
+    print(f"  - Final captures {warden_captures}-{colonial_captures}. Target = {target_value}, WinMargin = {win_margin}")
+    return {'Target': target_value, 'WinMargin': win_margin, 'SquaredWinMargin': win_margin ** 2}
+
+
+def add_target(df):
+    """
+    Adds the binary 'Target' column: 1 if the Wardens finished with more
+    captures, 0 for a Colonial lead or a tie.
+    """
+    captures = final_capture_counts(df)
+    if captures is None:
+        return None
+    warden_captures, colonial_captures = captures
+
+    # Determine the target value (1 for Warden win, 0 for Colonial win or tie)
+    if warden_captures > colonial_captures:
+        target_value = 1
+        print("  - Warden final capture lead. Target = 1")
+    else:
+        target_value = 0
+        print("  - Colonial final capture lead or tie. Target = 0")
+
+    df = df.copy()
+    df['Target'] = target_value
+    return df
+
+
+def add_win_margin(df):
+    """
+    Adds the 'WinMargin' column: the final Warden minus Colonial captures.
+    """
+    captures = final_capture_counts(df)
+    if captures is None:
+        return None
+    warden_captures, colonial_captures = captures
+
+    win_margin = warden_captures - colonial_captures
+    print(f"  - Final capture difference is {win_margin}. Creating 'WinMargin' column.")
+
+    df = df.copy()
+    df['WinMargin'] = win_margin
+    return df
+
+
+def add_squared_win_margin(df):
+    """
+    Adds the 'SquaredWinMargin' column: the square of the final capture
+    difference.
+    """
+    captures = final_capture_counts(df)
+    if captures is None:
+        return None
+    warden_captures, colonial_captures = captures
+
+    squared_win_margin = (warden_captures - colonial_captures) ** 2
+    print(f"  - Final squared capture difference is {squared_win_margin}. Creating 'SquaredWinMargin' column.")
+
+    df = df.copy()
+    df['SquaredWinMargin'] = squared_win_margin
+    return df
@@ -0,0 +1,203 @@
+"""
+Rolling-window features over the combined war datasets.
+
+Casualty deltas, capture momentum and rolling player means are computed
+once, next to each combined file, instead of by every model in its own
+per-war groupby/apply. The combiners and the pipeline write them as
+<name>_windows.csv, one row per row of <name>.csv with its WarNumber and
+Timestamp, so the two line up:
+
+    data = pd.read_csv("Usable Data/DataWithPopulationRegr.csv")
+    windows = pd.read_csv("Usable Data/DataWithPopulationRegr_windows.csv")
+    data = pd.concat([data, windows.drop(columns=['WarNumber', 'Timestamp'])], axis=1)
+
+A window is (kind, column, size), with the size counted in rows:
+
+    'diff'      the change since `size` rows before
+    'sum'       the sum of the last `size` rows
+    'mean'      the mean of the last `size` rows
+    'ewm'       the exponentially weighted mean with a span of `size` rows
+    'ewm_rate'  the exponentially weighted mean of the row-to-row change
+
+Every window starts again at each war's first row: the first rows of a war
+only see that war, and a diff that would reach into the previous war is
+empty. A file split at casualty resets (see warwatch.resets) starts them
+again at each segment too. Windows over a column a dataset doesn't have
+are left out. On a
+resampled file (see warwatch.resample) the rows are a fixed time apart,
+so the windows are fixed spans of time too.
+
+Other windows can be written from the command line:
+    python -m warwatch.windows "Usable Data/DataWithPopulationRegr.csv" --window mean:WardenPlayers:12
+"""
+import argparse
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from warwatch import instrument
+from warwatch.resets import SEGMENT_COLUMN
+from warwatch.storage import read_table
+
+# One windowed feature: its kind, the column it is taken over and its size in rows
+Window = namedtuple('Window', ['kind', 'column', 'size'])
+
+KINDS = ['diff', 'sum', 'mean', 'ewm', 'ewm_rate']
+
+DEFAULT_WINDOWS = [
+    # Casualties since the previous row, and their smoothed rate
+    Window('diff', 'WardenCasualties', 1), Window('diff', 'ColonialCasualties', 1),
+    Window('ewm_rate', 'WardenCasualties', 12), Window('ewm_rate', 'ColonialCasualties', 12),
+    # Capture momentum
+    Window('diff', 'WardenCaptures', 6), Window('diff', 'ColonialCaptures', 6),
+    Window('ewm_rate', 'WardenCaptures', 12), Window('ewm_rate', 'ColonialCaptures', 12),
+    # Population
+    Window('mean', 'WardenPlayers', 6), Window('mean', 'ColonialPlayers', 6),
+    Window('mean', 'WardenPlayerShare', 6), Window('mean', 'SteamPlayers', 6),
+]
+
+# Columns that identify a row rather than describe it
+KEY_COLUMNS = ['WarNumber', 'Timestamp']
+
+
+def windows_path(csv_path):
+    """
+    Returns the window features file that goes with a combined CSV.
+    """
+    stem, extension = os.path.splitext(csv_path)
+    return f"{stem}_windows{extension}"
+
+
+def feature_name(window):
+    return f"{window.column}_{window.kind}{window.size}"
+
+
+def parse_window(text):
+    """
+    Parses a window given as "kind:column:size", e.g. "mean:WardenPlayers:6".
+    """
+    kind, _, rest = text.partition(':')
+    column, _, size = rest.rpartition(':')
+    if kind not in KINDS or not column or not size.isdigit() or int(size) < 1:
+        raise argparse.ArgumentTypeError(f"'{text}' isn't KIND:COLUMN:SIZE with KIND one of {', '.join(KINDS)}")
+    return Window(kind, column, int(size))
+
+
+def derived_columns(df):
+    """
+    Returns the columns worked out from others that windows can be taken
+    over: the Wardens' share of the players online.
+    """
+    derived = {}
+    if 'WardenPlayers' in df.columns and 'ColonialPlayers' in df.columns:
+        warden = df['WardenPlayers'].to_numpy(dtype=float)
+        total = warden + df['ColonialPlayers'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            derived['WardenPlayerShare'] = np.where(total > 0, warden / total, np.nan)
+    return derived
+
+
+def war_starts(war_numbers, segments=None):
+    """
+    Returns, for every row, the position of the first row of its war, or
+    of its segment if `segments` is given. The wars must each be one
+    contiguous run of rows, as in a combined file.
+    """
+    n = len(war_numbers)
+    if not n:
+        return np.empty(0, dtype=np.int64)
+    changes = war_numbers[1:] != war_numbers[:-1]
+    if segments is not None:
+        changes |= segments[1:] != segments[:-1]
+    starts = np.flatnonzero(np.r_[True, changes])
+    return np.repeat(starts, np.diff(np.r_[starts, n]))
+
+
+def _diff(values, first, size):
+    rows = np.arange(len(values))
+    out = np.full(len(values), np.nan)
+    inside = rows - size >= first
+    out[inside] = values[inside] - values[rows[inside] - size]
+    return out
+
+
+def _rolling(values, first, size, mean):
+    # Gather each row's window as a row of a (rows, size) matrix, with the
+    # places before the war's first row left empty. Summing the same values
+    # in the same order gives the same result whether the frame holds one
+    # war or all of them, which running-sum differences wouldn't
+    rows = np.arange(len(values))
+    taken = rows[:, None] - np.arange(size)
+    window = np.where(taken >= first[:, None], values[np.maximum(taken, 0)], np.nan)
+    count = (~np.isnan(window)).sum(axis=1)
+    total = np.nansum(window, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count if mean else total, np.nan)
+
+
+def _ewm(values, first, size):
+    # pandas' grouped ewm runs in compiled code, one pass per war
+    return pd.Series(values).groupby(first, sort=False).ewm(span=size).mean().to_numpy()
+
+
+def window_features(df, windows=None):
+    """
+    Returns a DataFrame with the key columns of `df` and one column per
+    window, computed over the whole (war-sorted) frame at once.
+    """
+    windows = DEFAULT_WINDOWS if windows is None else windows
+    with instrument.span('windows', rows_in=len(df), windows=len(windows)):
+        segments = df[SEGMENT_COLUMN].to_numpy() if SEGMENT_COLUMN in df.columns else None
+        first = war_starts(df['WarNumber'].to_numpy(), segments)
+        sources = dict(derived_columns(df))
+        features = {col: df[col].to_numpy() for col in KEY_COLUMNS if col in df.columns}
+
+        for window in windows:
+            if window.column not in sources:
+                if window.column not in df.columns:
+                    continue
+                sources[window.column] = pd.to_numeric(df[window.column], errors='coerce').to_numpy(dtype=float)
+            values = sources[window.column]
+
+            if window.kind == 'diff':
+                feature = _diff(values, first, window.size)
+            elif window.kind in ('sum', 'mean'):
+                feature = _rolling(values, first, window.size, mean=window.kind == 'mean')
+            elif window.kind == 'ewm':
+                feature = _ewm(values, first, window.size)
+            elif window.kind == 'ewm_rate':
+                feature = _ewm(_diff(values, first, 1), first, window.size)
+            else:
+                raise ValueError(f"Unknown window kind '{window.kind}'. Use one of: {', '.join(KINDS)}.")
+            features[feature_name(window)] = feature
+
+    return pd.DataFrame(features, index=df.index)
+
+
+def write_windows(df, path, windows=None):
+    """
+    Writes the window features of a whole combined DataFrame to `path`.
+    """
+    features = window_features(df, windows)
+    features.to_csv(path, index=False)
+    return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the rolling-window features of a combined dataset.")
+    parser.add_argument("paths", nargs="+", help="Combined CSVs, e.g. 'Usable Data/DataWithPopulationRegr.csv'")
+    parser.add_argument("--window", type=parse_window, action="append",
+                        help='A window as KIND:COLUMN:SIZE, e.g. "mean:WardenPlayers:6"; repeatable '
+                             '(default: the standard set)')
+    args = parser.parse_args()
+
+    for path in args.paths:
+        features = write_windows(read_table(path), windows_path(path), args.window)
+        print(f"✅ Wrote {len(features.columns) - len(KEY_COLUMNS)} window features for "
+              f"'{os.path.basename(path)}' to '{os.path.basename(windows_path(path))}'.")
+
+
+if __name__ == "__main__":
+    main()